@@ -1,5 +1,177 @@
 from django.contrib import admin
-from .models import Post
+from django.db import connection, transaction
+from django.db.models import BooleanField, Q
+from django.db.models.expressions import RawSQL
+from django.utils import timezone
+from .models import Post, Category, Tag, Comment, Like, Newsletter, Follow, Bookmark, ContactMessage
+from .paginators import EstimatedCountPaginator
+from .signals import posts_published, posts_unpublished
+from . import moderation
 
-# Register your models here.
-admin.site.register(Post)
\ No newline at end of file
+# Must match the expression index created in migration 0004
+POST_SEARCH_SQL = (
+    "to_tsvector('english', coalesce(blog_post.title, '') || ' ' || coalesce(blog_post.excerpt, '')) "
+    "@@ websearch_to_tsquery('english', %s)"
+)
+
+
+class ScalableAdmin(admin.ModelAdmin):
+    """Admin defaults for large tables: no full COUNT, estimated totals"""
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    list_per_page = 50
+
+
+@admin.register(Category)
+class CategoryAdmin(ScalableAdmin):
+    list_display = ('name', 'slug', 'author', 'created_at')
+    list_select_related = ('author',)
+    search_fields = ('name',)
+    prepopulated_fields = {'slug': ('name',)}
+    autocomplete_fields = ('author',)
+
+
+@admin.register(Tag)
+class TagAdmin(ScalableAdmin):
+    list_display = ('name', 'slug', 'created_at')
+    search_fields = ('name',)
+    prepopulated_fields = {'slug': ('name',)}
+
+
+@admin.register(Post)
+class PostAdmin(ScalableAdmin):
+    list_display = ('title', 'author', 'category', 'status', 'is_featured', 'is_pinned', 'views_count', 'date_posted')
+    list_select_related = ('author', 'category')
+    list_filter = ('status', 'is_featured', 'is_pinned')
+    autocomplete_fields = ('author', 'category', 'tags')
+    readonly_fields = ('views_count', 'date_updated')
+    search_fields = ('title',)
+    search_help_text = 'Searches titles and excerpts'
+    actions = ['publish', 'unpublish', 'feature', 'unfeature', 'pin', 'unpin']
+
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term:
+            return queryset, False
+        if connection.vendor == 'postgresql':
+            # Full-text search backed by the GIN index; never scans content
+            return queryset.filter(
+                RawSQL(POST_SEARCH_SQL, [search_term], output_field=BooleanField())
+            ), False
+        return queryset.filter(
+            Q(title__icontains=search_term) | Q(excerpt__icontains=search_term)
+        ), False
+
+    @staticmethod
+    def _set_status(queryset, publish, signal):
+        """
+        Publish (or unpublish) the selected posts that aren't already; return
+        how many changed. Rows are locked so ``signal`` carries exactly the
+        posts this action flipped, once the change is committed.
+        """
+        with transaction.atomic():
+            # Locked by pk: the changelist's outer join to category can't be
+            posts = Post.objects.filter(pk__in=queryset.values('pk')).select_for_update()
+            posts = posts.exclude(status='published') if publish else posts.filter(status='published')
+            post_ids = list(posts.values_list('pk', flat=True))
+            updated = Post.objects.filter(pk__in=post_ids).update(
+                status='published' if publish else 'draft', date_updated=timezone.now(),
+            )
+            # update() skips post_save: counts, caches and sitemaps react to this
+            if post_ids:
+                transaction.on_commit(lambda: signal.send(sender=Post, post_ids=post_ids))
+        return updated
+
+    @admin.action(description='Publish selected posts')
+    def publish(self, request, queryset):
+        updated = self._set_status(queryset, True, posts_published)
+        self.message_user(request, f'{updated} post(s) published.')
+
+    @admin.action(description='Move selected posts to draft')
+    def unpublish(self, request, queryset):
+        updated = self._set_status(queryset, False, posts_unpublished)
+        self.message_user(request, f'{updated} post(s) moved to draft.')
+
+    @admin.action(description='Feature selected posts')
+    def feature(self, request, queryset):
+        self.message_user(request, f'{queryset.update(is_featured=True)} post(s) featured.')
+
+    @admin.action(description='Unfeature selected posts')
+    def unfeature(self, request, queryset):
+        self.message_user(request, f'{queryset.update(is_featured=False)} post(s) unfeatured.')
+
+    @admin.action(description='Pin selected posts')
+    def pin(self, request, queryset):
+        self.message_user(request, f'{queryset.update(is_pinned=True)} post(s) pinned.')
+
+    @admin.action(description='Unpin selected posts')
+    def unpin(self, request, queryset):
+        self.message_user(request, f'{queryset.update(is_pinned=False)} post(s) unpinned.')
+
+
+@admin.register(Comment)
+class CommentAdmin(ScalableAdmin):
+    list_display = ('author', 'post', 'status', 'spam_score', 'created_at')
+    list_select_related = ('author', 'post')
+    list_filter = ('status',)
+    search_fields = ('author__username',)
+    autocomplete_fields = ('post', 'author', 'parent')
+    readonly_fields = ('spam_score',)
+    actions = ['approve', 'reject']
+
+    # Both actions are a single UPDATE however many comments are selected
+    @admin.action(description='Approve selected comments')
+    def approve(self, request, queryset):
+        self.message_user(request, f'{moderation.approve(queryset)} comment(s) approved.')
+
+    @admin.action(description='Reject selected comments')
+    def reject(self, request, queryset):
+        self.message_user(request, f'{moderation.reject(queryset)} comment(s) rejected.')
+
+
+@admin.register(Like)
+class LikeAdmin(ScalableAdmin):
+    list_display = ('user', 'post', 'created_at')
+    list_select_related = ('user', 'post')
+    autocomplete_fields = ('user', 'post')
+
+
+@admin.register(Bookmark)
+class BookmarkAdmin(ScalableAdmin):
+    list_display = ('user', 'post', 'created_at')
+    list_select_related = ('user', 'post')
+    autocomplete_fields = ('user', 'post')
+
+
+@admin.register(Follow)
+class FollowAdmin(ScalableAdmin):
+    list_display = ('follower', 'following', 'created_at')
+    list_select_related = ('follower', 'following')
+    autocomplete_fields = ('follower', 'following')
+
+
+@admin.register(Newsletter)
+class NewsletterAdmin(ScalableAdmin):
+    list_display = ('email', 'is_active', 'subscribed_at')
+    list_filter = ('is_active',)
+    search_fields = ('^email',)
+    actions = ['deactivate', 'activate']
+
+    @admin.action(description='Deactivate selected subscribers')
+    def deactivate(self, request, queryset):
+        self.message_user(request, f'{queryset.update(is_active=False)} subscriber(s) deactivated.')
+
+    @admin.action(description='Reactivate selected subscribers')
+    def activate(self, request, queryset):
+        self.message_user(request, f'{queryset.update(is_active=True)} subscriber(s) reactivated.')
+
+
+@admin.register(ContactMessage)
+class ContactMessageAdmin(ScalableAdmin):
+    list_display = ('name', 'email', 'subject', 'is_read', 'replied', 'created_at')
+    list_filter = ('is_read', 'replied')
+    search_fields = ('^email', 'subject')
+    actions = ['mark_read']
+
+    @admin.action(description='Mark selected messages as read')
+    def mark_read(self, request, queryset):
+        self.message_user(request, f'{queryset.update(is_read=True)} message(s) marked as read.')
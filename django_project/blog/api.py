@@ -0,0 +1,381 @@
+"""
+Read-only JSON API with sparse fieldsets.
+
+Every resource declares its fields. A request such as
+``?fields=title,author.username,tags`` is parsed into a tree and the tree
+alone decides the query: plain fields add ``only()`` columns, to-one
+relations add ``select_related`` and to-many relations add a ``Prefetch``
+whose queryset is planned the same way. Columns that were not asked for
+(``content``, profile fields, ...) are never loaded.
+
+Lists are keyset-paginated (see cursors.py) and rendered chunk by chunk so
+large pages can be streamed.
+"""
+import json
+from operator import attrgetter
+
+from django.contrib.auth.models import User
+from django.core.exceptions import ObjectDoesNotExist
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Exists, OuterRef, Prefetch
+from django.urls import reverse
+
+from .cursors import encode_cursor, keyset_filter
+from .models import Post, Category, Tag, Comment
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 500
+# Rows fetched per round trip while rendering a page
+CHUNK_SIZE = 100
+MAX_DEPTH = 3
+
+
+class ApiError(ValueError):
+    pass
+
+
+# ========== FIELDS ==========
+
+class Field:
+    """
+    A value read from the instance.
+
+    ``only`` lists the columns it needs (defaults to its source) and
+    ``select`` any relations that must be joined to read it.
+    """
+
+    def __init__(self, source=None, only=None, select=(), get=None):
+        self.source = source
+        self.only = only
+        self.select = select
+        self.get = get
+
+    def bind(self, name):
+        source = self.source or name
+        if self.only is None:
+            self.only = (source,)
+        if self.get is None:
+            self.get = attrgetter(source.replace('__', '.'))
+
+
+class Related:
+    """To-one relation rendered with another resource's fields"""
+
+    def __init__(self, resource, source=None):
+        self.resource = resource
+        self.source = source
+
+    def bind(self, name):
+        self.source = self.source or name
+
+
+class Many(Related):
+    """To-many relation loaded with a single Prefetch"""
+
+
+def _url(obj):
+    return obj.get_absolute_url()
+
+
+def _profile(attr):
+    def get(user):
+        try:
+            return getattr(user.profile, attr)
+        except ObjectDoesNotExist:
+            return None
+    return get
+
+
+def _avatar(user):
+    try:
+        return user.profile.avatar_medium_url or None
+    except ObjectDoesNotExist:
+        return None
+
+
+def _image_url(post):
+    return post.featured_image.url if post.featured_image else None
+
+
+class Resource:
+    def __init__(self, name, model, fields, default_fields, nested_fields,
+                 time_field, queryset=None, filters=None):
+        self.name = name
+        self.model = model
+        self.fields = fields
+        self.default_fields = default_fields
+        self.nested_fields = nested_fields
+        self.time_field = time_field
+        self._queryset = queryset
+        # Query parameter -> lookup
+        self.filters = filters or {}
+        for field_name, field in fields.items():
+            field.bind(field_name)
+
+    def get_queryset(self):
+        if self._queryset is not None:
+            return self._queryset()
+        return self.model._default_manager.all()
+
+    def expand(self, tree, nested=False):
+        """Validate ``tree`` against the declared fields; fill in defaults"""
+        if not tree:
+            names = self.nested_fields if nested else self.default_fields
+            tree = {name: {} for name in names}
+        selected = []
+        for name, subtree in tree.items():
+            field = self.fields.get(name)
+            if field is None:
+                raise ApiError(f"Unknown field '{name}' for {self.name}")
+            if subtree and not isinstance(field, Related):
+                raise ApiError(f"Field '{name}' has no subfields")
+            selected.append((name, field, subtree))
+        return selected
+
+
+RESOURCES = {}
+
+
+def register(resource):
+    RESOURCES[resource.name] = resource
+    return resource
+
+
+register(Resource(
+    'posts', Post,
+    fields={
+        'id': Field(source='pk', only=()),
+        'title': Field(),
+        'slug': Field(),
+        'excerpt': Field(),
+        'content': Field(),
+        'content_html': Field(),
+        'toc': Field(),
+        'featured_image': Field(get=_image_url),
+        'date_posted': Field(),
+        'date_updated': Field(),
+        'reading_time': Field(),
+        'views_count': Field(),
+        'comment_count': Field(source='approved_comment_count'),
+        'is_featured': Field(),
+        'is_pinned': Field(),
+        'allow_comments': Field(),
+        'meta_description': Field(),
+        'url': Field(only=(), get=_url),
+        'author': Related('authors'),
+        'category': Related('categories'),
+        'tags': Many('tags'),
+    },
+    default_fields=('id', 'title', 'slug', 'excerpt', 'date_posted', 'reading_time', 'url', 'author', 'category', 'tags'),
+    nested_fields=('id', 'title', 'slug', 'url'),
+    time_field='date_posted',
+    queryset=lambda: Post.objects.filter(status='published'),
+    filters={'author': 'author__username', 'category': 'category__slug', 'tag': 'tags__slug'},
+))
+
+register(Resource(
+    'categories', Category,
+    fields={
+        'id': Field(source='pk', only=()),
+        'name': Field(),
+        'slug': Field(),
+        'description': Field(),
+        'post_count': Field(source='published_post_count'),
+        'created_at': Field(),
+        'url': Field(only=('slug',), get=_url),
+        'author': Related('authors'),
+    },
+    default_fields=('id', 'name', 'slug', 'description', 'post_count', 'url'),
+    nested_fields=('id', 'name', 'slug'),
+    time_field='created_at',
+))
+
+register(Resource(
+    'tags', Tag,
+    fields={
+        'id': Field(source='pk', only=()),
+        'name': Field(),
+        'slug': Field(),
+        'post_count': Field(source='published_post_count'),
+        'created_at': Field(),
+        'url': Field(only=('slug',), get=_url),
+    },
+    default_fields=('id', 'name', 'slug', 'post_count', 'url'),
+    nested_fields=('id', 'name', 'slug'),
+    time_field='created_at',
+))
+
+register(Resource(
+    'authors', User,
+    fields={
+        'id': Field(source='pk', only=()),
+        'username': Field(),
+        'first_name': Field(),
+        'last_name': Field(),
+        'date_joined': Field(),
+        'bio': Field(only=('profile__bio',), select=('profile',), get=_profile('bio')),
+        'location': Field(only=('profile__location',), select=('profile',), get=_profile('location')),
+        'website': Field(only=('profile__website',), select=('profile',), get=_profile('website')),
+        'avatar': Field(only=('profile__image', 'profile__image_hash'), select=('profile',), get=_avatar),
+        'url': Field(only=('username',), get=lambda user: reverse('user-posts', args=[user.username])),
+    },
+    default_fields=('id', 'username', 'bio', 'avatar', 'url'),
+    nested_fields=('id', 'username'),
+    time_field='date_joined',
+    # Only people with public posts are listed, not every account
+    queryset=lambda: User.objects.filter(
+        Exists(Post.objects.filter(author=OuterRef('pk'), status='published')), is_active=True,
+    ),
+))
+
+register(Resource(
+    'comments', Comment,
+    fields={
+        'id': Field(source='pk', only=()),
+        'content': Field(),
+        'created_at': Field(),
+        'updated_at': Field(),
+        'parent': Field(source='parent_id', only=('parent',)),
+        'author': Related('authors'),
+        'post': Related('posts'),
+    },
+    default_fields=('id', 'content', 'created_at', 'parent', 'author', 'post'),
+    nested_fields=('id', 'content', 'created_at'),
+    time_field='created_at',
+    queryset=lambda: Comment.objects.filter(is_approved=True, post__status='published'),
+    filters={'post': 'post_id'},
+))
+
+
+# ========== QUERY PLANNING ==========
+
+def parse_fields(value):
+    """'title,author.username' -> {'title': {}, 'author': {'username': {}}}"""
+    tree = {}
+    for path in value.split(','):
+        path = path.strip()
+        if not path:
+            continue
+        parts = path.split('.')
+        if len(parts) > MAX_DEPTH or not all(parts):
+            raise ApiError(f"Invalid field '{path}'")
+        node = tree
+        for part in parts:
+            node = node.setdefault(part, {})
+    return tree
+
+
+def _one(serialize, source):
+    def get(obj):
+        related = getattr(obj, source)
+        return None if related is None else serialize(related)
+    return get
+
+
+def _many(serialize, source):
+    def get(obj):
+        return [serialize(related) for related in getattr(obj, source).all()]
+    return get
+
+
+def _plan(resource, tree, nested, prefix, query):
+    """Add the lookups ``tree`` needs to ``query``; return a serializer"""
+    columns, selects, prefetches = query
+    getters = []
+    for name, field, subtree in resource.expand(tree, nested):
+        if isinstance(field, Many):
+            target = RESOURCES[field.resource]
+            queryset, serialize = plan_queryset(
+                target, subtree, nested=True, queryset=target.model._default_manager.all()
+            )
+            prefetches.append(Prefetch(prefix + field.source, queryset=queryset))
+            getters.append((name, _many(serialize, field.source)))
+        elif isinstance(field, Related):
+            target = RESOURCES[field.resource]
+            columns.append(prefix + field.source)
+            selects.append(prefix + field.source)
+            serialize = _plan(target, subtree, True, f'{prefix}{field.source}__', query)
+            getters.append((name, _one(serialize, field.source)))
+        else:
+            columns.extend(prefix + column for column in field.only)
+            selects.extend(prefix + relation for relation in field.select)
+            getters.append((name, field.get))
+
+    def serialize(obj):
+        return {name: get(obj) for name, get in getters}
+    return serialize
+
+
+def plan_queryset(resource, tree, nested=False, queryset=None):
+    """Return (queryset, serialize) loading exactly what ``tree`` asks for"""
+    query = ([], [], [])
+    serialize = _plan(resource, tree, nested, '', query)
+    columns, selects, prefetches = query
+    if queryset is None:
+        queryset = resource.get_queryset()
+    # The keyset cursor is read from the last row of each page
+    columns = [resource.model._meta.pk.name, resource.time_field, *columns]
+    queryset = queryset.only(*dict.fromkeys(columns))
+    if selects:
+        queryset = queryset.select_related(*dict.fromkeys(selects))
+    if prefetches:
+        queryset = queryset.prefetch_related(*prefetches)
+    return queryset, serialize
+
+
+def filter_queryset(resource, queryset, params):
+    lookups = {
+        resource.filters[param]: value
+        for param, value in params.items()
+        if param in resource.filters
+    }
+    if not lookups:
+        return queryset
+    try:
+        return queryset.filter(**lookups)
+    except (ValueError, TypeError) as e:
+        raise ApiError('Invalid filter value') from e
+
+
+def parse_limit(value):
+    try:
+        return min(max(int(value), 1), MAX_LIMIT)
+    except (TypeError, ValueError):
+        return DEFAULT_LIMIT
+
+
+# ========== RENDERING ==========
+
+def iter_page(resource, params):
+    """
+    JSON for one keyset page of ``resource``, yielded in chunks.
+
+    Planning errors are raised before the first chunk so callers can still
+    answer with a 400.
+    """
+    queryset, serialize = plan_queryset(resource, parse_fields(params.get('fields', '')))
+    queryset = filter_queryset(resource, queryset, params)
+    queryset = keyset_filter(queryset, params.get('cursor'), resource.time_field)
+    limit = parse_limit(params.get('limit'))
+    rows = queryset[:limit + 1].iterator(chunk_size=min(CHUNK_SIZE, limit + 1))
+    return _render_page(rows, serialize, resource.time_field, limit)
+
+
+def _render_page(rows, serialize, time_field, limit):
+    encoder = DjangoJSONEncoder()
+    yield '{"results": ['
+    next_cursor, last = None, None
+    for position, obj in enumerate(rows):
+        if position == limit:
+            next_cursor = encode_cursor(getattr(last, time_field), last.pk)
+            break
+        yield (',' if position else '') + encoder.encode(serialize(obj))
+        last = obj
+    yield '], "next_cursor": ' + json.dumps(next_cursor) + '}'
+
+
+def get_object(resource, pk, params):
+    """Serialized ``resource`` with primary key ``pk``, or None"""
+    queryset, serialize = plan_queryset(resource, parse_fields(params.get('fields', '')))
+    obj = queryset.filter(pk=pk).first()
+    return None if obj is None else serialize(obj)
@@ -0,0 +1,198 @@
+"""
+In-memory prefix indexes for autocomplete.
+
+A ``PrefixIndex`` keeps (key, entry) pairs in sorted arrays and answers
+prefix queries with ``bisect``. Each process holds its own copy; a version
+number in the shared cache tells processes when to rebuild, and the process
+that made a change patches its copy in place. Indexes also rebuild every
+INDEX_MAX_AGE seconds, which picks up slowly changing scores.
+
+``suggest()`` answers the search box from the post title, author, category
+and tag indexes. Only names and scores are loaded, never post content.
+"""
+import bisect
+import threading
+import time
+
+from django.core.cache import cache
+
+from django.db.models import Count
+
+from .models import Category, Post, Tag
+
+INDEX_MAX_AGE = 300
+# Cap on how many prefix matches are ranked per query
+MAX_SCAN = 2000
+
+
+def normalize(text):
+    return ' '.join(text.lower().split())
+
+
+class PrefixIndex:
+    """Sorted-array prefix index; entries are dicts with a ``score`` key"""
+
+    def __init__(self, items=()):
+        pairs = sorted(
+            ((key, entry) for entry in items for key in self.keys_for(entry)),
+            key=lambda pair: pair[0],
+        )
+        self.keys = [key for key, _ in pairs]
+        self.entries = [entry for _, entry in pairs]
+
+    @staticmethod
+    def keys_for(entry):
+        """Index the full name and every word after the first"""
+        name = normalize(entry['name'])
+        keys = {name}
+        keys.update(word for word in name.split(' ')[1:] if word)
+        return keys
+
+    def add(self, entry):
+        for key in self.keys_for(entry):
+            position = bisect.bisect_left(self.keys, key)
+            self.keys.insert(position, key)
+            self.entries.insert(position, entry)
+
+    def remove(self, entry_id):
+        kept = [(k, e) for k, e in zip(self.keys, self.entries) if e['id'] != entry_id]
+        self.keys = [k for k, _ in kept]
+        self.entries = [e for _, e in kept]
+
+    def search(self, prefix, limit=10):
+        prefix = normalize(prefix)
+        if not prefix:
+            return []
+        start = bisect.bisect_left(self.keys, prefix)
+        end = bisect.bisect_right(self.keys, prefix + '\uffff', lo=start)
+        matches = {}
+        for entry in self.entries[start:min(end, start + MAX_SCAN)]:
+            matches[entry['id']] = entry
+        ranked = sorted(matches.values(), key=lambda e: (-e['score'], e['name'].lower()))
+        return ranked[:limit]
+
+    def __len__(self):
+        return len(self.keys)
+
+
+class SharedIndex:
+    """A process-local PrefixIndex kept in step with a cache version"""
+
+    def __init__(self, name, loader):
+        self.name = name
+        self.loader = loader
+        self.version_key = f'autocomplete:{name}:version'
+        self._lock = threading.Lock()
+        self._index = None
+        self._version = None
+        self._built_at = 0
+
+    def _shared_version(self):
+        version = cache.get(self.version_key)
+        if version is None:
+            cache.add(self.version_key, 1, None)
+            version = cache.get(self.version_key, 1)
+        return version
+
+    def get(self):
+        version = self._shared_version()
+        stale = time.monotonic() - self._built_at > INDEX_MAX_AGE
+        if self._index is None or version != self._version or stale:
+            with self._lock:
+                if self._index is None or version != self._version or stale:
+                    self._index = PrefixIndex(self.loader())
+                    self._version = version
+                    self._built_at = time.monotonic()
+        return self._index
+
+    def _bump(self):
+        try:
+            return cache.incr(self.version_key)
+        except ValueError:
+            cache.set(self.version_key, 1, None)
+            return 1
+
+    def upsert(self, entry):
+        """Patch this process's index and tell other processes to rebuild"""
+        with self._lock:
+            version = self._bump()
+            if self._index is not None and self._version == version - 1:
+                # A rename keeps the usage score the entry already had
+                old = next((e for e in self._index.entries if e['id'] == entry['id']), None)
+                if old is not None:
+                    entry = {**entry, 'score': old['score']}
+                self._index.remove(entry['id'])
+                self._index.add(entry)
+                self._version = version
+
+    def delete(self, entry_id):
+        with self._lock:
+            version = self._bump()
+            if self._index is not None and self._version == version - 1:
+                self._index.remove(entry_id)
+                self._version = version
+
+    def invalidate(self):
+        """Rebuild every process's copy on its next lookup"""
+        with self._lock:
+            self._bump()
+
+    def search(self, prefix, limit=10):
+        return self.get().search(prefix, limit)
+
+
+def _load_tags():
+    tags = Tag.objects.values_list('id', 'name', 'slug', 'published_post_count')
+    return [
+        {'id': pk, 'name': name, 'slug': slug, 'score': usage}
+        for pk, name, slug, usage in tags.iterator()
+    ]
+
+
+def _load_categories():
+    categories = Category.objects.values_list('id', 'name', 'slug', 'published_post_count')
+    return [
+        {'id': pk, 'name': name, 'slug': slug, 'score': usage}
+        for pk, name, slug, usage in categories.iterator()
+    ]
+
+
+tag_index = SharedIndex('tags', _load_tags)
+category_index = SharedIndex('categories', _load_categories)
+
+
+def _load_posts():
+    posts = Post.objects.filter(status='published').values_list('id', 'title', 'views_count').order_by()
+    return [
+        {'id': pk, 'name': title, 'score': views}
+        for pk, title, views in posts.iterator()
+    ]
+
+
+def _load_authors():
+    authors = (
+        Post.objects.filter(status='published')
+        .values_list('author_id', 'author__username')
+        .annotate(n=Count('pk'))
+        .order_by()
+    )
+    return [
+        {'id': pk, 'name': username, 'score': n}
+        for pk, username, n in authors.iterator()
+    ]
+
+
+post_index = SharedIndex('posts', _load_posts)
+author_index = SharedIndex('authors', _load_authors)
+
+SUGGESTION_INDEXES = {
+    'posts': post_index,
+    'authors': author_index,
+    'categories': category_index,
+    'tags': tag_index,
+}
+
+
+def suggest(prefix, limit=5):
+    """Top ``limit`` matches for ``prefix`` from each suggestion index"""
+    return {kind: index.search(prefix, limit) for kind, index in SUGGESTION_INDEXES.items()}
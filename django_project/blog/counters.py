@@ -0,0 +1,90 @@
+"""
+Denormalized counts: published posts on Category and Tag, approved
+comments on Post.
+
+Signal handlers call ``adjust_*`` with +1/-1 deltas as posts are published,
+unpublished, re-categorized, retagged or deleted, and as comments are
+approved or removed; ``recount_*`` rebuilds the columns from scratch with
+one UPDATE per table.
+"""
+from django.db.models import Case, Count, F, IntegerField, OuterRef, Subquery, Value, When
+from django.db.models.functions import Coalesce
+
+from .models import Post, Category, Tag, Comment
+
+TagThrough = Post.tags.through
+
+
+def adjust_categories(category_ids, delta):
+    for category_id in category_ids:
+        if category_id:
+            Category.objects.filter(pk=category_id).update(
+                published_post_count=F('published_post_count') + delta
+            )
+
+
+def adjust_tags(tag_ids, delta):
+    if tag_ids:
+        Tag.objects.filter(pk__in=tag_ids).update(
+            published_post_count=F('published_post_count') + delta
+        )
+
+
+def adjust_for_posts(post_ids, delta):
+    """Apply ``delta`` for each post in ``post_ids`` to its category and tags"""
+    categories = Post.objects.filter(pk__in=post_ids, category__isnull=False).values(
+        'category_id'
+    ).annotate(n=Count('pk')).order_by()
+    for row in categories:
+        Category.objects.filter(pk=row['category_id']).update(
+            published_post_count=F('published_post_count') + delta * row['n']
+        )
+
+    tags = TagThrough.objects.filter(post_id__in=post_ids).values(
+        'tag_id'
+    ).annotate(n=Count('pk')).order_by()
+    for row in tags:
+        Tag.objects.filter(pk=row['tag_id']).update(
+            published_post_count=F('published_post_count') + delta * row['n']
+        )
+
+
+def recount_categories():
+    published = Post.objects.filter(
+        category=OuterRef('pk'), status='published'
+    ).order_by().values('category').annotate(n=Count('pk')).values('n')
+    return Category.objects.update(
+        published_post_count=Coalesce(Subquery(published, output_field=IntegerField()), 0)
+    )
+
+
+def recount_tags():
+    published = TagThrough.objects.filter(
+        tag=OuterRef('pk'), post__status='published'
+    ).order_by().values('tag').annotate(n=Count('pk')).values('n')
+    return Tag.objects.update(
+        published_post_count=Coalesce(Subquery(published, output_field=IntegerField()), 0)
+    )
+
+
+def adjust_comment_counts(deltas):
+    """Apply {post_id: delta} to approved_comment_count in one UPDATE"""
+    deltas = {post_id: delta for post_id, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    Post.objects.filter(pk__in=deltas).update(
+        approved_comment_count=F('approved_comment_count') + Case(
+            *[When(pk=post_id, then=Value(delta)) for post_id, delta in deltas.items()],
+            default=Value(0),
+            output_field=IntegerField(),
+        )
+    )
+
+
+def recount_comments():
+    approved = Comment.objects.filter(
+        post=OuterRef('pk'), is_approved=True
+    ).order_by().values('post').annotate(n=Count('pk')).values('n')
+    return Post.objects.update(
+        approved_comment_count=Coalesce(Subquery(approved, output_field=IntegerField()), 0)
+    )
@@ -0,0 +1,93 @@
+"""
+Keyset (cursor) pagination.
+
+Listings ordered newest first by a timestamp are paged with an opaque
+cursor holding the last row's (timestamp, pk), so page N costs the same as
+page 1 instead of an ever-growing OFFSET. Change feeds read oldest first
+(``keyset_after``); their cursors may also name the kind of the last row
+when several tables are merged into one feed.
+"""
+import base64
+from datetime import datetime
+
+from django.db.models import Q
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(timestamp, *keys):
+    """Opaque cursor for a timestamp and any tiebreaker keys (pk, kind...)"""
+    raw = '|'.join([timestamp.isoformat(), *map(str, keys)])
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Return (timestamp, pk or None); raise InvalidCursor on bad input"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        raw = base64.urlsafe_b64decode(padded.encode('ascii')).decode('utf-8')
+        timestamp, _, pk = raw.partition('|')
+        return datetime.fromisoformat(timestamp), int(pk) if pk else None
+    except (ValueError, UnicodeError) as e:
+        raise InvalidCursor('Invalid cursor') from e
+
+
+def decode_feed_cursor(cursor):
+    """
+    Return (timestamp, kind, pk) of a change-feed cursor; kind and pk are
+    None for a bare timestamp. Raise InvalidCursor on bad input.
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        parts = base64.urlsafe_b64decode(padded.encode('ascii')).decode('utf-8').split('|')
+        if len(parts) == 1:
+            return datetime.fromisoformat(parts[0]), None, None
+        timestamp, kind, pk = parts
+        return datetime.fromisoformat(timestamp), kind, int(pk)
+    except (ValueError, UnicodeError) as e:
+        raise InvalidCursor('Invalid cursor') from e
+
+
+def keyset_after(queryset, timestamp=None, pk=None, time_field='created_at'):
+    """
+    Order ``queryset`` by time_field, pk and start after (timestamp, pk).
+
+    With ``pk`` None, rows at exactly ``timestamp`` are skipped too.
+    """
+    queryset = queryset.order_by(time_field, 'pk')
+    if timestamp is None:
+        return queryset
+    after = Q(**{f'{time_field}__gt': timestamp})
+    if pk is not None:
+        after |= Q(**{time_field: timestamp, 'pk__gt': pk})
+    return queryset.filter(after)
+
+
+def keyset_filter(queryset, cursor=None, time_field='created_at'):
+    """Order ``queryset`` by -time_field, -pk and start after ``cursor``"""
+    queryset = queryset.order_by(f'-{time_field}', '-pk')
+    if cursor:
+        timestamp, pk = decode_cursor(cursor)
+        if pk is None:
+            raise InvalidCursor('Invalid cursor')
+        queryset = queryset.filter(
+            Q(**{f'{time_field}__lt': timestamp}) | Q(**{time_field: timestamp, 'pk__lt': pk})
+        )
+    return queryset
+
+
+def paginate_keyset(queryset, cursor=None, limit=20, time_field='created_at'):
+    """
+    Return (items, next_cursor) for ``queryset`` ordered by -time_field, -pk.
+
+    ``next_cursor`` is None on the last page.
+    """
+    queryset = keyset_filter(queryset, cursor, time_field)
+    items = list(queryset[:limit + 1])
+    if len(items) <= limit:
+        return items, None
+    items = items[:limit]
+    last = items[-1]
+    return items, encode_cursor(getattr(last, time_field), last.pk)
@@ -0,0 +1,119 @@
+"""
+Per-user engagement state (liked, bookmarked, following the author) for a
+page of posts.
+
+States for a whole page are looked up with one query per relation instead
+of a query per card, and cached briefly per user. Cache keys include a
+per-user version that every like/bookmark/follow toggle bumps, so a toggle
+is visible on the next request even though the entries themselves are not
+deleted one by one.
+"""
+from django.core.cache import cache
+
+from .models import Post, Like, Bookmark, Follow
+
+ENGAGEMENT_CACHE_TIMEOUT = 30
+
+EMPTY_STATE = {'liked': False, 'bookmarked': False, 'following_author': False}
+
+
+def _version_key(user_id):
+    return f'engagement:{user_id}:version'
+
+
+def _state_key(user_id, version, post_id):
+    return f'engagement:{user_id}:{version}:{post_id}'
+
+
+def _user_version(user_id):
+    version = cache.get(_version_key(user_id))
+    if version is None:
+        cache.add(_version_key(user_id), 1, None)
+        version = cache.get(_version_key(user_id), 1)
+    return version
+
+
+def invalidate(user):
+    """Drop every cached state for ``user``; call after a toggle"""
+    try:
+        cache.incr(_version_key(user.pk))
+    except ValueError:
+        cache.set(_version_key(user.pk), 1, None)
+
+
+def _lookup(user_id, author_ids):
+    """States for {post_id: author_id}: three queries, whatever the page size"""
+    post_ids = list(author_ids)
+    liked = set(Like.objects.filter(
+        user_id=user_id, post_id__in=post_ids
+    ).values_list('post_id', flat=True))
+    bookmarked = set(Bookmark.objects.filter(
+        user_id=user_id, post_id__in=post_ids
+    ).values_list('post_id', flat=True))
+    followed = set(Follow.objects.filter(
+        follower_id=user_id, following_id__in=set(author_ids.values())
+    ).values_list('following_id', flat=True))
+    return {
+        post_id: {
+            'liked': post_id in liked,
+            'bookmarked': post_id in bookmarked,
+            'following_author': author_id in followed,
+        }
+        for post_id, author_id in author_ids.items()
+    }
+
+
+def get_engagement(user, posts):
+    """
+    Return {post_id: state} for ``posts`` (Post instances or ids).
+
+    Anonymous users get empty states without touching the database.
+    """
+    posts = list(posts)
+    if not posts:
+        return {}
+    post_ids = [getattr(post, 'pk', post) for post in posts]
+    if not user.is_authenticated:
+        return {post_id: dict(EMPTY_STATE) for post_id in post_ids}
+
+    version = _user_version(user.pk)
+    keys = {_state_key(user.pk, version, post_id): post_id for post_id in post_ids}
+    states = {keys[key]: state for key, state in cache.get_many(list(keys)).items()}
+
+    missing = [post for post in posts if getattr(post, 'pk', post) not in states]
+    if missing:
+        author_ids = {
+            post.pk: post.author_id for post in missing if isinstance(post, Post)
+        }
+        bare_ids = [post for post in missing if not isinstance(post, Post)]
+        if bare_ids:
+            author_ids.update(
+                Post.objects.filter(pk__in=bare_ids).values_list('pk', 'author_id')
+            )
+        fresh = _lookup(user.pk, author_ids)
+        cache.set_many(
+            {_state_key(user.pk, version, post_id): state for post_id, state in fresh.items()},
+            ENGAGEMENT_CACHE_TIMEOUT,
+        )
+        states.update(fresh)
+
+    # Ids that do not belong to a post get an empty state
+    return {post_id: states.get(post_id, dict(EMPTY_STATE)) for post_id in post_ids}
+
+
+def attach_engagement(user, posts):
+    """Set ``post.engagement`` on each post; returns the states by id"""
+    posts = list(posts)
+    states = get_engagement(user, posts)
+    for post in posts:
+        post.engagement = states[post.pk]
+    return states
+
+
+class EngagementMixin:
+    """ListView mixin: ``post.engagement`` on every post of the page"""
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['engagement'] = attach_engagement(self.request.user, context['object_list'])
+        return context
@@ -0,0 +1,268 @@
+"""
+Engagement event log.
+
+Views, likes, bookmarks and approved comments are appended to
+``EngagementEvent``. Each process buffers events in memory and writes them
+with one bulk_create per EVENT_BATCH_SIZE events, or EVENT_FLUSH_SECONDS
+after the first buffered one, on a background thread. A crash loses at
+most one unflushed batch, which is acceptable for popularity data.
+
+``rollup()`` (``manage.py rollup_engagement``) folds new events into
+hourly and daily ``EngagementBucket`` rows per post and per author.
+Windowed popularity and author dashboards read those small tables instead
+of the raw log. Events are rolled up in id order once they are older than
+ROLLUP_LAG, so a batch that is still being inserted is never skipped.
+"""
+import atexit
+import logging
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import F, IntegerField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import Comment, EngagementBucket, EngagementEvent, RollupState
+
+logger = logging.getLogger(__name__)
+
+EVENT_BATCH_SIZE = getattr(settings, 'ENGAGEMENT_EVENT_BATCH_SIZE', 200)
+EVENT_FLUSH_SECONDS = getattr(settings, 'ENGAGEMENT_EVENT_FLUSH_SECONDS', 5.0)
+ROLLUP_BATCH_SIZE = 20000
+ROLLUP_LAG = timedelta(minutes=1)
+ROLLUP_NAME = 'engagement'
+# Windows shorter than this are read from hourly buckets
+HOURLY_WINDOW_LIMIT = timedelta(days=2)
+
+# Popularity score of each counted action
+SCORE_WEIGHTS = getattr(settings, 'ENGAGEMENT_SCORE_WEIGHTS', {
+    'views': 1, 'likes': 5, 'bookmarks': 3, 'comments': 4,
+})
+
+# Bucket column each kind adds to, and by how much
+KIND_COLUMNS = {
+    EngagementEvent.VIEW: ('views', 1),
+    EngagementEvent.LIKE: ('likes', 1),
+    EngagementEvent.UNLIKE: ('likes', -1),
+    EngagementEvent.BOOKMARK: ('bookmarks', 1),
+    EngagementEvent.UNBOOKMARK: ('bookmarks', -1),
+    EngagementEvent.COMMENT: ('comments', 1),
+}
+COLUMNS = ('views', 'likes', 'bookmarks', 'comments')
+
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='events')
+_lock = threading.Lock()
+_buffer = []
+_timer = None
+
+
+# ========== RECORDING ==========
+
+def _write(events):
+    try:
+        EngagementEvent.objects.bulk_create(events, batch_size=EVENT_BATCH_SIZE)
+    except Exception:
+        logger.exception('Writing %s engagement events failed', len(events))
+    finally:
+        close_old_connections()
+
+
+def _take():
+    global _buffer, _timer
+    with _lock:
+        events, _buffer = _buffer, []
+        if _timer is not None:
+            _timer.cancel()
+            _timer = None
+    return events
+
+
+def _flush_in_background():
+    events = _take()
+    if events:
+        _executor.submit(_write, events)
+
+
+def record(kind, post_id, author_id):
+    """Buffer one event; the batch is written off the request path"""
+    global _timer
+    event = EngagementEvent(kind=kind, post_id=post_id, author_id=author_id, created_at=timezone.now())
+    with _lock:
+        _buffer.append(event)
+        full = len(_buffer) >= EVENT_BATCH_SIZE
+        if not full and _timer is None:
+            _timer = threading.Timer(EVENT_FLUSH_SECONDS, _flush_in_background)
+            _timer.daemon = True
+            _timer.start()
+    if full:
+        _flush_in_background()
+
+
+def record_post(kind, post):
+    record(kind, post.pk, post.author_id)
+
+
+def comments_approved(comment_ids):
+    rows = Comment.objects.filter(pk__in=comment_ids).values_list('post_id', 'post__author_id')
+    for post_id, author_id in rows:
+        record(EngagementEvent.COMMENT, post_id, author_id)
+
+
+def flush():
+    """Write buffered events now, on this thread"""
+    events = _take()
+    if events:
+        _write(events)
+
+
+atexit.register(flush)
+
+
+# ========== ROLLUP ==========
+
+def _truncate(moment, granularity):
+    # Hours and days start on the site's clock (TIME_ZONE), not UTC's
+    moment = timezone.localtime(moment).replace(minute=0, second=0, microsecond=0)
+    if granularity == EngagementBucket.DAY:
+        moment = moment.replace(hour=0)
+    return moment
+
+
+def _aggregate(rows):
+    """{(scope, granularity, object_id, bucket): {column: delta}} for event rows"""
+    totals = defaultdict(lambda: dict.fromkeys(COLUMNS, 0))
+    for kind, post_id, author_id, created_at in rows:
+        column, delta = KIND_COLUMNS[kind]
+        for granularity in (EngagementBucket.HOUR, EngagementBucket.DAY):
+            bucket = _truncate(created_at, granularity)
+            totals[(EngagementBucket.POST, granularity, post_id, bucket)][column] += delta
+            totals[(EngagementBucket.AUTHOR, granularity, author_id, bucket)][column] += delta
+    return totals
+
+
+def _merge(totals):
+    """Add ``totals`` to the existing buckets with one upsert"""
+    groups = defaultdict(lambda: (set(), set()))
+    for scope, granularity, object_id, bucket in totals:
+        object_ids, buckets = groups[(scope, granularity)]
+        object_ids.add(object_id)
+        buckets.add(bucket)
+    existing = {}
+    for (scope, granularity), (object_ids, buckets) in groups.items():
+        # A superset of the keys; only exact matches are used
+        for row in EngagementBucket.objects.filter(
+            scope=scope, granularity=granularity, object_id__in=object_ids, bucket__in=buckets,
+        ):
+            existing[(row.scope, row.granularity, row.object_id, row.bucket)] = row
+    rows = []
+    for key, deltas in totals.items():
+        row = existing.get(key) or EngagementBucket(
+            scope=key[0], granularity=key[1], object_id=key[2], bucket=key[3],
+        )
+        for column, delta in deltas.items():
+            setattr(row, column, getattr(row, column) + delta)
+        rows.append(row)
+    EngagementBucket.objects.bulk_create(
+        rows,
+        batch_size=1000,
+        update_conflicts=True,
+        unique_fields=['scope', 'granularity', 'object_id', 'bucket'],
+        update_fields=list(COLUMNS),
+    )
+
+
+def rollup(batch_size=ROLLUP_BATCH_SIZE):
+    """
+    Fold the next batch of settled events into the buckets.
+
+    Returns the number of events rolled up. The state row is locked, so
+    concurrent rollups take turns instead of counting events twice.
+    """
+    cutoff = timezone.now() - ROLLUP_LAG
+    with transaction.atomic():
+        RollupState.objects.get_or_create(name=ROLLUP_NAME)
+        state = RollupState.objects.select_for_update().get(name=ROLLUP_NAME)
+        events = EngagementEvent.objects.filter(pk__gt=state.last_id).order_by('pk').values_list(
+            'pk', 'kind', 'post_id', 'author_id', 'created_at'
+        )[:batch_size]
+
+        rows = []
+        last_id = state.last_id
+        for pk, kind, post_id, author_id, created_at in events:
+            if created_at >= cutoff:
+                break
+            rows.append((kind, post_id, author_id, created_at))
+            last_id = pk
+        if not rows:
+            return 0
+
+        totals = list(_aggregate(rows).items())
+        for start in range(0, len(totals), 1000):
+            _merge(dict(totals[start:start + 1000]))
+        state.last_id = last_id
+        state.save(update_fields=['last_id', 'updated_at'])
+    return len(rows)
+
+
+def prune(older_than):
+    """Delete rolled-up events older than ``older_than``; return how many"""
+    state = RollupState.objects.filter(name=ROLLUP_NAME).first()
+    if state is None:
+        return 0
+    deleted, _ = EngagementEvent.objects.filter(
+        pk__lte=state.last_id, created_at__lt=timezone.now() - older_than,
+    ).delete()
+    return deleted
+
+
+# ========== READING ==========
+
+def score_expression(prefix=''):
+    return sum(
+        (F(f'{prefix}{column}') * weight for column, weight in SCORE_WEIGHTS.items()),
+        Value(0, output_field=IntegerField()),
+    )
+
+
+def window_buckets(scope, window):
+    """Buckets of ``scope`` covering the last ``window``"""
+    granularity = EngagementBucket.HOUR if window < HOURLY_WINDOW_LIMIT else EngagementBucket.DAY
+    since = _truncate(timezone.now() - window, granularity)
+    return EngagementBucket.objects.filter(scope=scope, granularity=granularity, bucket__gte=since)
+
+
+def popularity_subquery(window=timedelta(days=7)):
+    """Post score over ``window`` for annotating a Post queryset"""
+    scores = (
+        window_buckets(EngagementBucket.POST, window)
+        .filter(object_id=OuterRef('pk'))
+        .values('object_id')
+        .annotate(score=Sum(score_expression()))
+        .values('score')
+    )
+    return Coalesce(Subquery(scores, output_field=IntegerField()), 0)
+
+
+def popular_post_ids(window=timedelta(days=7), limit=10):
+    """Ids of the highest scoring posts over ``window``"""
+    return list(
+        window_buckets(EngagementBucket.POST, window)
+        .values('object_id')
+        .annotate(score=Sum(score_expression()))
+        .order_by('-score')
+        .values_list('object_id', flat=True)[:limit]
+    )
+
+
+def author_series(author_id, granularity=EngagementBucket.DAY, since=None):
+    """An author's buckets, oldest first, as dicts"""
+    buckets = EngagementBucket.objects.filter(
+        scope=EngagementBucket.AUTHOR, granularity=granularity, object_id=author_id,
+    )
+    if since is not None:
+        buckets = buckets.filter(bucket__gte=_truncate(since, granularity))
+    return list(buckets.order_by('bucket').values('bucket', *COLUMNS))
@@ -0,0 +1,31 @@
+from django.contrib.syndication.views import Feed
+from django.urls import reverse_lazy
+
+from .models import Post
+
+
+class LatestPostsFeed(Feed):
+    title = 'TechBlog'
+    link = reverse_lazy('blog-home')
+    description = 'Latest posts from TechBlog'
+
+    def items(self):
+        # Stored HTML only; the raw content is never loaded
+        return Post.objects.filter(status='published').select_related('author').only(
+            'pk', 'title', 'content_html', 'date_posted', 'date_updated', 'author__username'
+        ).order_by('-date_posted')[:20]
+
+    def item_title(self, item):
+        return item.title
+
+    def item_description(self, item):
+        return item.content_html
+
+    def item_author_name(self, item):
+        return item.author.username
+
+    def item_pubdate(self, item):
+        return item.date_posted
+
+    def item_updateddate(self, item):
+        return item.date_updated
@@ -1,6 +1,6 @@
 from django import forms
 from django.core.exceptions import ValidationError
-from .models import Post, Comment, Newsletter, ContactMessage
+from .models import Post, Category, Tag, Comment, Newsletter, ContactMessage
 
 
 class PostForm(forms.ModelForm):
@@ -16,6 +16,7 @@ class PostForm(forms.ModelForm):
             'category',
             'tags',
             'status',
+            'publish_date',
             'is_featured',
             'is_pinned',
             'allow_comments',
@@ -45,12 +46,23 @@ class PostForm(forms.ModelForm):
                 'accept': 'image/*'
             }),
             'category': forms.Select(attrs={
-                'class': 'form-control'
+                'class': 'form-control',
+                'data-autocomplete': 'category',
+                'form': 'postForm'
+            }),
+            'tags': forms.SelectMultiple(attrs={
+                'class': 'form-control',
+                'data-autocomplete': 'tag',
+                'form': 'postForm'
             }),
-            'tags': forms.CheckboxSelectMultiple(),
             'status': forms.Select(attrs={
                 'class': 'form-control'
             }),
+            'publish_date': forms.DateTimeInput(attrs={
+                'class': 'form-control',
+                'type': 'datetime-local',
+                'form': 'postForm'
+            }, format='%Y-%m-%dT%H:%M'),
             'meta_description': forms.Textarea(attrs={
                 'class': 'form-control',
                 'placeholder': 'SEO meta description...',
@@ -76,9 +88,35 @@ class PostForm(forms.ModelForm):
             'excerpt': 'This appears in previews and search results (auto-generated if left blank)',
             'featured_image': 'Recommended size: 1200x630px (will be auto-resized)',
             'meta_description': 'Brief description for search engines (160 characters max)',
+            'publish_date': 'Leave blank to publish immediately',
             'tags': 'Select relevant tags for better discoverability',
         }
     
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Only render the selected category/tags; others are found through
+        # taxonomy_autocomplete, so the form doesn't grow with the taxonomy
+        category_ids = self._selected_ids('category')
+        self.fields['category'].widget.choices = [('', '---------')] + list(
+            Category.objects.filter(pk__in=category_ids).values_list('pk', 'name')
+        )
+        self.fields['tags'].widget.choices = list(
+            Tag.objects.filter(pk__in=self._selected_ids('tags')).values_list('pk', 'name')
+        )
+
+    def _selected_ids(self, name):
+        if self.is_bound:
+            values = self.data.getlist(self.add_prefix(name)) if hasattr(self.data, 'getlist') \
+                else self.data.get(self.add_prefix(name))
+        else:
+            values = self.initial.get(name)
+        if values in (None, ''):
+            return []
+        if not isinstance(values, (list, tuple)):
+            values = [values]
+        ids = [getattr(value, 'pk', value) for value in values]
+        return [pk for pk in ids if str(pk).isdigit()]
+
     def clean_title(self):
         """Validate title"""
         title = self.cleaned_data.get('title')
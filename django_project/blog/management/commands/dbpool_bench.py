@@ -0,0 +1,135 @@
+import json
+import statistics
+import threading
+import time
+
+import dj_database_url
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError, connections
+from django.db.backends.signals import connection_created
+
+from django_project import dbpool
+
+BENCH_ALIAS = 'dbpool_bench'
+
+
+def _percentile(values, fraction):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(int(len(values) * fraction), len(values) - 1)]
+
+
+def _worker(alias, query, queries, deadline, latencies, errors):
+    conn = connections[alias]
+    while time.time() < deadline:
+        started = time.perf_counter()
+        try:
+            # One request: connect (or check out), run the queries, then what
+            # request_finished does through close_old_connections()
+            conn.close_if_unusable_or_obsolete()
+            with conn.cursor() as cursor:
+                for _ in range(queries):
+                    cursor.execute(query)
+                    cursor.fetchall()
+            conn.close_if_unusable_or_obsolete()
+        except DatabaseError:
+            # Pool timeouts and dropped connections
+            errors.append(1)
+            conn.close()
+            continue
+        latencies.append(time.perf_counter() - started)
+    conn.close()
+
+
+class Command(BaseCommand):
+    help = 'Threaded request benchmark against PostgreSQL: new connections vs CONN_MAX_AGE vs connection pool'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', help='PostgreSQL URL (default: DATABASE_URL)')
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--duration', type=float, default=5.0, help='Seconds per mode')
+        parser.add_argument('--queries', type=int, default=3, help='Queries per simulated request')
+        parser.add_argument('--query', default='SELECT 1')
+        parser.add_argument('--pool-size', type=int, default=None, help='max_size of the pool (default: --threads)')
+        parser.add_argument('--json', action='store_true', help='Print results as JSON only')
+
+    def handle(self, *args, **options):
+        config = dj_database_url.parse(options['url']) if options['url'] else dj_database_url.config()
+        if not config or config.get('ENGINE') != 'django.db.backends.postgresql':
+            raise CommandError('dbpool_bench needs a PostgreSQL database (--url or DATABASE_URL)')
+
+        pool_size = options['pool_size'] or options['threads']
+        modes = {
+            'conn_max_age_0': {'CONN_MAX_AGE': 0},
+            'conn_max_age_600': {'CONN_MAX_AGE': 600, 'CONN_HEALTH_CHECKS': True},
+            'pool': {
+                'CONN_MAX_AGE': 0,
+                'CONN_HEALTH_CHECKS': dbpool.POOL_CHECK,
+                'OPTIONS': {'pool': dbpool.pool_options(min_size=pool_size, max_size=pool_size)},
+            },
+        }
+        report = {}
+        for mode, overrides in modes.items():
+            report[mode] = self._run({**config, **overrides}, options)
+
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+
+        self.stdout.write(f"{'mode':<18}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'connects':>10}{'errors':>8}")
+        for mode, result in report.items():
+            self.stdout.write(
+                f"{mode:<18}{result['requests_per_sec']:>10.0f}{result['p50_ms']:>10.2f}"
+                f"{result['p95_ms']:>10.2f}{result['connections_opened']:>10}{result['errors']:>8}"
+            )
+
+    def _run(self, config, options):
+        # configure_settings() fills in the defaults and insists on 'default'
+        connections.settings[BENCH_ALIAS] = connections.configure_settings(
+            {**connections.settings, BENCH_ALIAS: config}
+        )[BENCH_ALIAS]
+        opened = []
+
+        def count(sender, connection, **kwargs):
+            if connection.alias == BENCH_ALIAS:
+                opened.append(1)
+
+        connection_created.connect(count)
+        latencies, errors = [], []
+        deadline = time.time() + options['duration']
+        threads = [
+            threading.Thread(
+                target=_worker,
+                args=(BENCH_ALIAS, options['query'], options['queries'], deadline, latencies, errors),
+            )
+            for _ in range(options['threads'])
+        ]
+        try:
+            # Loads the backend here, so a missing psycopg fails loudly
+            connections[BENCH_ALIAS]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            pool = dbpool.opened_pool(connections[BENCH_ALIAS])
+            pool_stats = dbpool.pool_stats()['pools'].get(BENCH_ALIAS) if pool is not None else None
+        finally:
+            connection_created.disconnect(count)
+            if dbpool.opened_pool(connections[BENCH_ALIAS]) is not None:
+                connections[BENCH_ALIAS].close_pool()
+            connections[BENCH_ALIAS].close()
+            del connections[BENCH_ALIAS]
+            del connections.settings[BENCH_ALIAS]
+
+        return {
+            'requests': len(latencies),
+            'requests_per_sec': len(latencies) / options['duration'],
+            'p50_ms': _percentile(latencies, 0.50) * 1000,
+            'p95_ms': _percentile(latencies, 0.95) * 1000,
+            'mean_ms': statistics.fmean(latencies) * 1000 if latencies else 0.0,
+            # With a pool, connection_created fires on every checkout
+            'connections_opened': pool_stats['connections_opened'] if pool_stats else len(opened),
+            'errors': len(errors),
+            'pool': pool_stats,
+        }
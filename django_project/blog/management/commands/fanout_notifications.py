@@ -0,0 +1,33 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from django_project.blog import notifications
+
+
+class Command(BaseCommand):
+    help = 'Expand pending notification events into per-recipient notifications'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Drain the pending events and exit')
+        parser.add_argument(
+            '--interval', type=float, default=10.0,
+            help='Seconds to sleep when no events are pending',
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            events = delivered = 0
+            while True:
+                batch_events, batch_delivered = notifications.expand_pending()
+                events += batch_events
+                delivered += batch_delivered
+                if not batch_events:
+                    break
+            if events:
+                self.stdout.write(self.style.SUCCESS(f'Expanded {events} event(s) into {delivered} notification(s)'))
+            if options['once']:
+                return
+            close_old_connections()
+            time.sleep(options['interval'])
@@ -0,0 +1,28 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from django_project.blog import media
+
+
+class Command(BaseCommand):
+    help = 'Delete content-addressed media files that nothing references'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--grace', type=int, default=settings.MEDIA_GC_GRACE_SECONDS,
+            help='Keep files unreferenced for less than this many seconds',
+        )
+        parser.add_argument('--recount', action='store_true', help='Rebuild reference counts from the models first')
+        parser.add_argument('--scan', action='store_true', help='Also delete stored files that have no MediaFile row')
+        parser.add_argument('--dry-run', action='store_true', help='List what would be deleted without deleting it')
+
+    def handle(self, *args, **options):
+        if options['recount']:
+            changed = media.recount()
+            self.stdout.write(f'Corrected {changed} reference count(s)')
+
+        deleted = media.collect_garbage(grace=options['grace'], dry_run=options['dry_run'], scan=options['scan'])
+        for name in deleted:
+            self.stdout.write(name)
+        verb = 'Would delete' if options['dry_run'] else 'Deleted'
+        self.stdout.write(self.style.SUCCESS(f'{verb} {len(deleted)} file(s)'))
@@ -0,0 +1,58 @@
+import hashlib
+import os
+
+from django.core.management.base import BaseCommand
+
+from django_project.blog import sitemaps
+
+
+class Command(BaseCommand):
+    help = 'Write the sitemap index and shards as static files, rewriting only shards that changed'
+
+    def add_arguments(self, parser):
+        parser.add_argument('output_dir', help='Directory to write sitemap files into')
+        parser.add_argument('--base-url', required=True, help='Site root, e.g. https://example.com')
+
+    def handle(self, *args, **options):
+        output_dir = options['output_dir']
+        base_url = options['base_url'].rstrip('/')
+        os.makedirs(output_dir, exist_ok=True)
+
+        written = unchanged = 0
+        files = {}
+        for section, shard, lastmod in sitemaps.shard_index():
+            filename = f'sitemap-{section}-{shard}.xml'
+            files[filename] = sitemaps.render_shard(section, shard, base_url)
+        files['sitemap.xml'] = sitemaps.render_index(
+            base_url, lambda section, shard: f'/sitemap-{section}-{shard}.xml'
+        )
+
+        for filename, xml in files.items():
+            path = os.path.join(output_dir, filename)
+            if self._same_content(path, xml):
+                unchanged += 1
+                continue
+            tmp_path = f'{path}.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(xml)
+            os.replace(tmp_path, path)
+            written += 1
+
+        # Drop shards that no longer have any URLs
+        removed = 0
+        for filename in os.listdir(output_dir):
+            if filename.startswith('sitemap') and filename.endswith('.xml') and filename not in files:
+                os.remove(os.path.join(output_dir, filename))
+                removed += 1
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Sitemaps: {written} written, {unchanged} unchanged, {removed} removed'
+        ))
+
+    @staticmethod
+    def _same_content(path, xml):
+        if not os.path.exists(path):
+            return False
+        with open(path, 'rb') as f:
+            existing = hashlib.sha256(f.read()).digest()
+        return existing == hashlib.sha256(xml.encode('utf-8')).digest()
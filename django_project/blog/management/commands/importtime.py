@@ -0,0 +1,60 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from django_project import startup
+
+
+class Command(BaseCommand):
+    help = 'Report what a cold start imports and how long each module takes'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--target', choices=sorted(startup.TARGETS), default='wsgi',
+            help='wsgi: what a gunicorn worker loads; setup: django.setup() only; urls: setup plus the URLconf',
+        )
+        parser.add_argument('--limit', type=int, default=25, help='Modules to list')
+        parser.add_argument(
+            '--sort', choices=('cumulative', 'self'), default='cumulative',
+            help='Rank modules by time including their imports, or by their own time',
+        )
+        parser.add_argument('--json', action='store_true', help='Print results as JSON only')
+
+    def handle(self, *args, **options):
+        try:
+            profile = startup.profile_imports(options['target'])
+        except RuntimeError as e:
+            raise CommandError(str(e))
+
+        modules = profile['modules']
+        key = f"{options['sort']}_us"
+        ranked = sorted(modules, key=lambda entry: entry[key], reverse=True)[:options['limit']]
+        packages = startup.by_package(modules)
+        report = {
+            'target': options['target'],
+            'wall_seconds': round(profile['wall_seconds'], 4),
+            'module_count': len(modules),
+            'import_us': sum(entry['self_us'] for entry in modules),
+            'packages_us': packages,
+            'modules': ranked,
+        }
+
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+
+        self.stdout.write(
+            f"Cold start of '{report['target']}': {report['wall_seconds'] * 1000:.1f} ms, "
+            f"{report['module_count']} modules, {report['import_us'] / 1000:.1f} ms importing"
+        )
+        self.stdout.write('')
+        self.stdout.write(f"{'package':<32}{'self ms':>10}")
+        for package, self_us in list(packages.items())[:options['limit']]:
+            self.stdout.write(f'{package:<32}{self_us / 1000:>10.1f}')
+        self.stdout.write('')
+        self.stdout.write(f"{'module':<56}{'self ms':>10}{'cumul ms':>10}")
+        for entry in ranked:
+            name = '  ' * min(entry['depth'], 4) + entry['module']
+            self.stdout.write(
+                f"{name[:55]:<56}{entry['self_us'] / 1000:>10.1f}{entry['cumulative_us'] / 1000:>10.1f}"
+            )
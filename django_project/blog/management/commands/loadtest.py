@@ -0,0 +1,451 @@
+import http.cookiejar
+import json
+import math
+import os
+import random
+import re
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+import uuid
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import Resolver404, resolve
+
+from django_project import startup
+from django_project.blog.models import Newsletter, Post, Category, Tag
+
+USER_PREFIX = 'loadtest-'
+USER_PASSWORD = 'loadtest-password'
+DEFAULT_MIX = 'browse=70,engage=25,newsletter=5'
+SEARCH_TERMS = ('python', 'django', 'web', 'data', 'guide', 'tips')
+# Django logs every 500 as "Internal Server Error: <path>" plus the traceback
+SERVER_ERROR_RE = re.compile(r'^Internal Server Error: (\S+)$', re.MULTILINE)
+# Tracebacks of requests that failed on a database lock (SQLite) or lock
+# timeout/deadlock (PostgreSQL)
+LOCK_RE = re.compile(r'database is locked|database table is locked|deadlock detected|lock timeout')
+
+
+# ========== HTTP CLIENT ==========
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    """Report redirects instead of following them, so each request is timed alone"""
+
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        return None
+
+
+class Client:
+    """A browser-like session: cookies plus the CSRF header for POSTs"""
+
+    def __init__(self, base_url, timeout):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.cookies = http.cookiejar.CookieJar()
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(self.cookies), _NoRedirect
+        )
+
+    def cookie(self, name):
+        return next((c.value for c in self.cookies if c.name == name), None)
+
+    def request(self, method, path, data=None):
+        """Return (status, body); status is None if the request never completed"""
+        headers = {}
+        body = None
+        if method == 'POST':
+            body = urllib.parse.urlencode(data or {}).encode('utf-8')
+            headers['X-CSRFToken'] = self.cookie('csrftoken') or ''
+            headers['Referer'] = self.base_url + path
+        request = urllib.request.Request(self.base_url + path, data=body, headers=headers, method=method)
+        try:
+            with self.opener.open(request, timeout=self.timeout) as response:
+                return response.status, response.read()
+        except urllib.error.HTTPError as e:
+            return e.code, e.read()
+        except (urllib.error.URLError, OSError):
+            return None, b''
+
+    def ensure_csrf(self):
+        if self.cookie('csrftoken') is None:
+            self.request('GET', '/login/')
+
+
+# ========== SCENARIOS ==========
+
+def scenario_browse(client, data, rng, hit):
+    """Anonymous reader: a listing page, a post, then a category, tag or search"""
+    hit('blog-home', 'GET', f'/?page={rng.randint(1, data["home_pages"])}')
+    if data['posts']:
+        hit('post-detail', 'GET', f'/post/{rng.choice(data["posts"])}/')
+    choice = rng.random()
+    if choice < 0.35 and data['categories']:
+        hit('category-posts', 'GET', f'/category/{rng.choice(data["categories"])}/')
+    elif choice < 0.7 and data['tags']:
+        hit('tag-posts', 'GET', f'/tag/{rng.choice(data["tags"])}/')
+    else:
+        hit('blog-search', 'GET', f'/search/?q={rng.choice(SEARCH_TERMS)}')
+
+
+def scenario_engage(client, data, rng, hit):
+    """Logged-in reader: open a post, like it, comment, follow its author"""
+    if not data['posts']:
+        return
+    if client.cookie('sessionid') is None:
+        client.ensure_csrf()
+        hit('login', 'POST', '/login/', {
+            'username': rng.choice(data['users']),
+            'password': USER_PASSWORD,
+            'csrfmiddlewaretoken': client.cookie('csrftoken') or '',
+        })
+    post_id = rng.choice(data['posts'])
+    hit('post-detail', 'GET', f'/post/{post_id}/')
+    hit('toggle-like', 'POST', f'/post/{post_id}/like/')
+    if rng.random() < 0.3:
+        hit('add-comment', 'POST', f'/post/{post_id}/comment/', {
+            'content': f'Load test comment {uuid.uuid4().hex[:8]}',
+        })
+    if rng.random() < 0.2 and data['authors']:
+        author = urllib.parse.quote(rng.choice(data['authors']))
+        hit('toggle-follow', 'POST', f'/user/{author}/follow/')
+
+
+def scenario_newsletter(client, data, rng, hit):
+    """Anonymous visitor signing up for the newsletter from the home page"""
+    hit('blog-home', 'GET', '/')
+    client.ensure_csrf()
+    hit('newsletter-subscribe', 'POST', '/newsletter/subscribe/', {
+        'email': f'{USER_PREFIX}{uuid.uuid4().hex}@example.com',
+    })
+
+
+SCENARIOS = {
+    'browse': scenario_browse,
+    'engage': scenario_engage,
+    'newsletter': scenario_newsletter,
+}
+
+
+def run_worker(base_url, data, mix, deadline, seed, timeout):
+    """Run scenarios until ``deadline``; return raw samples per endpoint"""
+    rng = random.Random(seed)
+    client = Client(base_url, timeout)
+    names, weights = zip(*mix.items())
+    samples = {}
+
+    def hit(endpoint, method, path, params=None):
+        started = time.perf_counter()
+        status, _ = client.request(method, path, params)
+        entry = samples.setdefault(endpoint, {'latencies': [], 'errors': 0, 'statuses': {}})
+        entry['latencies'].append(time.perf_counter() - started)
+        entry['statuses'][str(status)] = entry['statuses'].get(str(status), 0) + 1
+        if status is None or status >= 400:
+            entry['errors'] += 1
+
+    while time.time() < deadline:
+        scenario = SCENARIOS[rng.choices(names, weights)[0]]
+        scenario(client, data, rng, hit)
+    return samples
+
+
+# ========== REPORT ==========
+
+def _endpoint_name(path):
+    try:
+        return resolve(path).url_name or path
+    except Resolver404:
+        return path
+
+
+def count_lock_errors(server_log):
+    """
+    Requests that failed on a database lock, per endpoint, from a server log.
+
+    Error pages only carry the exception with DEBUG on, so the count comes
+    from the tracebacks Django logs for every 500 (see LOGGING in settings).
+    """
+    counts = defaultdict(int)
+    # split() alternates text before the first error with (path, traceback) pairs
+    parts = SERVER_ERROR_RE.split(server_log)
+    for path, traceback in zip(parts[1::2], parts[2::2]):
+        if LOCK_RE.search(traceback):
+            counts[_endpoint_name(path)] += 1
+    return counts
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(pct / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def summarize(results, duration, lock_errors=None):
+    """Overall and per-endpoint stats; lock error counts are None without a server log"""
+    merged = defaultdict(lambda: {'latencies': [], 'errors': 0, 'statuses': defaultdict(int)})
+    for samples in results:
+        for endpoint, entry in samples.items():
+            target = merged[endpoint]
+            target['latencies'].extend(entry['latencies'])
+            target['errors'] += entry['errors']
+            for status, count in entry['statuses'].items():
+                target['statuses'][status] += count
+
+    def describe(latencies, errors, locked, statuses=None):
+        latencies = sorted(latencies)
+        requests = len(latencies)
+        report = {
+            'requests': requests,
+            'throughput_rps': round(requests / duration, 2),
+            'errors': errors,
+            'error_rate': round(errors / requests, 4) if requests else 0.0,
+            'db_lock_errors': locked,
+        }
+        for pct in (50, 95, 99):
+            value = percentile(latencies, pct)
+            report[f'p{pct}_ms'] = None if value is None else round(value * 1000, 2)
+        report['max_ms'] = round(latencies[-1] * 1000, 2) if latencies else None
+        if statuses is not None:
+            report['statuses'] = dict(statuses)
+        return report
+
+    def lock_count(endpoint=None):
+        if lock_errors is None:
+            return None
+        if endpoint is None:
+            return sum(lock_errors.values())
+        return lock_errors.get(endpoint, 0)
+
+    endpoints = {
+        endpoint: describe(entry['latencies'], entry['errors'], lock_count(endpoint), entry['statuses'])
+        for endpoint, entry in sorted(merged.items())
+    }
+    overall = describe(
+        [latency for entry in merged.values() for latency in entry['latencies']],
+        sum(entry['errors'] for entry in merged.values()),
+        lock_count(),
+    )
+    return overall, endpoints
+
+
+# ========== COMMAND ==========
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+class Command(BaseCommand):
+    help = 'Start the app under gunicorn on localhost and drive a mix of user scenarios against it'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--mix', default=DEFAULT_MIX,
+            help=f'Scenario weights, e.g. "{DEFAULT_MIX}" (scenarios: {", ".join(SCENARIOS)})',
+        )
+        parser.add_argument('--concurrency', type=int, default=8, help='Simulated users')
+        parser.add_argument('--pool', choices=('thread', 'process'), default='thread')
+        parser.add_argument('--duration', type=float, default=30.0, help='Seconds to run')
+        parser.add_argument('--timeout', type=float, default=30.0, help='Per-request timeout (seconds)')
+        parser.add_argument('--users', type=int, default=20, help='Accounts to create for logged-in scenarios')
+        # Unset gunicorn options come from gunicorn.conf.py, as in production
+        parser.add_argument('--workers', type=int, help='gunicorn worker processes')
+        parser.add_argument('--worker-class', help='gunicorn worker class')
+        parser.add_argument('--threads', type=int, help='Threads per gunicorn worker')
+        parser.add_argument(
+            '--url', help='Test an already running server at this URL instead of starting gunicorn',
+        )
+        parser.add_argument(
+            '--server-log',
+            help='With --url, the server log to count database lock errors in (they are not counted otherwise)',
+        )
+        parser.add_argument(
+            '--keep-data', action='store_true',
+            help=f'Keep the {USER_PREFIX}* accounts and subscriptions instead of deleting them afterwards',
+        )
+        parser.add_argument(
+            '--keep-ratelimits', action='store_true',
+            help='Leave rate limiting on (it is disabled by default so engagement scenarios are not throttled)',
+        )
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', help='Also write the JSON report to this file')
+
+    def handle(self, *args, **options):
+        mix = self._parse_mix(options['mix'])
+        data = self._prepare_data(options['users'])
+
+        # Cold start of one worker's imports, tracked alongside throughput
+        startup_report = {'cold_import_seconds': round(startup.measure_startup('wsgi'), 4)}
+
+        server = log = None
+        base_url = options['url']
+        server_log = options['server_log']
+        try:
+            if base_url is None:
+                started = time.perf_counter()
+                base_url, server, log = self._start_server(options)
+                server_log = log.name
+                startup_report['server_ready_seconds'] = round(time.perf_counter() - started, 3)
+            report = self._run(base_url, data, mix, options, server_log)
+            report['startup'] = startup_report
+        finally:
+            if server is not None:
+                self._stop_server(server)
+            if log is not None:
+                log.close()
+                os.unlink(log.name)
+            if not options['keep_data']:
+                self._cleanup_data()
+
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(output)
+        self.stdout.write(output)
+
+    def _parse_mix(self, value):
+        mix = {}
+        for part in value.split(','):
+            name, _, weight = part.strip().partition('=')
+            if name not in SCENARIOS:
+                raise CommandError(f'Unknown scenario "{name}"; choose from {", ".join(SCENARIOS)}')
+            try:
+                mix[name] = float(weight or 1)
+            except ValueError:
+                raise CommandError(f'Invalid weight for "{name}": {weight}')
+        if not any(mix.values()):
+            raise CommandError('The scenario mix needs at least one positive weight')
+        return mix
+
+    def _prepare_data(self, user_count):
+        """Create load test accounts and sample ids/slugs for the scenarios"""
+        usernames = [f'{USER_PREFIX}{i}' for i in range(user_count)]
+        existing = set(User.objects.filter(username__in=usernames).values_list('username', flat=True))
+        password = make_password(USER_PASSWORD)
+        for username in usernames:
+            if username not in existing:
+                # save() rather than bulk_create so the profile signal runs
+                User(username=username, password=password).save()
+
+        published = Post.objects.filter(status='published')
+        posts = list(published.order_by('-date_posted').values_list('pk', flat=True)[:500])
+        return {
+            'users': usernames,
+            'posts': posts,
+            # First few listing pages (6 posts each on the home page)
+            'home_pages': min(3, max(1, math.ceil(len(posts) / 6))),
+            'categories': list(Category.objects.filter(published_post_count__gt=0).values_list('slug', flat=True)[:100]),
+            'tags': list(Tag.objects.filter(published_post_count__gt=0).values_list('slug', flat=True)[:100]),
+            'authors': list(
+                published.exclude(author__username__startswith=USER_PREFIX)
+                .values_list('author__username', flat=True).distinct()[:100]
+            ),
+        }
+
+    def _cleanup_data(self):
+        """Delete the load test accounts (with their likes, comments and follows) and subscriptions"""
+        users = User.objects.filter(username__startswith=USER_PREFIX)
+        # One delete per user so comment counts are adjusted by the delete signals
+        for user in users.iterator():
+            user.delete()
+        Newsletter.objects.filter(email__startswith=USER_PREFIX).delete()
+
+    def _start_server(self, options):
+        port = _free_port()
+        base_url = f'http://127.0.0.1:{port}'
+        env = dict(os.environ)
+        if not options['keep_ratelimits']:
+            env['RATELIMIT_ENABLED'] = '0'
+        command = [
+            sys.executable, '-m', 'gunicorn', 'django_project.wsgi:application',
+            '--config', str(settings.BASE_DIR / 'gunicorn.conf.py'),
+            '--bind', f'127.0.0.1:{port}',
+            '--log-level', 'warning',
+        ]
+        for option in ('workers', 'worker_class', 'threads'):
+            if options[option] is not None:
+                command += [f'--{option.replace("_", "-")}', str(options[option])]
+        log = tempfile.NamedTemporaryFile('w+', prefix='loadtest-gunicorn-', suffix='.log', delete=False)
+        server = subprocess.Popen(command, cwd=settings.BASE_DIR, env=env, stdout=log, stderr=subprocess.STDOUT)
+
+        self.stderr.write(f'Starting gunicorn on {base_url}...')
+        deadline = time.time() + 30
+        while time.time() < deadline:
+            if server.poll() is not None:
+                break
+            status, _ = Client(base_url, timeout=2).request('GET', '/about/')
+            if status is not None:
+                return base_url, server, log
+            time.sleep(0.2)
+
+        self._stop_server(server)
+        log.seek(0)
+        tail = log.read()[-2000:]
+        log.close()
+        os.unlink(log.name)
+        raise CommandError(f'gunicorn did not start:\n{tail}')
+
+    def _stop_server(self, server):
+        if server.poll() is None:
+            server.send_signal(signal.SIGTERM)
+            try:
+                server.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                server.kill()
+                server.wait()
+
+    def _run(self, base_url, data, mix, options, server_log=None):
+        concurrency = options['concurrency']
+        duration = options['duration']
+        pool_class = ThreadPoolExecutor if options['pool'] == 'thread' else ProcessPoolExecutor
+
+        self.stderr.write(
+            f'Running {concurrency} {options["pool"]} users for {duration:g}s against {base_url}...'
+        )
+        log_offset = os.path.getsize(server_log) if server_log else 0
+        started = time.time()
+        deadline = started + duration
+        with pool_class(max_workers=concurrency) as pool:
+            futures = [
+                pool.submit(
+                    run_worker, base_url, data, mix, deadline, options['seed'] + i, options['timeout']
+                )
+                for i in range(concurrency)
+            ]
+            results = [future.result() for future in futures]
+        elapsed = time.time() - started
+
+        lock_errors = None
+        if server_log:
+            with open(server_log, errors='replace') as f:
+                f.seek(log_offset)
+                lock_errors = count_lock_errors(f.read())
+        overall, endpoints = summarize(results, elapsed, lock_errors)
+        return {
+            'config': {
+                'url': base_url,
+                'mix': mix,
+                'concurrency': concurrency,
+                'pool': options['pool'],
+                'duration_s': round(elapsed, 2),
+                'gunicorn': None if options['url'] else {
+                    option: options[option] or 'gunicorn.conf.py'
+                    for option in ('workers', 'worker_class', 'threads')
+                },
+                'database': settings.DATABASES['default']['ENGINE'].rsplit('.', 1)[-1],
+            },
+            'overall': overall,
+            'endpoints': endpoints,
+        }
@@ -0,0 +1,38 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from django_project.blog import moderation
+
+
+class Command(BaseCommand):
+    help = 'Score pending comments and approve or hold them for review'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Drain the pending queue and exit')
+        parser.add_argument(
+            '--interval', type=float, default=30.0,
+            help='Seconds to sleep when no comments are pending',
+        )
+        parser.add_argument(
+            '--grace', type=float, default=60.0,
+            help='Leave comments younger than this to the in-process scorer (seconds)',
+        )
+
+    def handle(self, *args, **options):
+        older_than = timedelta(seconds=options['grace']) if not options['once'] else None
+        while True:
+            moderated = 0
+            while True:
+                batch = moderation.moderate_pending(older_than=older_than)
+                moderated += batch
+                if not batch:
+                    break
+            if moderated:
+                self.stdout.write(self.style.SUCCESS(f'Moderated {moderated} comment(s)'))
+            if options['once']:
+                return
+            close_old_connections()
+            time.sleep(options['interval'])
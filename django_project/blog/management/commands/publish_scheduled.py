@@ -0,0 +1,43 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from django.utils import timezone
+
+from django_project.blog import scheduling
+
+
+class Command(BaseCommand):
+    help = 'Publish scheduled posts when their publish_date arrives'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Publish due posts and exit')
+        parser.add_argument(
+            '--max-sleep', type=float, default=60.0,
+            help='Longest time to sleep between checks, so newly scheduled posts are noticed (seconds)',
+        )
+
+    def handle(self, *args, **options):
+        if options['once']:
+            self._publish()
+            return
+
+        max_sleep = options['max_sleep']
+        while True:
+            self._publish()
+            close_old_connections()
+
+            next_due = scheduling.next_due_time()
+            if next_due is None:
+                delay = max_sleep
+            else:
+                delay = (next_due - timezone.now()).total_seconds()
+                delay = min(max(delay, 0.0), max_sleep)
+            time.sleep(delay)
+
+    def _publish(self):
+        post_ids = scheduling.publish_due_posts()
+        if post_ids:
+            self.stdout.write(self.style.SUCCESS(
+                f'Published {len(post_ids)} scheduled post(s): {", ".join(map(str, post_ids))}'
+            ))
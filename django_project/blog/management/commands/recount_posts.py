@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from django_project.blog import counters
+
+
+class Command(BaseCommand):
+    help = 'Recompute published post counts on Category/Tag and approved comment counts on Post'
+
+    def handle(self, *args, **options):
+        categories = counters.recount_categories()
+        tags = counters.recount_tags()
+        posts = counters.recount_comments()
+        self.stdout.write(self.style.SUCCESS(
+            f'Recounted {categories} categories, {tags} tags and comments on {posts} posts'
+        ))
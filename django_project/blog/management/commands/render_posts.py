@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+
+from django_project.blog.models import Post
+
+BATCH_SIZE = 500
+
+
+class Command(BaseCommand):
+    help = 'Render content_html and the table of contents for posts whose content changed'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='Re-render every post')
+
+    def handle(self, *args, **options):
+        rendered, batch = 0, []
+        posts = Post.objects.only('pk', 'content', 'content_hash').order_by('pk')
+        for post in posts.iterator(chunk_size=BATCH_SIZE):
+            if post.render_content(force=options['force']):
+                batch.append(post)
+            if len(batch) >= BATCH_SIZE:
+                rendered += self._flush(batch)
+        rendered += self._flush(batch)
+        self.stdout.write(self.style.SUCCESS(f'Rendered {rendered} post(s)'))
+
+    @staticmethod
+    def _flush(batch):
+        count = len(batch)
+        if batch:
+            Post.objects.bulk_update(batch, ['content_html', 'toc', 'content_hash'])
+            batch.clear()
+        return count
@@ -0,0 +1,41 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from django_project.blog import events
+
+
+class Command(BaseCommand):
+    help = 'Fold logged engagement events into hourly and daily buckets'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Roll up everything settled and exit')
+        parser.add_argument(
+            '--interval', type=float, default=60.0,
+            help='Seconds to sleep when no events are waiting',
+        )
+        parser.add_argument(
+            '--prune-days', type=int, default=30,
+            help='Delete rolled-up events older than this many days (0 keeps them)',
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            rolled_up = 0
+            while True:
+                batch = events.rollup()
+                rolled_up += batch
+                if not batch:
+                    break
+            if rolled_up:
+                self.stdout.write(self.style.SUCCESS(f'Rolled up {rolled_up} event(s)'))
+            if options['prune_days']:
+                pruned = events.prune(timedelta(days=options['prune_days']))
+                if pruned:
+                    self.stdout.write(f'Pruned {pruned} event(s)')
+            if options['once']:
+                return
+            close_old_connections()
+            time.sleep(options['interval'])
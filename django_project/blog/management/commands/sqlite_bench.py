@@ -0,0 +1,135 @@
+import json
+import multiprocessing
+import os
+import random
+import sqlite3
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+SEED_POSTS = 1000
+SEED_USERS = 200
+
+
+def _connect(path, pragmas):
+    conn = sqlite3.connect(path, timeout=5, isolation_level=None)
+    for name, value in pragmas.items():
+        conn.execute(f'PRAGMA {name}={value}')
+    return conn
+
+
+def _seed(path, pragmas):
+    conn = _connect(path, pragmas)
+    conn.executescript('''
+        CREATE TABLE post (id INTEGER PRIMARY KEY, title TEXT, status TEXT,
+                           date_posted REAL, views_count INTEGER DEFAULT 0);
+        CREATE INDEX post_status_date ON post (status, date_posted DESC);
+        CREATE TABLE post_like (id INTEGER PRIMARY KEY, post_id INTEGER, user_id INTEGER,
+                                UNIQUE (post_id, user_id));
+    ''')
+    conn.execute('BEGIN')
+    conn.executemany(
+        'INSERT INTO post (title, status, date_posted) VALUES (?, ?, ?)',
+        [(f'Post {i}', 'published', time.time() - i) for i in range(SEED_POSTS)],
+    )
+    conn.execute('COMMIT')
+    conn.close()
+
+
+def _worker(path, pragmas, begin, write_ratio, deadline, results):
+    conn = _connect(path, pragmas)
+    rng = random.Random(os.getpid())
+    stats = {'reads': 0, 'writes': 0, 'locked': 0}
+    while time.time() < deadline:
+        post_id = rng.randint(1, SEED_POSTS)
+        try:
+            if rng.random() < write_ratio:
+                # View count bump plus like toggle, as in PostDetailView/toggle_like
+                conn.execute(begin)
+                conn.execute('UPDATE post SET views_count = views_count + 1 WHERE id = ?', (post_id,))
+                user_id = rng.randint(1, SEED_USERS)
+                deleted = conn.execute(
+                    'DELETE FROM post_like WHERE post_id = ? AND user_id = ?', (post_id, user_id)
+                ).rowcount
+                if not deleted:
+                    conn.execute('INSERT INTO post_like (post_id, user_id) VALUES (?, ?)', (post_id, user_id))
+                conn.execute('COMMIT')
+                stats['writes'] += 1
+            else:
+                # Home page listing plus a like count
+                conn.execute(
+                    "SELECT id, title FROM post WHERE status = 'published' "
+                    "ORDER BY date_posted DESC LIMIT 6 OFFSET ?", (rng.randint(0, 100) * 6,)
+                ).fetchall()
+                conn.execute('SELECT COUNT(*) FROM post_like WHERE post_id = ?', (post_id,)).fetchone()
+                stats['reads'] += 1
+        except sqlite3.OperationalError as e:
+            if conn.in_transaction:
+                conn.execute('ROLLBACK')
+            if 'locked' not in str(e) and 'busy' not in str(e):
+                raise
+            stats['locked'] += 1
+    conn.close()
+    results.put(stats)
+
+
+class Command(BaseCommand):
+    help = 'Multi-process SQLite read/write contention benchmark: default settings vs SQLITE_PRAGMAS'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=4)
+        parser.add_argument('--duration', type=float, default=5.0, help='Seconds per mode')
+        parser.add_argument('--write-ratio', type=float, default=0.3)
+        parser.add_argument('--json', action='store_true', help='Print results as JSON only')
+
+    def handle(self, *args, **options):
+        modes = {
+            'default': ({}, 'BEGIN'),
+            'tuned': (settings.SQLITE_PRAGMAS, 'BEGIN IMMEDIATE'),
+        }
+        report = {}
+        for mode, (pragmas, begin) in modes.items():
+            report[mode] = self._run(pragmas, begin, options)
+
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+
+        self.stdout.write(f"{'mode':<10}{'reads/s':>12}{'writes/s':>12}{'locked':>10}")
+        for mode, result in report.items():
+            self.stdout.write(
+                f"{mode:<10}{result['reads_per_sec']:>12.0f}"
+                f"{result['writes_per_sec']:>12.0f}{result['locked']:>10}"
+            )
+
+    def _run(self, pragmas, begin, options):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'bench.sqlite3')
+            _seed(path, pragmas)
+
+            results = multiprocessing.Queue()
+            deadline = time.time() + options['duration']
+            workers = [
+                multiprocessing.Process(
+                    target=_worker,
+                    args=(path, pragmas, begin, options['write_ratio'], deadline, results),
+                )
+                for _ in range(options['processes'])
+            ]
+            for worker in workers:
+                worker.start()
+            totals = {'reads': 0, 'writes': 0, 'locked': 0}
+            for _ in workers:
+                for key, value in results.get().items():
+                    totals[key] += value
+            for worker in workers:
+                worker.join()
+
+        duration = options['duration']
+        return {
+            **totals,
+            'reads_per_sec': totals['reads'] / duration,
+            'writes_per_sec': totals['writes'] / duration,
+        }
@@ -0,0 +1,161 @@
+"""
+Reference counting and garbage collection for content-addressed media.
+
+Files saved through ``django_project.storage.ContentAddressedStorage`` are
+shared by every field holding the same bytes, so they are never deleted
+when one post or profile lets go of them. Instead the signals keep
+``MediaFile.ref_count`` in step with the fields listed in ``REFERENCES``,
+and ``collect_garbage()`` (``manage.py gc_media``) deletes files nothing has
+referenced for a grace period, along with the avatar sizes rendered from
+them. The grace period covers uploads that are
+stored but not yet saved on a model, and ``recount()`` repairs the counts
+from the fields themselves if they ever drift.
+"""
+import os
+from collections import Counter
+from datetime import timedelta
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import Count, F
+from django.utils import timezone
+
+from django_project.storage import CONTENT_DIR, content_storage, digest_from_name, is_content_name
+from django_project.users.avatars import derived_names
+from .models import MediaFile
+
+# (app label, model, field) of every field stored by content
+REFERENCES = (
+    ('blog', 'Post', 'featured_image'),
+    ('users', 'Profile', 'image'),
+)
+
+
+def adjust(deltas):
+    """Apply {name: delta} reference changes; unmanaged names are ignored"""
+    now = timezone.now()
+    for name, delta in deltas.items():
+        if not delta or not is_content_name(name):
+            continue
+        updated = MediaFile.objects.filter(name=name).update(
+            ref_count=F('ref_count') + delta, touched_at=now,
+        )
+        if not updated and delta > 0:
+            # Stored before reference counting existed, or by another process
+            storage = content_storage()
+            size = storage.size(name) if storage.exists(name) else 0
+            MediaFile.objects.get_or_create(name=name, defaults={'size': size, 'ref_count': delta})
+
+
+def acquire(name):
+    adjust({name: 1})
+
+
+def release(name):
+    adjust({name: -1})
+
+
+def replace(old_name, new_name):
+    """A field moved from ``old_name`` to ``new_name``"""
+    if old_name != new_name:
+        adjust({new_name: 1, old_name: -1})
+
+
+def referenced_names():
+    """{name: count} of managed names across every REFERENCES field"""
+    counts = Counter()
+    for app_label, model_name, field in REFERENCES:
+        model = apps.get_model(app_label, model_name)
+        rows = (
+            model.objects.filter(**{f'{field}__startswith': f'{CONTENT_DIR}/'})
+            .values_list(field).annotate(n=Count('pk')).order_by()
+        )
+        for name, n in rows:
+            counts[name] += n
+    return counts
+
+
+def recount(batch_size=1000):
+    """Rebuild every ref_count from the fields; return how many changed"""
+    counts = referenced_names()
+    changed = []
+    with transaction.atomic():
+        for entry in MediaFile.objects.select_for_update().only('pk', 'name', 'ref_count').iterator(chunk_size=batch_size):
+            actual = counts.pop(entry.name, 0)
+            if entry.ref_count != actual:
+                entry.ref_count = actual
+                entry.touched_at = timezone.now()
+                changed.append(entry)
+        MediaFile.objects.bulk_update(changed, ['ref_count', 'touched_at'], batch_size=batch_size)
+    # Referenced files without a row (stored before counting began)
+    adjust(counts)
+    return len(changed) + len(counts)
+
+
+def collect_garbage(grace=None, dry_run=False, scan=False):
+    """
+    Delete files unreferenced for ``grace`` seconds; return their names.
+
+    Each row is locked and re-checked before its file goes, so a concurrent
+    upload of the same content either revives the row first or waits and
+    stores the file again. ``scan`` also removes files under the content
+    directory that have no row at all (left by an interrupted upload).
+    """
+    if grace is None:
+        grace = settings.MEDIA_GC_GRACE_SECONDS
+    cutoff = timezone.now() - timedelta(seconds=grace)
+    storage = content_storage()
+    deleted = []
+
+    candidates = MediaFile.objects.filter(ref_count__lte=0, touched_at__lt=cutoff).values_list('pk', flat=True)
+    for pk in list(candidates):
+        with transaction.atomic():
+            entry = MediaFile.objects.select_for_update().filter(
+                pk=pk, ref_count__lte=0, touched_at__lt=cutoff,
+            ).first()
+            if entry is None:
+                continue
+            deleted.append(entry.name)
+            deleted.extend(_collect_derived(entry.name, dry_run))
+            if not dry_run:
+                storage.delete_unreferenced(entry.name)
+                entry.delete()
+
+    if scan:
+        deleted.extend(_collect_strays(storage, cutoff, dry_run))
+    return deleted
+
+
+def _collect_derived(name, dry_run):
+    """Delete the avatar sizes rendered from ``name``; return their names"""
+    digest = digest_from_name(name)
+    # A profile whose image is stored under a legacy name can share them
+    if not digest or apps.get_model('users', 'Profile').objects.filter(image_hash=digest).exists():
+        return []
+    names = [derived for derived in derived_names(digest) if default_storage.exists(derived)]
+    if not dry_run:
+        for derived in names:
+            default_storage.delete(derived)
+    return names
+
+
+def _collect_strays(storage, cutoff, dry_run):
+    root = storage.path(CONTENT_DIR)
+    cutoff_ts = cutoff.timestamp()
+    found = []
+    for dirpath, _, filenames in os.walk(root):
+        for filename in filenames:
+            path = os.path.join(dirpath, filename)
+            if os.path.getmtime(path) < cutoff_ts:
+                found.append(os.path.relpath(path, storage.location).replace(os.sep, '/'))
+
+    known = set()
+    for start in range(0, len(found), 500):
+        known.update(MediaFile.objects.filter(name__in=found[start:start + 500]).values_list('name', flat=True))
+    strays = [name for name in found if name not in known]
+    if not dry_run:
+        for name in strays:
+            storage.delete_unreferenced(name)
+    return strays
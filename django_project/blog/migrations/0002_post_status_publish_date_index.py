@@ -0,0 +1,19 @@
+# Generated by Django 5.2.4 on 2026-10-19 09:29
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['status', 'publish_date'], name='blog_post_status_8279bd_idx'),
+        ),
+    ]
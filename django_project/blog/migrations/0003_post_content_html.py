@@ -0,0 +1,28 @@
+# Generated by Django 5.2.4 on 2026-10-19 09:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0002_post_status_publish_date_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='content_hash',
+            field=models.CharField(blank=True, editable=False, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='content_html',
+            field=models.TextField(blank=True, editable=False),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='toc',
+            field=models.JSONField(blank=True, default=list, editable=False),
+        ),
+    ]
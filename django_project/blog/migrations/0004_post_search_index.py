@@ -0,0 +1,29 @@
+from django.db import migrations
+
+# PostgreSQL only: expression index for the admin's full-text post search
+CREATE_INDEX = (
+    "CREATE INDEX IF NOT EXISTS blog_post_search_idx ON blog_post USING GIN "
+    "(to_tsvector('english', coalesce(title, '') || ' ' || coalesce(excerpt, '')))"
+)
+DROP_INDEX = 'DROP INDEX IF EXISTS blog_post_search_idx'
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(CREATE_INDEX)
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(DROP_INDEX)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0003_post_content_html'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
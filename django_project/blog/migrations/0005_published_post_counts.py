@@ -0,0 +1,47 @@
+# Generated by Django 5.2.4 on 2026-10-19 09:36
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def recount(apps, schema_editor):
+    Post = apps.get_model('blog', 'Post')
+    Category = apps.get_model('blog', 'Category')
+    Tag = apps.get_model('blog', 'Tag')
+    TagThrough = Post.tags.through
+
+    published = Post.objects.filter(
+        category=OuterRef('pk'), status='published'
+    ).order_by().values('category').annotate(n=Count('pk')).values('n')
+    Category.objects.update(
+        published_post_count=Coalesce(Subquery(published, output_field=IntegerField()), 0)
+    )
+
+    tagged = TagThrough.objects.filter(
+        tag=OuterRef('pk'), post__status='published'
+    ).order_by().values('tag').annotate(n=Count('pk')).values('n')
+    Tag.objects.update(
+        published_post_count=Coalesce(Subquery(tagged, output_field=IntegerField()), 0)
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0004_post_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='published_post_count',
+            field=models.IntegerField(db_index=True, default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='tag',
+            name='published_post_count',
+            field=models.IntegerField(db_index=True, default=0, editable=False),
+        ),
+        migrations.RunPython(recount, migrations.RunPython.noop),
+    ]
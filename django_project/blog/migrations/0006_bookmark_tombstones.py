@@ -0,0 +1,42 @@
+# Generated by Django 5.2.4 on 2026-10-19 09:37
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0005_published_post_counts'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BookmarkTombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('post_id', models.BigIntegerField()),
+                ('removed_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='bookmark',
+            index=models.Index(fields=['user', '-created_at', '-id'], name='blog_bookma_user_id_99fc72_idx'),
+        ),
+        migrations.AddField(
+            model_name='bookmarktombstone',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='bookmark_tombstones', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='bookmarktombstone',
+            index=models.Index(fields=['user', 'removed_at'], name='blog_bookma_user_id_9e81b1_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='bookmarktombstone',
+            unique_together={('user', 'post_id')},
+        ),
+    ]
@@ -0,0 +1,67 @@
+# Generated by Django 5.2.4 on 2026-10-19 09:43
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def moderate_existing(apps, schema_editor):
+    Post = apps.get_model('blog', 'Post')
+    Comment = apps.get_model('blog', 'Comment')
+
+    # Existing comments were already moderated by hand
+    Comment.objects.filter(is_approved=True).update(status='approved')
+    Comment.objects.filter(is_approved=False).update(status='rejected')
+
+    approved = Comment.objects.filter(
+        post=OuterRef('pk'), is_approved=True
+    ).order_by().values('post').annotate(n=Count('pk')).values('n')
+    Post.objects.update(
+        approved_comment_count=Coalesce(Subquery(approved, output_field=IntegerField()), 0)
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0006_bookmark_tombstones'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SpamToken',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('token', models.CharField(max_length=64, unique=True)),
+                ('spam', models.IntegerField(default=0)),
+                ('ham', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='spam_score',
+            field=models.FloatField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Awaiting scoring'), ('held', 'Held for review'), ('approved', 'Approved'), ('rejected', 'Rejected')], default='pending', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='approved_comment_count',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AlterField(
+            model_name='comment',
+            name='is_approved',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['status', 'created_at'], name='blog_commen_status_399a2d_idx'),
+        ),
+        migrations.RunPython(moderate_existing, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.4 on 2026-10-19 09:51
+
+import django.core.validators
+import django.utils.timezone
+import django_project.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0007_comment_moderation'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='post',
+            name='featured_image',
+            field=models.ImageField(blank=True, help_text='Recommended size: 1200x630px', null=True, storage=django_project.storage.content_storage, upload_to='post_images/%Y/%m/%d/', validators=[django.core.validators.FileExtensionValidator(['jpg', 'jpeg', 'png', 'webp'])]),
+        ),
+        migrations.CreateModel(
+            name='MediaFile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True)),
+                ('size', models.BigIntegerField(default=0)),
+                ('ref_count', models.IntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('touched_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['ref_count', 'touched_at'], name='blog_mediaf_ref_cou_a1fe07_idx')],
+            },
+        ),
+    ]
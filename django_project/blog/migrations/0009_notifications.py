@@ -0,0 +1,64 @@
+# Generated by Django 5.2.4 on 2026-10-19 09:57
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0008_content_addressed_media'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotificationEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('published', 'New post'), ('comment', 'New comment'), ('reply', 'Reply'), ('follow', 'New follower')], max_length=10)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('expanded_at', models.DateTimeField(blank=True, null=True)),
+                ('actor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('comment', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='blog.comment')),
+                ('post', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='blog.post')),
+                ('recipient', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Notification',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('read_at', models.DateTimeField(blank=True, null=True)),
+                ('recipient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='notifications', to=settings.AUTH_USER_MODEL)),
+                ('event', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='notifications', to='blog.notificationevent')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='notificationevent',
+            index=models.Index(fields=['expanded_at', 'created_at'], name='blog_notifi_expande_13d816_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='notificationevent',
+            constraint=models.UniqueConstraint(condition=models.Q(('kind', 'published')), fields=('kind', 'post'), name='unique_published_event'),
+        ),
+        migrations.AddConstraint(
+            model_name='notificationevent',
+            constraint=models.UniqueConstraint(condition=models.Q(('comment__isnull', False)), fields=('kind', 'comment'), name='unique_comment_event'),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['recipient', '-created_at', '-id'], name='blog_notifi_recipie_7e03e5_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['recipient', 'read_at'], name='blog_notifi_recipie_01852c_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='notification',
+            unique_together={('recipient', 'event')},
+        ),
+    ]
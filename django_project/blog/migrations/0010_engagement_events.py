@@ -0,0 +1,51 @@
+# Generated by Django 5.2.4 on 2026-10-19 09:59
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0009_notifications'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EngagementEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.PositiveSmallIntegerField(choices=[(1, 'View'), (2, 'Like'), (3, 'Unlike'), (4, 'Bookmark'), (5, 'Unbookmark'), (6, 'Comment')])),
+                ('post_id', models.BigIntegerField()),
+                ('author_id', models.BigIntegerField()),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='RollupState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('last_id', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='EngagementBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('scope', models.CharField(choices=[('p', 'Post'), ('a', 'Author')], max_length=1)),
+                ('object_id', models.BigIntegerField()),
+                ('granularity', models.CharField(choices=[('h', 'Hour'), ('d', 'Day')], max_length=1)),
+                ('bucket', models.DateTimeField()),
+                ('views', models.IntegerField(default=0)),
+                ('likes', models.IntegerField(default=0)),
+                ('bookmarks', models.IntegerField(default=0)),
+                ('comments', models.IntegerField(default=0)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['scope', 'granularity', 'bucket'], name='blog_engage_scope_aed768_idx')],
+                'constraints': [models.UniqueConstraint(fields=('scope', 'granularity', 'object_id', 'bucket'), name='unique_engagement_bucket')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-19 10:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0010_engagement_events'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notificationevent',
+            name='claimed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
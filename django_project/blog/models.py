@@ -4,8 +4,12 @@ from django.utils import timezone
 from django.contrib.auth.models import User
 from django.utils.text import slugify
 from django.core.validators import FileExtensionValidator
-from PIL import Image
+from django.core.files.base import ContentFile
+import io
 import math
+import os
+from django_project.storage import content_storage
+from .rendering import content_hash, render_content
 
 
 # Category Model
@@ -16,6 +20,8 @@ class Category(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     date_posted = models.DateTimeField(default=timezone.now)
     author = models.ForeignKey(User, on_delete=models.CASCADE)
+    # Maintained by signals; see counters.py
+    published_post_count = models.IntegerField(default=0, db_index=True, editable=False)
 
     class Meta:
         verbose_name_plural = "Categories"
@@ -38,6 +44,8 @@ class Tag(models.Model):
     name = models.CharField(max_length=50, unique=True)
     slug = models.SlugField(max_length=50, unique=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    # Maintained by signals; see counters.py
+    published_post_count = models.IntegerField(default=0, db_index=True, editable=False)
 
     class Meta:
         ordering = ['name']
@@ -66,11 +74,16 @@ class Post(models.Model):
     title = models.CharField(max_length=200)
     slug = models.SlugField(max_length=200, unique=True, blank=True)
     content = models.TextField()
+    # Rendered from content on save; see rendering.render_content
+    content_html = models.TextField(blank=True, editable=False)
+    toc = models.JSONField(default=list, blank=True, editable=False)
+    content_hash = models.CharField(max_length=64, blank=True, editable=False)
     excerpt = models.TextField(max_length=300, blank=True, help_text="Brief summary for previews")
     
     # Media
     featured_image = models.ImageField(
         upload_to='post_images/%Y/%m/%d/',
+        storage=content_storage,
         null=True,
         blank=True,
         validators=[FileExtensionValidator(['jpg', 'jpeg', 'png', 'webp'])],
@@ -101,6 +114,8 @@ class Post(models.Model):
     
     # Engagement Metrics
     views_count = models.IntegerField(default=0)
+    # Maintained by signals and moderation; see counters.py
+    approved_comment_count = models.IntegerField(default=0, editable=False)
     reading_time = models.IntegerField(default=5, help_text="Estimated reading time in minutes")
     
     # SEO
@@ -113,6 +128,7 @@ class Post(models.Model):
             models.Index(fields=['-date_posted']),
             models.Index(fields=['status', '-date_posted']),
             models.Index(fields=['author', '-date_posted']),
+            models.Index(fields=['status', 'publish_date']),
         ]
 
     def __str__(self):
@@ -142,26 +158,56 @@ class Post(models.Model):
         if not self.meta_description:
             self.meta_description = self.excerpt[:160] if self.excerpt else self.content[:160]
         
+        # Render the body once; unchanged content keeps its stored HTML
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or 'content' in update_fields:
+            self.render_content()
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'content_html', 'toc', 'content_hash'}
+        
         super().save(*args, **kwargs)
         
         # Resize featured image
         if self.featured_image:
             self.resize_image()
 
+    def render_content(self, force=False):
+        """Refresh content_html and toc if the content changed"""
+        new_hash = content_hash(self.content)
+        if force or new_hash != self.content_hash:
+            self.content_html, self.toc = render_content(self.content)
+            self.content_hash = new_hash
+            return True
+        return False
+
     def resize_image(self):
         """Resize featured image to optimize storage"""
+        # Pillow is imported on first use so app startup doesn't pay for it
+        from PIL import Image
+        from . import media
+
         try:
-            img = Image.open(self.featured_image.path)
-            
-            # Convert RGBA to RGB if necessary
-            if img.mode == 'RGBA':
-                img = img.convert('RGB')
-            
+            with self.featured_image.open('rb') as image_file:
+                img = Image.open(image_file)
+                img.load()
+            image_format = img.format
+
             # Resize if larger than 1200px wide
             if img.width > 1200:
+                # Convert RGBA to RGB if necessary
+                if img.mode == 'RGBA':
+                    img = img.convert('RGB')
                 output_size = (1200, int(img.height * (1200 / img.width)))
                 img.thumbnail(output_size, Image.Resampling.LANCZOS)
-                img.save(self.featured_image.path, quality=85, optimize=True)
+                buffer = io.BytesIO()
+                img.save(buffer, format=image_format, quality=85, optimize=True)
+
+                # Stored files are shared by content, so the resized image is
+                # saved as a new file rather than written over the original
+                old_name = self.featured_image.name
+                self.featured_image.save(os.path.basename(old_name), ContentFile(buffer.getvalue()), save=False)
+                Post.objects.filter(pk=self.pk).update(featured_image=self.featured_image.name)
+                media.replace(old_name, self.featured_image.name)
         except Exception as e:
             print(f"Error resizing image: {e}")
 
@@ -170,8 +216,9 @@ class Post(models.Model):
 
     def increment_views(self):
         """Increment view count"""
+        # Single UPDATE so concurrent workers never lose increments
+        Post.objects.filter(pk=self.pk).update(views_count=models.F('views_count') + 1)
         self.views_count += 1
-        self.save(update_fields=['views_count'])
 
     @property
     def total_likes(self):
@@ -180,8 +227,8 @@ class Post(models.Model):
 
     @property
     def total_comments(self):
-        """Get total number of comments"""
-        return self.comments.filter(is_approved=True).count()
+        """Get total number of approved comments"""
+        return self.approved_comment_count
 
     @property
     def is_published(self):
@@ -204,12 +251,23 @@ class Post(models.Model):
 
 # Comment Model
 class Comment(models.Model):
+    STATUS_CHOICES = [
+        ('pending', 'Awaiting scoring'),
+        ('held', 'Held for review'),
+        ('approved', 'Approved'),
+        ('rejected', 'Rejected'),
+    ]
+
     post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='comments')
     author = models.ForeignKey(User, on_delete=models.CASCADE, related_name='comments')
     content = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
-    is_approved = models.BooleanField(default=True)
+    # New comments are scored in the background; see moderation.py
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    spam_score = models.FloatField(null=True, blank=True, editable=False)
+    # Mirrors status == 'approved'; kept for the existing approved filters
+    is_approved = models.BooleanField(default=False, editable=False)
     parent = models.ForeignKey(
         'self',
         null=True,
@@ -222,17 +280,35 @@ class Comment(models.Model):
         ordering = ['-created_at']
         indexes = [
             models.Index(fields=['post', '-created_at']),
+            models.Index(fields=['status', 'created_at']),
         ]
 
     def __str__(self):
         return f'Comment by {self.author.username} on {self.post.title}'
 
+    def save(self, *args, **kwargs):
+        self.is_approved = self.status == 'approved'
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'status' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'is_approved'}
+        super().save(*args, **kwargs)
+
     @property
     def is_reply(self):
         """Check if this is a reply to another comment"""
         return self.parent is not None
 
 
+# Per-token counts from moderator decisions, used by the spam scorer
+class SpamToken(models.Model):
+    token = models.CharField(max_length=64, unique=True)
+    spam = models.IntegerField(default=0)
+    ham = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f'{self.token} ({self.spam} spam / {self.ham} ham)'
+
+
 # Like Model
 class Like(models.Model):
     post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='likes')
@@ -302,11 +378,179 @@ class Bookmark(models.Model):
     class Meta:
         unique_together = ('user', 'post')
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', '-created_at', '-id']),
+        ]
 
     def __str__(self):
         return f'{self.user.username} bookmarked {self.post.title}'
 
 
+# Removed bookmarks, so clients syncing the reading list can drop them
+class BookmarkTombstone(models.Model):
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='bookmark_tombstones')
+    post_id = models.BigIntegerField()
+    removed_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        unique_together = ('user', 'post_id')
+        indexes = [
+            models.Index(fields=['user', 'removed_at']),
+        ]
+
+    def __str__(self):
+        return f'{self.user.username} removed bookmark on post {self.post_id}'
+
+    @classmethod
+    def record(cls, user_ids_and_post_ids):
+        """Create or refresh tombstones for (user_id, post_id) pairs"""
+        now = timezone.now()
+        cls.objects.bulk_create(
+            [cls(user_id=user_id, post_id=post_id, removed_at=now) for user_id, post_id in user_ids_and_post_ids],
+            update_conflicts=True,
+            unique_fields=['user', 'post_id'],
+            update_fields=['removed_at'],
+        )
+
+
+class MediaFile(models.Model):
+    """A content-addressed upload and how many model fields point at it"""
+    name = models.CharField(max_length=255, unique=True)
+    size = models.BigIntegerField(default=0)
+    ref_count = models.IntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    # Last time the file was stored or its count changed; garbage
+    # collection waits a grace period after this
+    touched_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['ref_count', 'touched_at']),
+        ]
+
+    def __str__(self):
+        return f'{self.name} ({self.ref_count} references)'
+
+
+class NotificationEvent(models.Model):
+    """Something that happened; expanded into one Notification per recipient"""
+    KIND_CHOICES = [
+        ('published', 'New post'),
+        ('comment', 'New comment'),
+        ('reply', 'Reply'),
+        ('follow', 'New follower'),
+    ]
+
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    actor = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, null=True, blank=True, related_name='+')
+    comment = models.ForeignKey(Comment, on_delete=models.CASCADE, null=True, blank=True, related_name='+')
+    # Set for events with a single known recipient (follows)
+    recipient = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True, related_name='+')
+    created_at = models.DateTimeField(default=timezone.now)
+    # Null until recipients have been notified
+    expanded_at = models.DateTimeField(null=True, blank=True)
+    # Set while a worker is expanding the event
+    claimed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['expanded_at', 'created_at']),
+        ]
+        constraints = [
+            # Re-publishing a post or re-approving a comment notifies once
+            models.UniqueConstraint(
+                fields=['kind', 'post'], condition=models.Q(kind='published'), name='unique_published_event',
+            ),
+            models.UniqueConstraint(
+                fields=['kind', 'comment'], condition=models.Q(comment__isnull=False), name='unique_comment_event',
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.get_kind_display()} by {self.actor_id}'
+
+
+class Notification(models.Model):
+    recipient = models.ForeignKey(User, on_delete=models.CASCADE, related_name='notifications')
+    event = models.ForeignKey(NotificationEvent, on_delete=models.CASCADE, related_name='notifications')
+    created_at = models.DateTimeField(default=timezone.now)
+    read_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        unique_together = ('recipient', 'event')
+        indexes = [
+            models.Index(fields=['recipient', '-created_at', '-id']),
+            models.Index(fields=['recipient', 'read_at']),
+        ]
+
+    def __str__(self):
+        return f'{self.event} for {self.recipient_id}'
+
+
+class EngagementEvent(models.Model):
+    """One view, like, bookmark or comment; append-only, rolled up by blog/events.py"""
+    VIEW, LIKE, UNLIKE, BOOKMARK, UNBOOKMARK, COMMENT = range(1, 7)
+    KIND_CHOICES = [
+        (VIEW, 'View'),
+        (LIKE, 'Like'),
+        (UNLIKE, 'Unlike'),
+        (BOOKMARK, 'Bookmark'),
+        (UNBOOKMARK, 'Unbookmark'),
+        (COMMENT, 'Comment'),
+    ]
+
+    kind = models.PositiveSmallIntegerField(choices=KIND_CHOICES)
+    # Plain ids: the log outlives the rows it mentions and needs no joins
+    post_id = models.BigIntegerField()
+    author_id = models.BigIntegerField()
+    created_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f'{self.get_kind_display()} on post {self.post_id}'
+
+
+class EngagementBucket(models.Model):
+    """Counts per post or per author for one hour or one day"""
+    HOUR, DAY = 'h', 'd'
+    GRANULARITY_CHOICES = [(HOUR, 'Hour'), (DAY, 'Day')]
+    POST, AUTHOR = 'p', 'a'
+    SCOPE_CHOICES = [(POST, 'Post'), (AUTHOR, 'Author')]
+
+    scope = models.CharField(max_length=1, choices=SCOPE_CHOICES)
+    # Post id or author id, depending on scope
+    object_id = models.BigIntegerField()
+    granularity = models.CharField(max_length=1, choices=GRANULARITY_CHOICES)
+    bucket = models.DateTimeField()
+    views = models.IntegerField(default=0)
+    likes = models.IntegerField(default=0)
+    bookmarks = models.IntegerField(default=0)
+    comments = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['scope', 'granularity', 'object_id', 'bucket'], name='unique_engagement_bucket',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['scope', 'granularity', 'bucket']),
+        ]
+
+    def __str__(self):
+        return f'{self.get_scope_display()} {self.object_id} at {self.bucket}'
+
+
+class RollupState(models.Model):
+    """How far a rollup has read its log"""
+    name = models.CharField(max_length=50, unique=True)
+    last_id = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f'{self.name} at {self.last_id}'
+
+
 # Contact/Feedback Model (For contact forms)
 class ContactMessage(models.Model):
     name = models.CharField(max_length=100)
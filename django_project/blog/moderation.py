@@ -0,0 +1,277 @@
+"""
+Comment moderation.
+
+New comments are saved as ``pending`` and scored on a background thread
+after the request commits; the ``moderate_comments`` command sweeps up any
+the thread missed. The score is a spam probability from local heuristics
+(links, shouting, known spam phrases, author history) blended with a naive
+Bayes classifier trained on moderator decisions. Comments below
+``COMMENT_AUTO_APPROVE_BELOW`` are approved, the rest are held for review.
+
+Moderator actions change any number of comments with a single UPDATE and
+apply the approved-count deltas for every affected post in one more.
+"""
+import logging
+import math
+import re
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import Count, F
+from django.utils import timezone
+
+from django_project.routers import use_primary
+from . import counters, events, notifications
+from .models import Comment, SpamToken
+
+logger = logging.getLogger(__name__)
+
+AUTO_APPROVE_BELOW = getattr(settings, 'COMMENT_AUTO_APPROVE_BELOW', 0.5)
+BATCH_SIZE = 500
+
+# Naive Bayes: token statistics only count once both classes have this
+# many examples, and the most decisive tokens decide the score
+MIN_TRAINING = 20
+INTERESTING_TOKENS = 15
+# Pull rarely seen tokens towards 0.5 (Robinson's s)
+TOKEN_STRENGTH = 1.0
+# SpamToken row holding the number of spam/ham comments trained on
+TOTALS_TOKEN = '*'
+
+TOKEN_RE = re.compile(r"[a-z0-9$'][a-z0-9$'_-]{1,62}")
+LINK_RE = re.compile(r'https?://([^\s/]+)|www\.([^\s/]+)', re.IGNORECASE)
+REPEAT_RE = re.compile(r'(.)\1{5,}')
+SPAM_PHRASES = (
+    'buy now', 'click here', 'free money', 'limited offer', 'work from home',
+    'casino', 'viagra', 'crypto giveaway', 'earn $', 'check out my channel',
+)
+
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='moderation')
+
+
+# ========== SCORING ==========
+
+def tokenize(text):
+    """Distinct lowercase word tokens plus one token per linked domain"""
+    tokens = set(TOKEN_RE.findall(text.lower()))
+    for match in LINK_RE.finditer(text):
+        tokens.add(f'link:{(match.group(1) or match.group(2)).lower()}'[:64])
+    return tokens
+
+
+def heuristic_score(content, trusted=False, new_account=False):
+    score = 0.1
+    score += 0.2 * min(len(LINK_RE.findall(content)), 3)
+    letters = [char for char in content if char.isalpha()]
+    if len(letters) >= 20 and sum(char.isupper() for char in letters) / len(letters) > 0.6:
+        score += 0.2
+    if REPEAT_RE.search(content):
+        score += 0.1
+    lowered = content.lower()
+    score += 0.3 * sum(phrase in lowered for phrase in SPAM_PHRASES)
+    if new_account:
+        score += 0.1
+    if trusted:
+        score -= 0.3
+    return min(max(score, 0.0), 1.0)
+
+
+def load_token_stats(tokens):
+    """{token: (spam, ham)} for ``tokens`` and the totals row, in one query"""
+    rows = SpamToken.objects.filter(token__in=[*tokens, TOTALS_TOKEN])
+    return {token: (spam, ham) for token, spam, ham in rows.values_list('token', 'spam', 'ham')}
+
+
+def bayes_score(tokens, stats):
+    """Spam probability from token statistics, or None until trained"""
+    spam_total, ham_total = stats.get(TOTALS_TOKEN, (0, 0))
+    if spam_total < MIN_TRAINING or ham_total < MIN_TRAINING:
+        return None
+
+    probabilities = []
+    for token in tokens:
+        spam, ham = stats.get(token, (0, 0))
+        seen = spam + ham
+        if not seen:
+            continue
+        spam_freq, ham_freq = spam / spam_total, ham / ham_total
+        p = spam_freq / (spam_freq + ham_freq)
+        probabilities.append((TOKEN_STRENGTH * 0.5 + seen * p) / (TOKEN_STRENGTH + seen))
+    if not probabilities:
+        return None
+
+    probabilities.sort(key=lambda p: abs(p - 0.5), reverse=True)
+    decisive = probabilities[:INTERESTING_TOKENS]
+    # Combined in log space so long comments don't underflow
+    log_spam = sum(math.log(p) for p in decisive)
+    log_ham = sum(math.log(1 - p) for p in decisive)
+    return 1 / (1 + math.exp(log_ham - log_spam))
+
+
+def score_comment(content, stats, trusted=False, new_account=False):
+    heuristic = heuristic_score(content, trusted, new_account)
+    bayes = bayes_score(tokenize(content), stats)
+    if bayes is None:
+        return heuristic
+    return 0.4 * heuristic + 0.6 * bayes
+
+
+# ========== PIPELINE ==========
+
+def moderate_pending(comment_ids=None, older_than=None, batch_size=BATCH_SIZE):
+    """
+    Score one batch of pending comments and approve or hold each.
+
+    Returns the number of comments moderated. Rows are locked (skipping any
+    another worker holds) so two moderators never count the same approval.
+    """
+    with transaction.atomic():
+        pending = Comment.objects.filter(status='pending').select_related('author').only(
+            'pk', 'post_id', 'content', 'status', 'author', 'author__date_joined'
+        )
+        if comment_ids is not None:
+            pending = pending.filter(pk__in=comment_ids)
+        if older_than is not None:
+            pending = pending.filter(created_at__lt=timezone.now() - older_than)
+        batch = list(pending.order_by('created_at').select_for_update(
+            skip_locked=True, of=('self',)
+        )[:batch_size])
+        if not batch:
+            return 0
+
+        author_ids = {comment.author_id for comment in batch}
+        trusted = set(Comment.objects.filter(
+            author_id__in=author_ids, status='approved'
+        ).values_list('author_id', flat=True).distinct())
+        stats = load_token_stats(set().union(*(tokenize(c.content) for c in batch)))
+        new_account_since = timezone.now() - timedelta(days=1)
+
+        approved = Counter()
+        for comment in batch:
+            comment.spam_score = score_comment(
+                comment.content,
+                stats,
+                trusted=comment.author_id in trusted,
+                new_account=comment.author.date_joined > new_account_since,
+            )
+            comment.status = 'approved' if comment.spam_score < AUTO_APPROVE_BELOW else 'held'
+            comment.is_approved = comment.status == 'approved'
+            if comment.is_approved:
+                approved[comment.post_id] += 1
+
+        Comment.objects.bulk_update(batch, ['status', 'is_approved', 'spam_score'])
+        counters.adjust_comment_counts(approved)
+        comments_approved([comment.pk for comment in batch if comment.is_approved])
+    return len(batch)
+
+
+def comments_approved(comment_ids):
+    """Everything that follows a first approval: notifications and engagement events"""
+    if comment_ids:
+        notifications.comments_approved(comment_ids)
+        events.comments_approved(comment_ids)
+
+
+def _moderate_in_background(comment_id):
+    # The comment was just committed; a replica may not have it yet
+    try:
+        with use_primary():
+            moderate_pending([comment_id])
+    except Exception:
+        logger.exception('Moderating comment %s failed', comment_id)
+    finally:
+        close_old_connections()
+
+
+def schedule_moderation(comment_id):
+    """Score a new comment off the request path once it is committed"""
+    transaction.on_commit(lambda: _executor.submit(_moderate_in_background, comment_id))
+
+
+# ========== MODERATOR ACTIONS ==========
+
+def set_status(queryset, status):
+    """
+    Move every comment in ``queryset`` to ``status`` with a single UPDATE.
+
+    Approved counts are adjusted for all affected posts at once, and first
+    decisions on unreviewed comments train the classifier.
+    """
+    approve = status == 'approved'
+    changed = queryset.exclude(status=status)
+    with transaction.atomic():
+        flipping = changed.filter(is_approved=not approve).values('post_id').annotate(
+            n=Count('pk')
+        ).order_by()
+        deltas = {row['post_id']: row['n'] if approve else -row['n'] for row in flipping}
+        training_ids = []
+        if status in ('approved', 'rejected'):
+            training_ids = list(changed.filter(
+                status__in=('pending', 'held')
+            ).values_list('pk', flat=True))
+
+        approved_ids = list(changed.filter(is_approved=False).values_list('pk', flat=True)) if approve else []
+
+        updated = changed.update(status=status, is_approved=approve)
+        counters.adjust_comment_counts(deltas)
+        if approved_ids:
+            comments_approved(approved_ids)
+
+        if training_ids:
+            spam = status == 'rejected'
+            transaction.on_commit(lambda: _executor.submit(_train_in_background, training_ids, spam))
+    return updated
+
+
+def approve(queryset):
+    return set_status(queryset, 'approved')
+
+
+def reject(queryset):
+    return set_status(queryset, 'rejected')
+
+
+# ========== TRAINING ==========
+
+def train(comment_ids, spam):
+    """Add the given comments to the spam (or ham) token counts"""
+    documents = Counter()
+    trained = 0
+    comments = Comment.objects.filter(pk__in=comment_ids).values_list('content', flat=True)
+    for content in comments.iterator(chunk_size=BATCH_SIZE):
+        documents.update(tokenize(content))
+        trained += 1
+    if not trained:
+        return 0
+    documents[TOTALS_TOKEN] = trained
+
+    # Concurrent trainings (the background thread, admin actions) must
+    # not overwrite each other: create missing rows, then add in SQL
+    SpamToken.objects.bulk_create(
+        [SpamToken(token=token) for token in documents],
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+    column = 'spam' if spam else 'ham'
+    by_count = defaultdict(list)
+    for token, count in documents.items():
+        by_count[count].append(token)
+    for count, tokens in by_count.items():
+        for start in range(0, len(tokens), BATCH_SIZE):
+            SpamToken.objects.filter(token__in=tokens[start:start + BATCH_SIZE]).update(
+                **{column: F(column) + count}
+            )
+    return trained
+
+
+def _train_in_background(comment_ids, spam):
+    try:
+        with use_primary():
+            train(comment_ids, spam)
+    except Exception:
+        logger.exception('Training the spam scorer failed')
+    finally:
+        close_old_connections()
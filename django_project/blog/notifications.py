@@ -0,0 +1,205 @@
+"""
+Notifications.
+
+Requests only record a ``NotificationEvent`` (a post was published, a
+comment approved, a user followed). After the request commits, a
+background thread expands each event into one ``Notification`` per
+recipient with ``bulk_create`` in chunks. A post's followers can number in
+the thousands, and that work never runs on the request path. The
+``fanout_notifications`` command sweeps up events the thread missed.
+Workers claim events in a short transaction and fan out outside it, so a
+large fan-out never holds a lock (or SQLite's write lock) for long.
+
+Unread counts live in the cache. Fan-out drops the recipients' cached
+counts, and the next read recounts at most ``UNREAD_CAP`` rows, so no
+query ever counts a user's whole history.
+"""
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.db import close_old_connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from django_project.routers import use_primary
+from .models import Comment, Follow, Notification, NotificationEvent, Post
+
+logger = logging.getLogger(__name__)
+
+# Notifications inserted per bulk_create
+FANOUT_CHUNK = 1000
+# Events claimed per batch
+EVENT_BATCH = 50
+# Claims older than this belong to a worker that died; they are retried
+CLAIM_TIMEOUT = timedelta(minutes=10)
+# Following the same user again within this window (or while the last
+# follow notification is unread) notifies nobody
+FOLLOW_RENOTIFY_AFTER = timedelta(days=1)
+# Unread counts above this are shown as "99+"
+UNREAD_CAP = 100
+UNREAD_CACHE_TIMEOUT = 3600
+
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='notifications')
+
+
+def _unread_key(user_id):
+    return f'notifications:unread:{user_id}'
+
+
+# ========== ENQUEUEING ==========
+
+def _enqueue(events):
+    # Duplicates (a re-published post, a re-approved comment) are dropped
+    # by the unique constraints
+    NotificationEvent.objects.bulk_create(events, ignore_conflicts=True)
+    schedule_fanout()
+
+
+def posts_published(post_ids):
+    """Notify the authors' followers about newly published posts"""
+    posts = Post.objects.filter(pk__in=post_ids, status='published').values_list('pk', 'author_id')
+    _enqueue([NotificationEvent(kind='published', actor_id=author_id, post_id=pk) for pk, author_id in posts])
+
+
+def comments_approved(comment_ids):
+    """Notify post authors and, for replies, the parent comment's author"""
+    comments = Comment.objects.filter(pk__in=comment_ids, is_approved=True).values_list(
+        'pk', 'author_id', 'post_id', 'parent_id'
+    )
+    _enqueue([
+        NotificationEvent(
+            kind='reply' if parent_id else 'comment', actor_id=author_id, post_id=post_id, comment_id=pk,
+        )
+        for pk, author_id, post_id, parent_id in comments
+    ])
+
+
+def followed(follower_id, following_id):
+    """Notify a user about a new follower, unless a toggle already did"""
+    pending_or_recent = NotificationEvent.objects.filter(
+        kind='follow', actor_id=follower_id, recipient_id=following_id,
+    ).filter(
+        Q(expanded_at__isnull=True)
+        | Q(created_at__gte=timezone.now() - FOLLOW_RENOTIFY_AFTER)
+        | Q(notifications__isnull=False, notifications__read_at__isnull=True)
+    )
+    if pending_or_recent.exists():
+        return
+    _enqueue([NotificationEvent(kind='follow', actor_id=follower_id, recipient_id=following_id)])
+
+
+# ========== FAN-OUT ==========
+
+def recipient_ids(event):
+    """Iterate the user ids ``event`` notifies, excluding its actor"""
+    if event.kind == 'published':
+        ids = Follow.objects.filter(following_id=event.actor_id).values_list(
+            'follower_id', flat=True
+        ).order_by().iterator(chunk_size=FANOUT_CHUNK)
+    elif event.kind in ('comment', 'reply'):
+        row = Comment.objects.filter(pk=event.comment_id).values_list('post__author_id', 'parent__author_id').first()
+        ids = {user_id for user_id in row or () if user_id}
+    else:
+        ids = [event.recipient_id] if event.recipient_id else []
+    for user_id in ids:
+        if user_id != event.actor_id:
+            yield user_id
+
+
+def _flush(event, user_ids):
+    Notification.objects.bulk_create(
+        [Notification(recipient_id=user_id, event=event, created_at=event.created_at) for user_id in user_ids],
+        ignore_conflicts=True,
+    )
+    cache.delete_many([_unread_key(user_id) for user_id in user_ids])
+
+
+def expand(event):
+    """Create the event's notifications in chunks; return how many"""
+    total = 0
+    chunk = []
+    for user_id in recipient_ids(event):
+        chunk.append(user_id)
+        if len(chunk) >= FANOUT_CHUNK:
+            _flush(event, chunk)
+            total += len(chunk)
+            chunk = []
+    if chunk:
+        _flush(event, chunk)
+        total += len(chunk)
+    return total
+
+
+def claim(batch_size=EVENT_BATCH):
+    """Mark up to ``batch_size`` unexpanded, unclaimed events as ours"""
+    now = timezone.now()
+    with transaction.atomic():
+        events = list(
+            NotificationEvent.objects.filter(expanded_at__isnull=True)
+            .filter(Q(claimed_at__isnull=True) | Q(claimed_at__lt=now - CLAIM_TIMEOUT))
+            .order_by('created_at')
+            .select_for_update(skip_locked=True)[:batch_size]
+        )
+        NotificationEvent.objects.filter(pk__in=[event.pk for event in events]).update(claimed_at=now)
+    return events
+
+
+def expand_pending(batch_size=EVENT_BATCH):
+    """
+    Expand one batch of unexpanded events; return (events, notifications).
+
+    Only claiming runs in a transaction. Each event is expanded in its own
+    short inserts and marked done right after. Inserts ignore existing
+    (recipient, event) pairs, so an event retried after a worker died
+    halfway is never delivered twice.
+    """
+    events = claim(batch_size)
+    delivered = 0
+    for event in events:
+        delivered += expand(event)
+        NotificationEvent.objects.filter(pk=event.pk).update(expanded_at=timezone.now())
+    return len(events), delivered
+
+
+def _fanout_in_background():
+    # Read the events just committed from the primary, not a lagging replica
+    try:
+        with use_primary():
+            while expand_pending()[0]:
+                pass
+    except Exception:
+        logger.exception('Notification fan-out failed')
+    finally:
+        close_old_connections()
+
+
+def schedule_fanout():
+    """Expand pending events off the request path once they are committed"""
+    transaction.on_commit(lambda: _executor.submit(_fanout_in_background))
+
+
+# ========== READING ==========
+
+def unread_count(user_id):
+    """Unread notifications, capped at UNREAD_CAP"""
+    key = _unread_key(user_id)
+    count = cache.get(key)
+    if count is None:
+        count = Notification.objects.filter(recipient_id=user_id, read_at__isnull=True)[:UNREAD_CAP].count()
+        cache.set(key, count, UNREAD_CACHE_TIMEOUT)
+    return count
+
+
+def mark_read(user_id, notification_ids=None):
+    """Mark some (or all) of a user's notifications read; return how many"""
+    unread = Notification.objects.filter(recipient_id=user_id, read_at__isnull=True)
+    if notification_ids is not None:
+        unread = unread.filter(pk__in=notification_ids)
+    updated = unread.update(read_at=timezone.now())
+    if notification_ids is None:
+        cache.set(_unread_key(user_id), 0, UNREAD_CACHE_TIMEOUT)
+    elif updated:
+        cache.delete(_unread_key(user_id))
+    return updated
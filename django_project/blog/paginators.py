@@ -0,0 +1,140 @@
+import hashlib
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.db import close_old_connections, connections
+from django.utils.functional import cached_property
+
+from django_project.routers import use_primary
+
+logger = logging.getLogger(__name__)
+
+# Below this many rows an exact COUNT(*) is cheap enough
+ESTIMATE_THRESHOLD = getattr(settings, 'PAGINATION_EXACT_COUNT_THRESHOLD', 10000)
+# Cached totals older than this are refreshed in the background
+COUNT_REFRESH_SECONDS = getattr(settings, 'PAGINATION_COUNT_REFRESH_SECONDS', 60)
+COUNT_CACHE_TIMEOUT = 24 * 3600
+# Pages shown on each side of the current page
+PAGE_WINDOW = 2
+
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='counts')
+
+
+def estimate_table_rows(queryset):
+    """
+    Planner row estimate for an unfiltered queryset, or None.
+
+    Only PostgreSQL keeps a usable estimate (pg_class.reltuples); filtered
+    querysets always need an exact count.
+    """
+    if queryset.query.where or queryset.query.distinct:
+        return None
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass',
+            [queryset.model._meta.db_table],
+        )
+        row = cursor.fetchone()
+    if row is None or row[0] < 0:
+        return None
+    return row[0]
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator that skips COUNT(*) on large unfiltered tables"""
+
+    @cached_property
+    def count(self):
+        if hasattr(self.object_list, 'query'):
+            estimate = estimate_table_rows(self.object_list)
+            if estimate is not None and estimate >= ESTIMATE_THRESHOLD:
+                return estimate
+        return super().count
+
+
+# ========== CACHED COUNTS ==========
+
+def _count_cache_key(queryset):
+    sql, params = queryset.order_by().query.sql_with_params()
+    digest = hashlib.md5(f'{queryset._db}:{sql}:{params}'.encode('utf-8')).hexdigest()
+    return f'paginator:count:{digest}'
+
+
+def _refresh_count(queryset, key):
+    try:
+        with use_primary():
+            total = queryset.count()
+        cache.set(key, (total, time.time()), COUNT_CACHE_TIMEOUT)
+    except Exception:
+        logger.exception('Refreshing cached count failed')
+    finally:
+        cache.delete(f'{key}:refreshing')
+        close_old_connections()
+
+
+def _schedule_refresh(queryset, key):
+    # One refresh per query at a time, across all workers sharing the cache
+    if cache.add(f'{key}:refreshing', True, COUNT_REFRESH_SECONDS):
+        _executor.submit(_refresh_count, queryset._chain(), key)
+
+
+def approximate_count(queryset):
+    """
+    Row count that avoids COUNT(*) on large result sets.
+
+    Small results are counted exactly. Large ones are served from a cached
+    total (refreshed in the background once stale) or, for unfiltered
+    PostgreSQL tables, from planner statistics.
+    """
+    key = _count_cache_key(queryset)
+    cached = cache.get(key)
+    if cached is not None:
+        total, counted_at = cached
+        if total >= ESTIMATE_THRESHOLD:
+            if time.time() - counted_at > COUNT_REFRESH_SECONDS:
+                _schedule_refresh(queryset, key)
+            return total
+    else:
+        estimate = estimate_table_rows(queryset)
+        if estimate is not None and estimate >= ESTIMATE_THRESHOLD:
+            _schedule_refresh(queryset, key)
+            return estimate
+
+    total = queryset.count()
+    cache.set(key, (total, time.time()), COUNT_CACHE_TIMEOUT)
+    return total
+
+
+class ApproximateCountPaginator(Paginator):
+    """Paginator for public listings backed by approximate_count()"""
+
+    @cached_property
+    def count(self):
+        if hasattr(self.object_list, 'query'):
+            return approximate_count(self.object_list)
+        return super().count
+
+    def get_window_range(self, number, on_each_side=PAGE_WINDOW):
+        """Page numbers around ``number`` instead of every page"""
+        start = max(1, number - on_each_side)
+        end = min(self.num_pages, number + on_each_side)
+        return range(start, end + 1)
+
+
+class WindowedPaginationMixin:
+    """ListView mixin: approximate counts and a windowed ``page_range``"""
+    paginator_class = ApproximateCountPaginator
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        page_obj = context.get('page_obj')
+        if page_obj is not None:
+            context['page_range'] = page_obj.paginator.get_window_range(page_obj.number)
+        return context
@@ -0,0 +1,154 @@
+"""
+Rate limiting for write endpoints.
+
+Policies live in ``settings.RATELIMITS``, keyed by URL name::
+
+    RATELIMITS = {'toggle-like': {'rate': '30/m'}}
+
+Each client (user id, or IP address for anonymous users) gets a sliding
+window counter per route, stored in the Django cache with atomic ``incr``
+so every worker sharing the cache sees the same counts. Limits are applied
+by the ``ratelimit`` decorator or ``RateLimitMiddleware``; blocked requests
+get a JSON 429 response.
+"""
+import math
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import JsonResponse
+
+PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+STATS_TIMEOUT = 7 * 86400
+
+
+def parse_rate(rate):
+    """'30/m' -> (30, 60)"""
+    count, period = rate.split('/')
+    return int(count), PERIODS[period[0].lower()]
+
+
+def get_policy(route):
+    return getattr(settings, 'RATELIMITS', {}).get(route)
+
+
+def client_key(request):
+    if request.user.is_authenticated:
+        return f'user:{request.user.pk}'
+    if getattr(settings, 'RATELIMIT_TRUST_FORWARDED_FOR', False):
+        forwarded = request.META.get('HTTP_X_FORWARDED_FOR', '')
+        if forwarded:
+            return f'ip:{forwarded.split(",")[0].strip()}'
+    return f'ip:{request.META.get("REMOTE_ADDR", "")}'
+
+
+def _incr(key, timeout):
+    cache.add(key, 0, timeout)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        # Evicted between add() and incr()
+        cache.set(key, 1, timeout)
+        return 1
+
+
+def hit(route, client, limit, period):
+    """
+    Count one request and return (allowed, retry_after).
+
+    The estimate weights the previous window by how much of it still
+    overlaps the sliding window, which smooths bursts at window edges.
+    """
+    now = time.time()
+    window = int(now // period)
+    current = _incr(f'ratelimit:{route}:{client}:{window}', period * 2)
+    previous = cache.get(f'ratelimit:{route}:{client}:{window - 1}', 0)
+    elapsed = (now % period) / period
+    estimated = previous * (1 - elapsed) + current
+    if estimated <= limit:
+        return True, 0
+    return False, max(1, math.ceil(period - now % period))
+
+
+def record(route, allowed):
+    _incr(f'ratelimit:stats:{route}:{"allowed" if allowed else "blocked"}', STATS_TIMEOUT)
+
+
+def get_stats():
+    """Allowed/blocked counters for every configured route"""
+    routes = getattr(settings, 'RATELIMITS', {})
+    keys = {
+        f'ratelimit:stats:{route}:{outcome}': (route, outcome)
+        for route in routes
+        for outcome in ('allowed', 'blocked')
+    }
+    values = cache.get_many(list(keys))
+    stats = {route: {'allowed': 0, 'blocked': 0} for route in routes}
+    for key, value in values.items():
+        route, outcome = keys[key]
+        stats[route][outcome] = value
+    return stats
+
+
+def too_many_requests(retry_after):
+    response = JsonResponse({
+        'success': False,
+        'error': 'Too many requests. Please slow down.',
+        'message': 'Too many requests. Please slow down.',
+        'retry_after': retry_after,
+    }, status=429)
+    response['Retry-After'] = str(retry_after)
+    return response
+
+
+def check(request, route):
+    """Apply the route's policy; return a 429 response or None"""
+    policy = get_policy(route)
+    if policy is None or not getattr(settings, 'RATELIMIT_ENABLED', True):
+        return None
+    if request.method not in policy.get('methods', ('POST',)):
+        return None
+
+    # A route is only counted once per request (decorator + middleware)
+    checked = getattr(request, '_ratelimit_checked', set())
+    if route in checked:
+        return None
+    checked.add(route)
+    request._ratelimit_checked = checked
+
+    limit, period = parse_rate(policy['rate'])
+    allowed, retry_after = hit(route, client_key(request), limit, period)
+    record(route, allowed)
+    if not allowed:
+        return too_many_requests(retry_after)
+    return None
+
+
+def ratelimit(route):
+    """Limit a view with the ``settings.RATELIMITS`` policy for ``route``"""
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapped(request, *args, **kwargs):
+            response = check(request, route)
+            if response is not None:
+                return response
+            return view_func(request, *args, **kwargs)
+        return wrapped
+    return decorator
+
+
+class RateLimitMiddleware:
+    """Apply ``settings.RATELIMITS`` to any matching URL name"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        return self.get_response(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        match = request.resolver_match
+        if match is None or not match.url_name:
+            return None
+        return check(request, match.url_name)
@@ -0,0 +1,61 @@
+"""
+Post body rendering.
+
+Content is plain text, rendered once at save time into escaped HTML: blank
+lines separate paragraphs (as the ``linebreaks`` filter does) and lines
+starting with ``#``, ``##`` or ``###`` become headings with stable ids that
+the table of contents links to.
+"""
+import hashlib
+import re
+
+from django.utils.html import escape, linebreaks
+from django.utils.text import slugify
+
+# Bump when the output format changes so every post is re-rendered
+RENDERER_VERSION = 1
+
+HEADING_RE = re.compile(r'^(#{1,3})\s+(.+?)\s*#*\s*$')
+PARAGRAPH_SPLIT_RE = re.compile(r'\n{2,}')
+
+
+def content_hash(content):
+    digest = hashlib.sha256(f'{RENDERER_VERSION}:{content}'.encode('utf-8'))
+    return digest.hexdigest()
+
+
+def _unique_id(title, used):
+    base = slugify(title) or 'section'
+    anchor, counter = base, 1
+    while anchor in used:
+        anchor = f'{base}-{counter}'
+        counter += 1
+    used.add(anchor)
+    return anchor
+
+
+def render_content(content):
+    """Return (html, toc) where toc is a list of {level, id, title}"""
+    content = content.replace('\r\n', '\n').replace('\r', '\n').strip()
+    html, toc, used_ids = [], [], set()
+
+    for block in PARAGRAPH_SPLIT_RE.split(content):
+        paragraph = []
+        for line in block.split('\n'):
+            match = HEADING_RE.match(line)
+            if not match:
+                paragraph.append(line)
+                continue
+            if paragraph:
+                html.append(linebreaks('\n'.join(paragraph), autoescape=True))
+                paragraph = []
+            # '#' renders as <h2>; <h1> is the post title
+            level = len(match.group(1)) + 1
+            title = match.group(2)
+            anchor = _unique_id(title, used_ids)
+            toc.append({'level': level, 'id': anchor, 'title': title})
+            html.append(f'<h{level} id="{anchor}">{escape(title)}</h{level}>')
+        if paragraph:
+            html.append(linebreaks('\n'.join(paragraph), autoescape=True))
+
+    return '\n\n'.join(html), toc
@@ -0,0 +1,112 @@
+"""
+Cached post search.
+
+Queries are normalized into terms (lowercased words, stop-words dropped,
+sorted) so "The  Django tips" and "tips django" share one cache entry. An
+entry holds the ranked post ids for the terms plus the active filters. Keys
+include a global published-posts version that the signals bump whenever a
+published post changes, so stale entries are never read and simply expire.
+``SearchResults`` hydrates only the ids a page shows, with one in_bulk().
+"""
+import hashlib
+import json
+import re
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Case, IntegerField, Q, Value, When
+
+SEARCH_CACHE_TIMEOUT = getattr(settings, 'SEARCH_CACHE_TIMEOUT', 600)
+# Ranked ids kept per query; later results are not reachable by paging
+MAX_RESULTS = 1000
+VERSION_KEY = 'search:published-version'
+
+STOP_WORDS = frozenset(
+    'a an and are as at be but by for from has have how i if in into is it its of on or '
+    'so than that the their there these this to was were what when where which who why '
+    'will with you your'.split()
+)
+WORD_RE = re.compile(r'\w+')
+
+
+def normalize_query(query):
+    """Sorted unique search terms; stop-words are kept only if nothing else is left"""
+    words = WORD_RE.findall(query.lower())
+    terms = [word for word in words if word not in STOP_WORDS] or words
+    return sorted(set(terms))
+
+
+def terms_filter(terms, fields):
+    """Every term must appear in at least one of ``fields``"""
+    condition = Q()
+    for term in terms:
+        any_field = Q()
+        for field in fields:
+            any_field |= Q(**{f'{field}__icontains': term})
+        condition &= any_field
+    return condition
+
+
+def rank_by_title(queryset, terms):
+    """Annotate ``title_rank``: how many of the terms the title contains"""
+    rank = Value(0, output_field=IntegerField())
+    for term in terms:
+        rank = rank + Case(When(title__icontains=term, then=1), default=0, output_field=IntegerField())
+    return queryset.annotate(title_rank=rank)
+
+
+def published_version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, 1, None)
+        version = cache.get(VERSION_KEY, 1)
+    return version
+
+
+def bump_published_version():
+    """Make every cached result computed so far unreachable"""
+    try:
+        return cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.set(VERSION_KEY, 1, None)
+        return 1
+
+
+def cached_ids(scope, terms, filters, build):
+    """Ranked post ids for ``terms`` and ``filters``; ``build()`` runs on a miss"""
+    raw = json.dumps([scope, terms, sorted(filters.items())], default=str)
+    key = f'search:{published_version()}:{hashlib.md5(raw.encode("utf-8")).hexdigest()}'
+    ids = cache.get(key)
+    if ids is None:
+        # Ordering by a multi-valued relation can repeat a post
+        ids = list(dict.fromkeys(build().values_list('pk', flat=True)[:MAX_RESULTS]))
+        cache.set(key, ids, SEARCH_CACHE_TIMEOUT)
+    return ids
+
+
+class SearchResults:
+    """A list of post ids that loads posts only for the slice being read"""
+
+    def __init__(self, ids, queryset):
+        self.ids = ids
+        self.queryset = queryset
+
+    def __len__(self):
+        return len(self.ids)
+
+    def count(self):
+        return len(self.ids)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            page_ids = self.ids[index]
+            posts = self.queryset.in_bulk(page_ids)
+            # Posts unpublished since the ids were cached are dropped
+            return [posts[pk] for pk in page_ids if pk in posts]
+        if index < 0:
+            index += len(self.ids)
+        return self[index:index + 1][0]
+
+    def __iter__(self):
+        for start in range(0, len(self.ids), 100):
+            yield from self[start:start + 100]
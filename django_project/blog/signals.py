@@ -0,0 +1,373 @@
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete, m2m_changed
+from django.dispatch import receiver, Signal
+from .models import Post, Category, Tag, Comment, Bookmark, BookmarkTombstone, Follow
+from django_project.users.models import Profile
+from . import sitemaps, counters, moderation, media, notifications, search
+from .autocomplete import tag_index, category_index, post_index, author_index
+
+# Sent after posts are published in bulk (update() skips post_save).
+# Arguments: post_ids
+posts_published = Signal()
+# Sent after published posts are moved back to draft in bulk.
+# Arguments: post_ids
+posts_unpublished = Signal()
+
+# Saves that never change what the sitemap shows
+SITEMAP_IGNORED_FIELDS = {'views_count', 'last_login'}
+
+
+def _only_touches(update_fields, ignored):
+    return bool(update_fields) and set(update_fields) <= ignored
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def invalidate_post_sitemaps(sender, instance, update_fields=None, **kwargs):
+    if _only_touches(update_fields, SITEMAP_IGNORED_FIELDS):
+        return
+    sitemaps.invalidate('posts', instance.pk)
+    sitemaps.invalidate('authors', instance.author_id)
+    if instance.category_id:
+        sitemaps.invalidate('categories', instance.category_id)
+    # Tag lastmod depends on every tagged post; the tag section is small
+    sitemaps.invalidate('tags')
+
+
+@receiver(posts_published)
+@receiver(posts_unpublished)
+def invalidate_published_sitemaps(sender, post_ids, **kwargs):
+    rows = Post.objects.filter(pk__in=post_ids).values_list('pk', 'author_id', 'category_id')
+    for pk, author_id, category_id in rows:
+        sitemaps.invalidate('posts', pk)
+        sitemaps.invalidate('authors', author_id)
+        if category_id:
+            sitemaps.invalidate('categories', category_id)
+    sitemaps.invalidate('tags')
+
+
+@receiver(m2m_changed, sender=Post.tags.through)
+def invalidate_tag_sitemaps(sender, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        sitemaps.invalidate('tags')
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_category_sitemaps(sender, instance, **kwargs):
+    sitemaps.invalidate('categories', instance.pk)
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def invalidate_tag_sitemap(sender, instance, **kwargs):
+    sitemaps.invalidate('tags', instance.pk)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_author_sitemaps(sender, instance, update_fields=None, **kwargs):
+    if _only_touches(update_fields, SITEMAP_IGNORED_FIELDS):
+        return
+    sitemaps.invalidate('authors', instance.pk)
+
+
+@receiver(post_save, sender=Tag)
+def update_tag_autocomplete(sender, instance, **kwargs):
+    tag_index.upsert({'id': instance.pk, 'name': instance.name, 'slug': instance.slug, 'score': 0})
+
+
+@receiver(post_delete, sender=Tag)
+def remove_tag_autocomplete(sender, instance, **kwargs):
+    tag_index.delete(instance.pk)
+
+
+@receiver(post_save, sender=Category)
+def update_category_autocomplete(sender, instance, **kwargs):
+    category_index.upsert({'id': instance.pk, 'name': instance.name, 'slug': instance.slug, 'score': 0})
+
+
+@receiver(post_delete, sender=Category)
+def remove_category_autocomplete(sender, instance, **kwargs):
+    category_index.delete(instance.pk)
+
+
+# ========== SEARCH SUGGESTIONS ==========
+
+SUGGESTION_FIELDS = {'title', 'status'}
+
+
+def _was_published(instance, created):
+    """Whether a just-saved post was published before the save"""
+    if created:
+        return False
+    # remember_post_state loads the old status whenever it may have changed
+    state = getattr(instance, '_count_state', None)
+    return state[0] == 'published' if state else instance.status == 'published'
+
+
+@receiver(post_save, sender=Post)
+def update_post_suggestions(sender, instance, created, update_fields=None, **kwargs):
+    if update_fields and not SUGGESTION_FIELDS & set(update_fields):
+        return
+    is_published = instance.status == 'published'
+    was_published = _was_published(instance, created)
+
+    if is_published:
+        post_index.upsert({'id': instance.pk, 'name': instance.title, 'score': instance.views_count})
+    elif was_published:
+        post_index.delete(instance.pk)
+    if is_published != was_published:
+        author_index.invalidate()
+
+
+@receiver(post_delete, sender=Post)
+def remove_post_suggestions(sender, instance, **kwargs):
+    if instance.status == 'published':
+        post_index.delete(instance.pk)
+        author_index.invalidate()
+
+
+@receiver(posts_published)
+@receiver(posts_unpublished)
+def refresh_published_suggestions(sender, post_ids, **kwargs):
+    post_index.invalidate()
+    author_index.invalidate()
+
+
+@receiver(post_save, sender=User)
+def update_author_suggestions(sender, instance, update_fields=None, **kwargs):
+    if update_fields is None or 'username' in update_fields:
+        author_index.invalidate()
+
+
+# ========== SEARCH CACHE ==========
+
+@receiver(post_save, sender=Post)
+def invalidate_search_on_save(sender, instance, created, update_fields=None, **kwargs):
+    if _only_touches(update_fields, SITEMAP_IGNORED_FIELDS):
+        return
+    if instance.status == 'published' or _was_published(instance, created):
+        search.bump_published_version()
+
+
+@receiver(post_delete, sender=Post)
+def invalidate_search_on_delete(sender, instance, **kwargs):
+    if instance.status == 'published':
+        search.bump_published_version()
+
+
+@receiver(posts_published)
+@receiver(posts_unpublished)
+def invalidate_search_on_bulk_publish(sender, post_ids, **kwargs):
+    search.bump_published_version()
+
+
+@receiver(m2m_changed, sender=Post.tags.through)
+def invalidate_search_on_retag(sender, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        search.bump_published_version()
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def invalidate_search_on_taxonomy_change(sender, **kwargs):
+    # Results are filtered by category and tag slugs
+    search.bump_published_version()
+
+
+# ========== PUBLISHED POST COUNTS ==========
+
+COUNT_FIELDS = {'status', 'category', 'category_id'}
+
+
+def _affects_counts(update_fields):
+    return not update_fields or bool(COUNT_FIELDS & set(update_fields))
+
+
+@receiver(pre_save, sender=Post)
+def remember_post_state(sender, instance, update_fields=None, **kwargs):
+    instance._count_state = None
+    if instance.pk and _affects_counts(update_fields):
+        instance._count_state = Post.objects.filter(pk=instance.pk).values_list(
+            'status', 'category_id'
+        ).first()
+
+
+@receiver(post_save, sender=Post)
+def update_counts_on_save(sender, instance, created, update_fields=None, **kwargs):
+    if not _affects_counts(update_fields):
+        return
+    old_status, old_category_id = getattr(instance, '_count_state', None) or (None, None)
+    was_published = old_status == 'published'
+    is_published = instance.status == 'published'
+
+    old_category_id = old_category_id if was_published else None
+    new_category_id = instance.category_id if is_published else None
+    if old_category_id != new_category_id:
+        counters.adjust_categories([old_category_id], -1)
+        counters.adjust_categories([new_category_id], 1)
+
+    # New posts get their tags afterwards, through m2m_changed
+    if not created and was_published != is_published:
+        tag_ids = list(counters.TagThrough.objects.filter(post_id=instance.pk).values_list('tag_id', flat=True))
+        counters.adjust_tags(tag_ids, 1 if is_published else -1)
+
+
+@receiver(pre_delete, sender=Post)
+def remember_post_tags(sender, instance, **kwargs):
+    instance._count_tag_ids = list(
+        counters.TagThrough.objects.filter(post_id=instance.pk).values_list('tag_id', flat=True)
+    )
+
+
+@receiver(post_delete, sender=Post)
+def update_counts_on_delete(sender, instance, **kwargs):
+    if instance.status == 'published':
+        counters.adjust_categories([instance.category_id], -1)
+        counters.adjust_tags(getattr(instance, '_count_tag_ids', []), -1)
+
+
+@receiver(m2m_changed, sender=Post.tags.through)
+def update_counts_on_retag(sender, instance, action, reverse, pk_set, **kwargs):
+    # remove() reports every id it was given, attached or not, so the
+    # attached ones are looked up before the rows go
+    if reverse:
+        # tag.posts.add/remove/clear: pk_set holds post ids
+        if action == 'pre_remove':
+            instance._count_removed = Post.objects.filter(
+                pk__in=pk_set, status='published', tags=instance
+            ).count()
+        elif action == 'post_add':
+            counters.adjust_tags([instance.pk], Post.objects.filter(pk__in=pk_set, status='published').count())
+        elif action == 'post_remove':
+            counters.adjust_tags([instance.pk], -getattr(instance, '_count_removed', 0))
+        elif action == 'post_clear':
+            Tag.objects.filter(pk=instance.pk).update(published_post_count=0)
+        return
+
+    if instance.status != 'published':
+        return
+    if action == 'pre_clear':
+        instance._count_tag_ids = list(instance.tags.values_list('pk', flat=True))
+    elif action == 'pre_remove':
+        instance._count_removed = list(instance.tags.filter(pk__in=pk_set).values_list('pk', flat=True))
+    elif action == 'post_add':
+        counters.adjust_tags(pk_set, 1)
+    elif action == 'post_remove':
+        counters.adjust_tags(getattr(instance, '_count_removed', []), -1)
+    elif action == 'post_clear':
+        counters.adjust_tags(getattr(instance, '_count_tag_ids', []), -1)
+
+
+@receiver(posts_published)
+def update_counts_on_bulk_publish(sender, post_ids, **kwargs):
+    counters.adjust_for_posts(post_ids, 1)
+
+
+@receiver(posts_unpublished)
+def update_counts_on_bulk_unpublish(sender, post_ids, **kwargs):
+    counters.adjust_for_posts(post_ids, -1)
+
+
+# ========== COMMENT MODERATION ==========
+
+@receiver(pre_save, sender=Comment)
+def remember_comment_approval(sender, instance, **kwargs):
+    instance._was_approved = False
+    if instance.pk:
+        instance._was_approved = Comment.objects.filter(pk=instance.pk, is_approved=True).exists()
+
+
+@receiver(post_save, sender=Comment)
+def update_comment_counts_on_save(sender, instance, created, **kwargs):
+    was_approved = getattr(instance, '_was_approved', False)
+    if was_approved != instance.is_approved:
+        counters.adjust_comment_counts({instance.post_id: 1 if instance.is_approved else -1})
+    if created and instance.status == 'pending':
+        moderation.schedule_moderation(instance.pk)
+    if instance.is_approved and not was_approved:
+        moderation.comments_approved([instance.pk])
+
+
+@receiver(post_delete, sender=Comment)
+def update_comment_counts_on_delete(sender, instance, **kwargs):
+    if instance.is_approved:
+        counters.adjust_comment_counts({instance.post_id: -1})
+
+
+# ========== NOTIFICATIONS ==========
+
+@receiver(post_save, sender=Post)
+def notify_on_publish(sender, instance, created, update_fields=None, **kwargs):
+    if instance.status == 'published' and not _was_published(instance, created):
+        notifications.posts_published([instance.pk])
+
+
+@receiver(posts_published)
+def notify_on_bulk_publish(sender, post_ids, **kwargs):
+    notifications.posts_published(post_ids)
+
+
+@receiver(post_save, sender=Follow)
+def notify_on_follow(sender, instance, created, **kwargs):
+    if created:
+        notifications.followed(instance.follower_id, instance.following_id)
+
+
+# ========== BOOKMARK TOMBSTONES ==========
+
+@receiver(pre_delete, sender=Post)
+def remember_post_bookmarks(sender, instance, **kwargs):
+    instance._bookmark_user_ids = list(
+        Bookmark.objects.filter(post=instance).values_list('user_id', flat=True)
+    )
+
+
+@receiver(post_delete, sender=Post)
+def tombstone_post_bookmarks(sender, instance, **kwargs):
+    # Cascaded bookmark deletes must still reach syncing clients. Recorded
+    # after commit, skipping users deleted in the same cascade.
+    user_ids = getattr(instance, '_bookmark_user_ids', [])
+    if not user_ids:
+        return
+    post_id = instance.pk
+
+    def record():
+        remaining = User.objects.filter(pk__in=user_ids).values_list('pk', flat=True)
+        BookmarkTombstone.record([(user_id, post_id) for user_id in remaining])
+
+    transaction.on_commit(record)
+
+
+# ========== MEDIA REFERENCES ==========
+
+# Fields stored by content; must match media.REFERENCES
+MEDIA_FIELDS = {Post: 'featured_image', Profile: 'image'}
+
+
+@receiver(pre_save, sender=Post)
+@receiver(pre_save, sender=Profile)
+def remember_media_name(sender, instance, update_fields=None, **kwargs):
+    field = MEDIA_FIELDS[sender]
+    instance._media_name = None
+    if instance.pk and (update_fields is None or field in update_fields):
+        instance._media_name = sender.objects.filter(pk=instance.pk).values_list(field, flat=True).first()
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_save, sender=Profile)
+def update_media_references_on_save(sender, instance, update_fields=None, **kwargs):
+    field = MEDIA_FIELDS[sender]
+    if update_fields is not None and field not in update_fields:
+        return
+    media.replace(getattr(instance, '_media_name', None) or '', getattr(instance, field).name or '')
+
+
+@receiver(post_delete, sender=Post)
+@receiver(post_delete, sender=Profile)
+def release_media_on_delete(sender, instance, **kwargs):
+    media.release(getattr(instance, MEDIA_FIELDS[sender]).name or '')
@@ -0,0 +1,225 @@
+"""
+Sharded XML sitemaps for the whole archive.
+
+Every section is split into shards covering a fixed range of primary keys,
+so a shard only changes when a row inside its key range changes. Shards are
+rendered from values_list() iterators (no model instances) and cached until
+a signal bumps the shard's version. Locations use the configured
+``SITE_URL``, never the request's Host header, so one cached copy serves
+every request and a forged Host can't end up in the sitemap.
+"""
+import uuid
+from urllib.parse import quote
+from xml.sax.saxutils import escape
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db.models import F, Max
+from django.urls import reverse
+from django.utils.http import RFC3986_SUBDELIMS
+
+from .models import Post, Category, Tag
+
+
+SHARD_SIZE = getattr(settings, 'SITEMAP_SHARD_SIZE', 50000)
+CACHE_TIMEOUT = getattr(settings, 'SITEMAP_CACHE_TIMEOUT', None)
+SITE_URL = settings.SITE_URL.rstrip('/')
+ITERATOR_CHUNK_SIZE = 2000
+
+XML_HEADER = '<?xml version="1.0" encoding="UTF-8"?>\n'
+XMLNS = 'http://www.sitemaps.org/schemas/sitemap/0.9'
+
+
+class SitemapSection:
+    """One kind of URL in the sitemap (posts, categories, tags, authors)"""
+    name = None
+    url_name = None
+    url_kwarg = None
+    value_field = None
+    lastmod_field = None
+    placeholder = 'sitemap-placeholder'
+
+    def get_queryset(self):
+        raise NotImplementedError
+
+    def get_rows(self, queryset):
+        """(url value, lastmod) pairs for the given queryset"""
+        return queryset.values_list(self.value_field).annotate(
+            lastmod=Max(self.lastmod_field)
+        ).values_list(self.value_field, 'lastmod')
+
+    def shard_stats(self):
+        """Return [(shard, lastmod), ...] for every non-empty shard in one query"""
+        return list(
+            self.get_queryset()
+            .annotate(shard=F('pk') / SHARD_SIZE)
+            .values_list('shard')
+            .annotate(shard_lastmod=Max(self.lastmod_field))
+            .values_list('shard', 'shard_lastmod')
+            .order_by('shard')
+        )
+
+    def iter_shard(self, shard):
+        queryset = self.get_queryset().filter(
+            pk__gte=shard * SHARD_SIZE,
+            pk__lt=(shard + 1) * SHARD_SIZE,
+        )
+        rows = self.get_rows(queryset).order_by('pk')
+        return rows.iterator(chunk_size=ITERATOR_CHUNK_SIZE)
+
+    def url_parts(self):
+        """Reverse the URL once and split it around the placeholder value"""
+        url = reverse(self.url_name, kwargs={self.url_kwarg: self.placeholder})
+        prefix, suffix = url.split(str(self.placeholder), 1)
+        return prefix, suffix
+
+
+class PostSitemap(SitemapSection):
+    name = 'posts'
+    url_name = 'post-detail'
+    url_kwarg = 'pk'
+    value_field = 'pk'
+    lastmod_field = 'date_updated'
+    placeholder = 999999999
+
+    def get_queryset(self):
+        return Post.objects.filter(status='published')
+
+    def get_rows(self, queryset):
+        return queryset.values_list('pk', 'date_updated')
+
+
+class CategorySitemap(SitemapSection):
+    name = 'categories'
+    url_name = 'category-posts'
+    url_kwarg = 'slug'
+    value_field = 'slug'
+    lastmod_field = 'posts__date_updated'
+
+    def get_queryset(self):
+        return Category.objects.filter(
+            posts__status='published'
+        ).exclude(slug__isnull=True).exclude(slug='')
+
+
+class TagSitemap(SitemapSection):
+    name = 'tags'
+    url_name = 'tag-posts'
+    url_kwarg = 'slug'
+    value_field = 'slug'
+    lastmod_field = 'posts__date_updated'
+
+    def get_queryset(self):
+        return Tag.objects.filter(posts__status='published')
+
+
+class AuthorSitemap(SitemapSection):
+    name = 'authors'
+    url_name = 'user-posts'
+    url_kwarg = 'username'
+    value_field = 'username'
+    lastmod_field = 'posts__date_updated'
+
+    def get_queryset(self):
+        return User.objects.filter(posts__status='published')
+
+
+SECTIONS = {
+    section.name: section
+    for section in (PostSitemap(), CategorySitemap(), TagSitemap(), AuthorSitemap())
+}
+
+
+# ========== VERSIONING ==========
+
+def _version_key(section=None, shard=None):
+    if section is None:
+        return 'sitemap:version:index'
+    if shard is None:
+        return f'sitemap:version:{section}'
+    return f'sitemap:version:{section}:{shard}'
+
+
+def _get_version(key):
+    version = cache.get(key)
+    if version is None:
+        version = uuid.uuid4().hex
+        cache.set(key, version, None)
+    return version
+
+
+def invalidate(section, pk=None):
+    """Mark the shard holding ``pk`` (or the whole section) as stale"""
+    if pk is None:
+        keys = [_version_key(section)]
+    else:
+        keys = [_version_key(section, pk // SHARD_SIZE)]
+    keys.append(_version_key())
+    cache.set_many({key: uuid.uuid4().hex for key in keys}, None)
+
+
+# ========== RENDERING ==========
+
+def _format_lastmod(value):
+    return value.date().isoformat() if value else None
+
+
+def render_shard(section_name, shard):
+    """Render one <urlset> shard, or return None if the section is unknown"""
+    section = SECTIONS.get(section_name)
+    if section is None:
+        return None
+
+    cache_key = 'sitemap:shard:{}:{}:{}:{}'.format(
+        section_name, shard,
+        _get_version(_version_key(section_name)),
+        _get_version(_version_key(section_name, shard)),
+    )
+    xml = cache.get(cache_key)
+    if xml is not None:
+        return xml
+
+    prefix, suffix = section.url_parts()
+    safe = RFC3986_SUBDELIMS + '/~:@'
+    lines = [XML_HEADER, f'<urlset xmlns="{XMLNS}">\n']
+    for value, lastmod in section.iter_shard(shard):
+        loc = escape(SITE_URL + prefix + quote(str(value), safe=safe) + suffix)
+        lastmod = _format_lastmod(lastmod)
+        if lastmod:
+            lines.append(f'<url><loc>{loc}</loc><lastmod>{lastmod}</lastmod></url>\n')
+        else:
+            lines.append(f'<url><loc>{loc}</loc></url>\n')
+    lines.append('</urlset>\n')
+
+    xml = ''.join(lines)
+    cache.set(cache_key, xml, CACHE_TIMEOUT)
+    return xml
+
+
+def shard_index():
+    """Return [(section, shard, lastmod), ...] for every non-empty shard"""
+    cache_key = 'sitemap:shards:{}'.format(_get_version(_version_key()))
+    shards = cache.get(cache_key)
+    if shards is None:
+        shards = [
+            (name, shard, lastmod)
+            for name, section in SECTIONS.items()
+            for shard, lastmod in section.shard_stats()
+        ]
+        cache.set(cache_key, shards, CACHE_TIMEOUT)
+    return shards
+
+
+def render_index(shard_url):
+    """Render the <sitemapindex>; ``shard_url(section, shard)`` builds each loc"""
+    lines = [XML_HEADER, f'<sitemapindex xmlns="{XMLNS}">\n']
+    for name, shard, lastmod in shard_index():
+        loc = escape(SITE_URL + shard_url(name, shard))
+        lastmod = _format_lastmod(lastmod)
+        if lastmod:
+            lines.append(f'<sitemap><loc>{loc}</loc><lastmod>{lastmod}</lastmod></sitemap>\n')
+        else:
+            lines.append(f'<sitemap><loc>{loc}</loc></sitemap>\n')
+    lines.append('</sitemapindex>\n')
+    return ''.join(lines)
@@ -1,5 +1,6 @@
 from django.urls import path
 from . import views
+from .feeds import LatestPostsFeed
 
 urlpatterns = [
     # Home & Main Views
@@ -15,6 +16,7 @@ urlpatterns = [
     
     # User Posts
     path('user/<str:username>/', views.UserPostListView.as_view(), name='user-posts'),
+    path('user/<str:username>/stats/', views.author_stats, name='author-stats'),
     
     # Category & Tags
     path('category/<slug:slug>/', views.CategoryPostListView.as_view(), name='category-posts'),
@@ -28,6 +30,13 @@ urlpatterns = [
     path('post/<int:pk>/like/', views.toggle_like, name='toggle-like'),
     path('post/<int:pk>/bookmark/', views.toggle_bookmark, name='toggle-bookmark'),
     path('bookmarks/', views.bookmarks_list, name='bookmarks-list'),
+    path('bookmarks/sync/', views.bookmarks_sync, name='bookmarks-sync'),
+    path('bookmarks/remove/', views.bookmarks_remove, name='bookmarks-remove'),
+    path('engagement/', views.engagement_state, name='engagement-state'),
+    
+    # Notifications
+    path('notifications/', views.notifications_list, name='notifications-list'),
+    path('notifications/read/', views.notifications_mark_read, name='notifications-mark-read'),
     
     # Follow System
     path('user/<str:username>/follow/', views.toggle_follow, name='toggle-follow'),
@@ -35,4 +44,23 @@ urlpatterns = [
     # Newsletter
     path('newsletter/subscribe/', views.newsletter_subscribe, name='newsletter-subscribe'),
     path('newsletter/unsubscribe/<str:token>/', views.newsletter_unsubscribe, name='newsletter-unsubscribe'),
+
+    # Autocomplete
+    path('autocomplete/taxonomy/', views.taxonomy_autocomplete, name='taxonomy-autocomplete'),
+    path('autocomplete/search/', views.search_suggestions, name='search-suggestions'),
+
+    # JSON API
+    path('api/<slug:resource>/', views.api_list, name='api-list'),
+    path('api/<slug:resource>/<int:pk>/', views.api_detail, name='api-detail'),
+
+    # Feeds
+    path('feed/', LatestPostsFeed(), name='post-feed'),
+
+    # Monitoring
+    path('stats/ratelimits/', views.ratelimit_stats, name='ratelimit-stats'),
+    path('stats/dbpool/', views.dbpool_stats, name='dbpool-stats'),
+
+    # Sitemaps
+    path('sitemap.xml', views.sitemap_index, name='sitemap-index'),
+    path('sitemap-<slug:section>-<int:shard>.xml', views.sitemap_section, name='sitemap-section'),
 ]
\ No newline at end of file
@@ -1,37 +1,67 @@
 from django.shortcuts import render, get_object_or_404, redirect
+from django.urls import reverse
 from django.contrib import messages
 from django.contrib.auth.models import User
 from django.contrib.auth.decorators import login_required
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 from django.views.generic import ListView, DetailView, CreateView, UpdateView, DeleteView
-from django.db.models import Q, Count, Prefetch
-from django.http import JsonResponse
-from django.views.decorators.http import require_POST
+from django.db.models import F, Count, Prefetch, Sum
+from django.http import JsonResponse, HttpResponse, StreamingHttpResponse, Http404
+from django.views.decorators.http import require_GET, require_POST
 from django.utils import timezone
+from django.utils.cache import patch_cache_control
 from datetime import timedelta
-from .models import Post, Category, Tag, Comment, Like, Newsletter, Bookmark, Follow
+from django_project import dbpool
+from .models import (
+    Post, Category, Tag, Comment, Like, Newsletter, Bookmark, BookmarkTombstone, Follow, Notification,
+    EngagementBucket, EngagementEvent,
+)
 from .forms import PostForm, CommentForm, NewsletterForm
+from . import api, engagement, events, notifications, sitemaps
+from .ratelimit import ratelimit, get_stats as get_ratelimit_stats
+from .paginators import WindowedPaginationMixin, approximate_count
+from .autocomplete import tag_index, category_index, suggest
+from .search import SearchResults, cached_ids, normalize_query, rank_by_title, terms_filter
+from .engagement import EngagementMixin, get_engagement
+from .cursors import InvalidCursor, decode_feed_cursor, encode_cursor, keyset_after, paginate_keyset
 # ========== HOME & LIST VIEWS ==========
 
-class PostListView(ListView):
+TRENDING_WINDOW = timedelta(days=7)
+
+
+def trending_posts(limit):
+    """Published posts with the most engagement over TRENDING_WINDOW"""
+    post_ids = events.popular_post_ids(TRENDING_WINDOW, limit * 2)
+    posts = Post.objects.filter(status='published').select_related('author').in_bulk(post_ids)
+    trending = [posts[pk] for pk in post_ids if pk in posts][:limit]
+    if trending:
+        return trending
+    # No rollups yet: fall back to recent likes and comments
+    return Post.objects.filter(
+        status='published',
+        date_posted__gte=timezone.now() - TRENDING_WINDOW
+    ).annotate(
+        engagement=Count('likes') + F('approved_comment_count')
+    ).order_by('-engagement', '-views_count')[:limit]
+
+
+class PostListView(EngagementMixin, WindowedPaginationMixin, ListView):
     model = Post
     template_name = 'blog/home.html'
     context_object_name = 'posts'
     paginate_by = 6
     
     def get_queryset(self):
-        queryset = Post.objects.filter(status='published').select_related(
+        posts = Post.objects.filter(status='published').select_related(
             'author', 'author__profile', 'category'
         ).prefetch_related('tags', 'likes')
+        queryset = posts
         
         # Search functionality
-        search_query = self.request.GET.get('q')
-        if search_query:
-            queryset = queryset.filter(
-                Q(title__icontains=search_query) |
-                Q(content__icontains=search_query) |
-                Q(excerpt__icontains=search_query)
-            )
+        search_terms = normalize_query(self.request.GET.get('q', ''))
+        if search_terms:
+            queryset = queryset.filter(terms_filter(search_terms, ('title', 'content', 'excerpt')))
         
         # Category filter
         category_slug = self.request.GET.get('category')
@@ -49,11 +79,21 @@ class PostListView(ListView):
             'newest': '-date_posted',
             'oldest': 'date_posted',
             'popular': '-views_count',
-            'trending': '-likes__created_at'
+            'trending': '-popularity'
         }
-        queryset = queryset.order_by(valid_sorts.get(sort_by, '-date_posted'))
+        order_by = valid_sorts.get(sort_by, '-date_posted')
+        if order_by == '-popularity':
+            # Engagement over the last week, from the hourly/daily rollups
+            queryset = queryset.annotate(popularity=events.popularity_subquery(TRENDING_WINDOW))
+        queryset = queryset.order_by(order_by, '-pk').distinct()
         
-        return queryset.distinct()
+        # Searches are served from cached ids; only the page shown is loaded
+        if search_terms:
+            filters = {'category': category_slug, 'tag': tag_slug, 'order_by': order_by}
+            return SearchResults(
+                cached_ids('home', search_terms, filters, lambda: queryset), posts,
+            )
+        return queryset
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -64,27 +104,21 @@ class PostListView(ListView):
             is_featured=True
         ).select_related('author', 'author__profile').first()
         
-        # Trending posts (last 7 days, ordered by views and likes)
-        week_ago = timezone.now() - timedelta(days=7)
-        context['trending_posts'] = Post.objects.filter(
-            status='published',
-            date_posted__gte=week_ago
-        ).annotate(
-            engagement=Count('likes') + Count('comments')
-        ).order_by('-engagement', '-views_count')[:5]
+        # Trending posts (most engagement over the last 7 days)
+        context['trending_posts'] = trending_posts(5)
         
-        # Categories with post count
-        context['categories'] = Category.objects.annotate(
-            post_count=Count('posts', filter=Q(posts__status='published'))
-        ).filter(post_count__gt=0)
+        # Categories with post count (counts are kept up to date by signals)
+        context['categories'] = Category.objects.filter(
+            published_post_count__gt=0
+        ).annotate(post_count=F('published_post_count'))
         
         # Popular tags
-        context['popular_tags'] = Tag.objects.annotate(
-            post_count=Count('posts', filter=Q(posts__status='published'))
-        ).filter(post_count__gt=0).order_by('-post_count')[:10]
+        context['popular_tags'] = Tag.objects.filter(
+            published_post_count__gt=0
+        ).annotate(post_count=F('published_post_count')).order_by('-published_post_count')[:10]
         
         # Stats for hero section
-        context['total_posts'] = Post.objects.filter(status='published').count()
+        context['total_posts'] = approximate_count(Post.objects.filter(status='published'))
         context['total_authors'] = User.objects.filter(posts__status='published').distinct().count()
         
         return context
@@ -92,7 +126,7 @@ class PostListView(ListView):
 
 # ========== USER POSTS VIEW ==========
 
-class UserPostListView(ListView):
+class UserPostListView(EngagementMixin, WindowedPaginationMixin, ListView):
     model = Post
     template_name = 'blog/user_posts.html'
     context_object_name = 'posts'
@@ -110,8 +144,10 @@ class UserPostListView(ListView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['post_author'] = self.user
-        context['total_posts'] = self.get_queryset().count()
-        context['total_views'] = sum(post.views_count for post in self.get_queryset())
+        context['total_posts'] = context['paginator'].count
+        context['total_views'] = Post.objects.filter(
+            author=self.user, status='published'
+        ).aggregate(total=Sum('views_count'))['total'] or 0
         context['total_likes'] = Like.objects.filter(post__author=self.user).count()
         
         # Check if current user follows this author
@@ -130,7 +166,7 @@ class UserPostListView(ListView):
 
 # ========== CATEGORY & TAG VIEWS ==========
 
-class CategoryPostListView(ListView):
+class CategoryPostListView(EngagementMixin, WindowedPaginationMixin, ListView):
     model = Post
     template_name = 'blog/category_posts.html'
     context_object_name = 'posts'
@@ -149,7 +185,7 @@ class CategoryPostListView(ListView):
         return context
 
 
-class TagPostListView(ListView):
+class TagPostListView(EngagementMixin, WindowedPaginationMixin, ListView):
     model = Post
     template_name = 'blog/tag_posts.html'
     context_object_name = 'posts'
@@ -181,7 +217,7 @@ class PostDetailView(DetailView):
             'likes',
             Prefetch('comments', queryset=Comment.objects.filter(
                 is_approved=True, parent=None
-            ).select_related('author', 'author__profile').prefetch_related('replies'))
+            ).select_related('author', 'author__profile'))
         )
     
     def get_object(self):
@@ -190,6 +226,7 @@ class PostDetailView(DetailView):
         session_key = f'viewed_post_{obj.pk}'
         if not self.request.session.get(session_key, False):
             obj.increment_views()
+            events.record_post(EngagementEvent.VIEW, obj)
             self.request.session[session_key] = True
         return obj
     
@@ -197,16 +234,12 @@ class PostDetailView(DetailView):
         context = super().get_context_data(**kwargs)
         post = self.object
         
-        # Check if user has liked the post
+        # Like/bookmark/follow state for the current user
         if self.request.user.is_authenticated:
-            context['user_has_liked'] = Like.objects.filter(
-                post=post,
-                user=self.request.user
-            ).exists()
-            context['user_has_bookmarked'] = Bookmark.objects.filter(
-                post=post,
-                user=self.request.user
-            ).exists()
+            state = get_engagement(self.request.user, [post])[post.pk]
+            context['user_has_liked'] = state['liked']
+            context['user_has_bookmarked'] = state['bookmarked']
+            context['is_following_author'] = state['following_author']
         
         # Related posts
         context['related_posts'] = post.get_related_posts(limit=3)
@@ -214,14 +247,19 @@ class PostDetailView(DetailView):
         # Comment form
         context['comment_form'] = CommentForm()
         
-        # Comments count
-        context['comments_count'] = post.comments.filter(is_approved=True).count()
+        # Comments count (kept up to date by signals and moderation)
+        context['comments_count'] = post.approved_comment_count
         
         return context
 
 
 # ========== POST CREATE/UPDATE/DELETE VIEWS ==========
 
+def is_future_publish_date(publish_date):
+    """True if the post should wait for the scheduler instead of publishing now"""
+    return publish_date is not None and publish_date > timezone.now()
+
+
 class PostCreateView(LoginRequiredMixin, CreateView):
     model = Post
     form_class = PostForm
@@ -234,6 +272,9 @@ class PostCreateView(LoginRequiredMixin, CreateView):
         if 'save_draft' in self.request.POST:
             form.instance.status = 'draft'
             messages.success(self.request, 'Post saved as draft!')
+        elif is_future_publish_date(form.instance.publish_date):
+            form.instance.status = 'scheduled'
+            messages.success(self.request, 'Post scheduled for publishing!')
         else:
             form.instance.status = 'published'
             messages.success(self.request, 'Post published successfully!')
@@ -253,6 +294,9 @@ class PostUpdateView(LoginRequiredMixin, UserPassesTestMixin, UpdateView):
         if 'save_draft' in self.request.POST:
             form.instance.status = 'draft'
             messages.success(self.request, 'Changes saved as draft!')
+        elif 'publish' in self.request.POST and is_future_publish_date(form.instance.publish_date):
+            form.instance.status = 'scheduled'
+            messages.success(self.request, 'Post scheduled for publishing!')
         elif 'publish' in self.request.POST:
             form.instance.status = 'published'
             messages.success(self.request, 'Post updated and published!')
@@ -283,6 +327,7 @@ class PostDeleteView(LoginRequiredMixin, UserPassesTestMixin, DeleteView):
 
 @login_required
 @require_POST
+@ratelimit('add-comment')
 def add_comment(request, pk):
     """Add a comment to a post"""
     post = get_object_or_404(Post, pk=pk, status='published')
@@ -301,8 +346,9 @@ def add_comment(request, pk):
         if parent_id:
             comment.parent = get_object_or_404(Comment, pk=parent_id)
         
+        # Scored in the background; appears once approved (see moderation.py)
         comment.save()
-        messages.success(request, 'Comment added successfully!')
+        messages.success(request, 'Comment submitted! It will appear once it passes moderation.')
         return redirect('post-detail', pk=post.pk)
     
     messages.error(request, 'Error adding comment. Please try again.')
@@ -329,6 +375,7 @@ def delete_comment(request, pk):
 
 @login_required
 @require_POST
+@ratelimit('toggle-like')
 def toggle_like(request, pk):
     """Toggle like on a post"""
     post = get_object_or_404(Post, pk=pk)
@@ -339,6 +386,8 @@ def toggle_like(request, pk):
         liked = False
     else:
         liked = True
+    engagement.invalidate(request.user)
+    events.record_post(EngagementEvent.LIKE if liked else EngagementEvent.UNLIKE, post)
     
     return JsonResponse({
         'liked': liked,
@@ -350,6 +399,7 @@ def toggle_like(request, pk):
 
 @login_required
 @require_POST
+@ratelimit('toggle-bookmark')
 def toggle_bookmark(request, pk):
     """Toggle bookmark on a post"""
     post = get_object_or_404(Post, pk=pk)
@@ -357,31 +407,230 @@ def toggle_bookmark(request, pk):
     
     if not created:
         bookmark.delete()
+        BookmarkTombstone.record([(request.user.pk, post.pk)])
         bookmarked = False
         messages.success(request, 'Removed from bookmarks!')
     else:
+        BookmarkTombstone.objects.filter(user=request.user, post_id=post.pk).delete()
         bookmarked = True
         messages.success(request, 'Added to bookmarks!')
+    engagement.invalidate(request.user)
+    events.record_post(EngagementEvent.BOOKMARK if bookmarked else EngagementEvent.UNBOOKMARK, post)
     
     return JsonResponse({
         'bookmarked': bookmarked
     })
 
 
+BOOKMARKS_PER_PAGE = 20
+BOOKMARK_SYNC_LIMIT = 500
+# Sync feed order for events sharing a timestamp
+SYNC_KINDS = ('added', 'removed')
+
+
 @login_required
 def bookmarks_list(request):
-    """View user's bookmarked posts"""
+    """View user's bookmarked posts, keyset-paginated newest first"""
     bookmarks = Bookmark.objects.filter(user=request.user).select_related(
         'post', 'post__author', 'post__author__profile'
-    ).order_by('-created_at')
+    )
+    try:
+        bookmarks, next_cursor = paginate_keyset(
+            bookmarks, request.GET.get('cursor'), BOOKMARKS_PER_PAGE
+        )
+    except InvalidCursor:
+        return redirect('bookmarks-list')
+    
+    return render(request, 'blog/bookmarks.html', {
+        'bookmarks': bookmarks,
+        'next_cursor': next_cursor,
+    })
+
+
+@login_required
+def bookmarks_sync(request):
+    """
+    Bookmarks added or removed since ``since`` (a cursor from a previous
+    call). Without ``since`` every current bookmark is returned as added.
+    """
+    since = kind = last_pk = None
+    if request.GET.get('since'):
+        try:
+            since, kind, last_pk = decode_feed_cursor(request.GET['since'])
+        except InvalidCursor:
+            return JsonResponse({'error': 'Invalid cursor'}, status=400)
+        if kind is not None and kind not in SYNC_KINDS:
+            return JsonResponse({'error': 'Invalid cursor'}, status=400)
+
+    # Changes are ordered by (timestamp, kind, pk): many rows can share a
+    # timestamp (one bulk removal stamps them all alike), so the cursor
+    # keeps the last row's kind and pk to resume exactly after it
+    def after(queryset, this_kind, time_field):
+        if kind is None:
+            return keyset_after(queryset, since, None, time_field)
+        if kind == this_kind:
+            return keyset_after(queryset, since, last_pk, time_field)
+        # Rows of an earlier kind at ``since`` were all read; rows of a
+        # later kind at ``since`` were not
+        later = SYNC_KINDS.index(this_kind) > SYNC_KINDS.index(kind)
+        return keyset_after(queryset, since, 0 if later else None, time_field)
+
+    added = after(Bookmark.objects.filter(user=request.user), 'added', 'created_at')
+    changes = [
+        (created_at, 'added', pk, post_id)
+        for pk, post_id, created_at in added.values_list('pk', 'post_id', 'created_at')[:BOOKMARK_SYNC_LIMIT + 1]
+    ]
+    if since is not None:
+        removed = after(BookmarkTombstone.objects.filter(user=request.user), 'removed', 'removed_at')
+        changes += [
+            (removed_at, 'removed', pk, post_id)
+            for pk, post_id, removed_at in removed.values_list('pk', 'post_id', 'removed_at')[:BOOKMARK_SYNC_LIMIT + 1]
+        ]
+
+    changes.sort(key=lambda change: (change[0], SYNC_KINDS.index(change[1]), change[2]))
+    has_more = len(changes) > BOOKMARK_SYNC_LIMIT
+    changes = changes[:BOOKMARK_SYNC_LIMIT]
+    if changes:
+        at, last_kind, pk, _ = changes[-1]
+        cursor = encode_cursor(at, last_kind, pk)
+    else:
+        cursor = request.GET.get('since') or encode_cursor(timezone.now())
+
+    return JsonResponse({
+        'added': [
+            {'post_id': post_id, 'created_at': at.isoformat()}
+            for at, change_kind, _, post_id in changes if change_kind == 'added'
+        ],
+        'removed': [
+            {'post_id': post_id, 'removed_at': at.isoformat()}
+            for at, change_kind, _, post_id in changes if change_kind == 'removed'
+        ],
+        'cursor': cursor,
+        'has_more': has_more,
+    })
+
+
+@login_required
+@require_POST
+def bookmarks_remove(request):
+    """Remove several bookmarks at once"""
+    post_ids = [pk for pk in request.POST.getlist('post_ids') if pk.isdigit()]
+    if not post_ids:
+        return JsonResponse({'error': 'No posts selected'}, status=400)
     
-    return render(request, 'blog/bookmarks.html', {'bookmarks': bookmarks})
+    bookmarks = Bookmark.objects.filter(user=request.user, post_id__in=post_ids)
+    removed_posts = list(bookmarks.values_list('post_id', 'post__author_id'))
+    # No signals or cascades on Bookmark, so this is a single DELETE
+    removed, _ = bookmarks.delete()
+    # Only bookmarks that existed get a tombstone
+    BookmarkTombstone.record([(request.user.pk, post_id) for post_id, _ in removed_posts])
+    engagement.invalidate(request.user)
+    for post_id, author_id in removed_posts:
+        events.record(EngagementEvent.UNBOOKMARK, post_id, author_id)
+    
+    return JsonResponse({'removed': removed})
+
+
+# ========== ENGAGEMENT STATE ==========
+
+ENGAGEMENT_MAX_POSTS = 100
+
+
+def engagement_state(request):
+    """Liked/bookmarked/following-author flags for ``?ids=1,2,3``"""
+    post_ids = [
+        int(pk) for pk in request.GET.get('ids', '').split(',') if pk.strip().isdigit()
+    ][:ENGAGEMENT_MAX_POSTS]
+    if not post_ids:
+        return JsonResponse({'error': 'No posts selected'}, status=400)
+    states = get_engagement(request.user, post_ids)
+    return JsonResponse({'posts': {str(pk): state for pk, state in states.items()}})
+
+
+# ========== AUTHOR STATS ==========
+
+AUTHOR_STATS_MAX_DAYS = 365
+
+
+@login_required
+@require_GET
+def author_stats(request, username):
+    """Views, likes, bookmarks and comments per hour or day, from the rollups"""
+    author = get_object_or_404(User, username=username)
+    if author != request.user and not request.user.is_staff:
+        return JsonResponse({'error': 'Not allowed'}, status=403)
+    granularity = EngagementBucket.HOUR if request.GET.get('granularity') == 'hour' else EngagementBucket.DAY
+    try:
+        days = min(max(int(request.GET.get('days', 30)), 1), AUTHOR_STATS_MAX_DAYS)
+    except ValueError:
+        days = 30
+    series = events.author_series(author.pk, granularity, since=timezone.now() - timedelta(days=days))
+    return JsonResponse({
+        'author': author.username,
+        'granularity': 'hour' if granularity == EngagementBucket.HOUR else 'day',
+        'totals': {column: sum(row[column] for row in series) for column in events.COLUMNS},
+        'series': [{**row, 'bucket': timezone.localtime(row['bucket']).isoformat()} for row in series],
+    })
+
+
+# ========== NOTIFICATIONS ==========
+
+NOTIFICATIONS_PER_PAGE = 20
+
+
+def _notification_json(notification):
+    event = notification.event
+    return {
+        'id': notification.pk,
+        'kind': event.kind,
+        'actor': event.actor.username,
+        'post': {
+            'id': event.post_id,
+            'title': event.post.title,
+            'url': reverse('post-detail', args=[event.post_id]),
+        } if event.post_id else None,
+        'comment_id': event.comment_id,
+        'created_at': notification.created_at.isoformat(),
+        'read': notification.read_at is not None,
+    }
+
+
+@login_required
+@require_GET
+def notifications_list(request):
+    """Newest notifications first, paged with ``?cursor=``; never counted"""
+    queryset = Notification.objects.filter(recipient=request.user).select_related(
+        'event__actor', 'event__post'
+    ).only(
+        'pk', 'created_at', 'read_at',
+        'event__kind', 'event__post_id', 'event__comment_id',
+        'event__actor__username', 'event__post__title',
+    )
+    try:
+        items, next_cursor = paginate_keyset(queryset, request.GET.get('cursor'), NOTIFICATIONS_PER_PAGE)
+    except InvalidCursor:
+        return JsonResponse({'error': 'Invalid cursor'}, status=400)
+    return JsonResponse({
+        'results': [_notification_json(notification) for notification in items],
+        'next': next_cursor,
+        'unread': notifications.unread_count(request.user.pk),
+    })
+
+
+@login_required
+@require_POST
+def notifications_mark_read(request):
+    """Mark ``ids`` (or every notification, if none are given) as read"""
+    ids = [int(pk) for pk in request.POST.getlist('ids') if pk.isdigit()] or None
+    marked = notifications.mark_read(request.user.pk, ids)
+    return JsonResponse({'marked': marked, 'unread': notifications.unread_count(request.user.pk)})
 
 
 # ========== FOLLOW VIEWS ==========
 
 @login_required
 @require_POST
+@ratelimit('toggle-follow')
 def toggle_follow(request, username):
     """Toggle follow on a user"""
     user_to_follow = get_object_or_404(User, username=username)
@@ -401,6 +650,7 @@ def toggle_follow(request, username):
     else:
         following = True
         messages.success(request, f'Now following {user_to_follow.username}')
+    engagement.invalidate(request.user)
     
     return JsonResponse({
         'following': following,
@@ -411,6 +661,7 @@ def toggle_follow(request, username):
 # ========== NEWSLETTER VIEWS ==========
 
 @require_POST
+@ratelimit('newsletter-subscribe')
 def newsletter_subscribe(request):
     """Subscribe to newsletter"""
     form = NewsletterForm(request.POST)
@@ -466,14 +717,13 @@ def search(request):
     category_id = request.GET.get('category')
     tag_id = request.GET.get('tag')
     
-    posts = Post.objects.filter(status='published')
+    published = Post.objects.filter(status='published').select_related('author', 'author__profile', 'category')
+    posts = published
     
-    if query:
+    terms = normalize_query(query)
+    if terms:
         posts = posts.filter(
-            Q(title__icontains=query) |
-            Q(content__icontains=query) |
-            Q(excerpt__icontains=query) |
-            Q(author__username__icontains=query)
+            terms_filter(terms, ('title', 'content', 'excerpt', 'author__username'))
         )
     
     if category_id:
@@ -482,13 +732,144 @@ def search(request):
     if tag_id:
         posts = posts.filter(tags__id=tag_id)
     
-    posts = posts.select_related('author', 'author__profile', 'category').distinct()
+    posts = posts.distinct()
     
+    # Ranked by how many terms the title contains, then newest first
+    if terms:
+        ranked = rank_by_title(posts, terms).order_by('-title_rank', '-date_posted')
+        filters = {'category': category_id, 'tag': tag_id}
+        posts = SearchResults(cached_ids('search', terms, filters, lambda: ranked), published)
+    
+    # Only the active filters are loaded; the pickers use taxonomy_autocomplete
     context = {
         'posts': posts,
         'query': query,
-        'categories': Category.objects.all(),
-        'tags': Tag.objects.all(),
+        'selected_category': Category.objects.filter(pk=category_id).first() if category_id else None,
+        'selected_tag': Tag.objects.filter(pk=tag_id).first() if tag_id else None,
     }
     
-    return render(request, 'blog/search.html', context)
\ No newline at end of file
+    return render(request, 'blog/search.html', context)
+
+
+# ========== AUTOCOMPLETE ==========
+
+def taxonomy_autocomplete(request):
+    """Tag or category suggestions for a prefix, ranked by usage"""
+    index = category_index if request.GET.get('type') == 'category' else tag_index
+    try:
+        limit = min(max(int(request.GET.get('limit', 10)), 1), 50)
+    except ValueError:
+        limit = 10
+    results = index.search(request.GET.get('q', ''), limit)
+    return JsonResponse({
+        'results': [
+            {'id': entry['id'], 'name': entry['name'], 'slug': entry['slug'], 'count': entry['score']}
+            for entry in results
+        ]
+    })
+
+
+# Suggestions are the same for everyone and change slowly
+SUGGESTION_MAX_AGE = 60
+
+
+@require_GET
+def search_suggestions(request):
+    """Post titles, authors, categories and tags matching a prefix"""
+    try:
+        limit = min(max(int(request.GET.get('limit', 5)), 1), 20)
+    except ValueError:
+        limit = 5
+    results = suggest(request.GET.get('q', '')[:100], limit)
+    response = JsonResponse({
+        'posts': [
+            {'id': entry['id'], 'title': entry['name'], 'url': reverse('post-detail', args=[entry['id']])}
+            for entry in results['posts']
+        ],
+        'authors': [
+            {'id': entry['id'], 'username': entry['name'], 'url': reverse('user-posts', args=[entry['name']])}
+            for entry in results['authors']
+        ],
+        'categories': [
+            {'id': entry['id'], 'name': entry['name'], 'url': reverse('category-posts', args=[entry['slug']])}
+            for entry in results['categories']
+        ],
+        'tags': [
+            {'id': entry['id'], 'name': entry['name'], 'url': reverse('tag-posts', args=[entry['slug']])}
+            for entry in results['tags']
+        ],
+    })
+    patch_cache_control(response, public=True, max_age=SUGGESTION_MAX_AGE)
+    return response
+
+
+# ========== JSON API ==========
+
+# Pages with more rows than this are streamed rather than buffered
+API_STREAM_THRESHOLD = 100
+
+
+def _api_resource(resource):
+    try:
+        return api.RESOURCES[resource]
+    except KeyError:
+        raise Http404('Unknown resource')
+
+
+@require_GET
+def api_list(request, resource):
+    """Keyset-paginated list; ``fields`` selects what each item contains"""
+    resource = _api_resource(resource)
+    try:
+        chunks = api.iter_page(resource, request.GET)
+    except (api.ApiError, InvalidCursor) as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    if api.parse_limit(request.GET.get('limit')) > API_STREAM_THRESHOLD:
+        return StreamingHttpResponse(chunks, content_type='application/json')
+    return HttpResponse(''.join(chunks), content_type='application/json')
+
+
+@require_GET
+def api_detail(request, resource, pk):
+    """A single item; accepts the same ``fields`` as the list"""
+    resource = _api_resource(resource)
+    try:
+        item = api.get_object(resource, pk, request.GET)
+    except api.ApiError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    if item is None:
+        return JsonResponse({'error': 'Not found'}, status=404)
+    return JsonResponse(item)
+
+
+# ========== MONITORING ==========
+
+@staff_member_required
+def ratelimit_stats(request):
+    """Allowed/blocked request counters per rate-limited route"""
+    return JsonResponse({'routes': get_ratelimit_stats()})
+
+
+@staff_member_required
+def dbpool_stats(request):
+    """Connection pool size, waits and checkout latency for this worker"""
+    return JsonResponse(dbpool.pool_stats())
+
+
+# ========== SITEMAP VIEWS ==========
+
+def sitemap_index(request):
+    """Sitemap index listing every non-empty shard"""
+    xml = sitemaps.render_index(
+        lambda section, shard: reverse('sitemap-section', kwargs={'section': section, 'shard': shard}),
+    )
+    return HttpResponse(xml, content_type='application/xml')
+
+
+def sitemap_section(request, section, shard):
+    """A single sitemap shard of at most SITEMAP_SHARD_SIZE URLs"""
+    xml = sitemaps.render_shard(section, shard)
+    if xml is None:
+        raise Http404('Unknown sitemap section')
+    return HttpResponse(xml, content_type='application/xml')
@@ -0,0 +1,125 @@
+"""
+PostgreSQL connection pooling.
+
+With DATABASE_POOL=1, every PostgreSQL database in DATABASES uses Django's
+psycopg connection pool (``OPTIONS['pool']``, Django 5.1+) instead of one
+persistent connection per thread (CONN_MAX_AGE). Connections are shared by
+all threads of a process and returned to the pool at the end of each
+request. Each pool opens POOL_MIN_SIZE connections at startup and never
+more than POOL_MAX_SIZE. With CONN_HEALTH_CHECKS (DATABASE_POOL_CHECK=1,
+the default) every checkout is health-checked by the pool first, so a
+connection the server dropped is replaced before a request sees it.
+
+SQLite has no pool; its connections are cheap to open and stay persistent
+per thread. ``pool_stats()`` reports each pool's size, waits and checkout
+latency for the current process.
+"""
+import os
+
+POOL_ENABLED = os.environ.get('DATABASE_POOL', '0') == '1'
+
+
+def _env_int(name, default):
+    value = os.environ.get(name)
+    return int(value) if value else default
+
+
+def _env_float(name, default):
+    value = os.environ.get(name)
+    return float(value) if value else default
+
+
+# Per process: a gunicorn worker with N threads rarely needs more than N
+POOL_MIN_SIZE = _env_int('DATABASE_POOL_MIN_SIZE', 2)
+POOL_MAX_SIZE = _env_int('DATABASE_POOL_MAX_SIZE', 10)
+# Seconds a request waits for a connection before failing
+POOL_TIMEOUT = _env_float('DATABASE_POOL_TIMEOUT', 10.0)
+# Requests allowed to queue for a connection (0 = unlimited)
+POOL_MAX_WAITING = _env_int('DATABASE_POOL_MAX_WAITING', 0)
+# Recycle connections after this long, and close idle ones above min_size
+POOL_MAX_LIFETIME = _env_float('DATABASE_POOL_MAX_LIFETIME', 3600.0)
+POOL_MAX_IDLE = _env_float('DATABASE_POOL_MAX_IDLE', 600.0)
+POOL_CHECK = os.environ.get('DATABASE_POOL_CHECK', '1') == '1'
+
+
+def pool_options(**overrides):
+    options = {
+        'min_size': POOL_MIN_SIZE,
+        'max_size': POOL_MAX_SIZE,
+        'timeout': POOL_TIMEOUT,
+        'max_waiting': POOL_MAX_WAITING,
+        'max_lifetime': POOL_MAX_LIFETIME,
+        'max_idle': POOL_MAX_IDLE,
+    }
+    options.update(overrides)
+    return options
+
+
+def configure(databases, **overrides):
+    """Switch every PostgreSQL entry of ``databases`` to a connection pool"""
+    for db in databases.values():
+        if db['ENGINE'] != 'django.db.backends.postgresql':
+            continue
+        # Pooled connections go back to the pool after each request;
+        # Django refuses persistent connections on top of a pool
+        db['CONN_MAX_AGE'] = 0
+        # With a pool, Django turns this into ConnectionPool.check_connection
+        # on every checkout
+        db['CONN_HEALTH_CHECKS'] = POOL_CHECK
+        db.setdefault('OPTIONS', {})['pool'] = pool_options(**overrides)
+    return databases
+
+
+def opened_pool(wrapper):
+    """The wrapper's pool if one is open (the ``pool`` property would open one)"""
+    if wrapper.vendor != 'postgresql':
+        return None
+    return getattr(wrapper, '_connection_pools', {}).get(wrapper.alias)
+
+
+def close_pools():
+    """Close every pool this process opened, e.g. before forking workers"""
+    from django.db import connections
+
+    for wrapper in connections.all(initialized_only=True):
+        if opened_pool(wrapper) is not None:
+            wrapper.close_pool()
+
+
+def pool_stats():
+    """
+    Size, waits and checkout latency of each pool this process has opened.
+
+    ``checkout_wait_ms_avg`` is the mean time a checkout spent queued for a
+    free connection; ``connections_lost`` counts connections that failed the
+    checkout health check.
+    """
+    from django.db import connections
+
+    stats = {}
+    for alias in connections:
+        pool = opened_pool(connections[alias])
+        if pool is None:
+            continue
+        raw = pool.get_stats()
+        requests = raw.get('requests_num', 0)
+        stats[alias] = {
+            'min_size': raw.get('pool_min'),
+            'max_size': raw.get('pool_max'),
+            'size': raw.get('pool_size'),
+            'available': raw.get('pool_available'),
+            'waiting': raw.get('requests_waiting', 0),
+            'checkouts': requests,
+            'queued': raw.get('requests_queued', 0),
+            'timeouts': raw.get('requests_errors', 0),
+            'checkout_wait_ms_avg': round(raw.get('requests_wait_ms', 0) / requests, 3) if requests else 0.0,
+            'connections_opened': raw.get('connections_num', 0),
+            'connect_ms_avg': (
+                round(raw.get('connections_ms', 0) / raw['connections_num'], 3)
+                if raw.get('connections_num') else 0.0
+            ),
+            'connection_errors': raw.get('connections_errors', 0),
+            'connections_lost': raw.get('connections_lost', 0),
+            'returns_bad': raw.get('returns_bad', 0),
+        }
+    return {'pid': os.getpid(), 'pools': stats}
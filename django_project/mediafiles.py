@@ -0,0 +1,181 @@
+"""
+Media file serving.
+
+``serve_media`` serves MEDIA_ROOT at MEDIA_URL in production as well as
+under DEBUG. Files are streamed with FileResponse, which gunicorn hands to
+sendfile(); single byte ranges and conditional requests (ETag and
+Last-Modified) are honoured. Names that embed a content hash never change,
+so they are cached as immutable. Set MEDIA_ACCEL to let nginx
+(X-Accel-Redirect) or Apache/lighttpd (X-Sendfile) send the bytes instead.
+"""
+import mimetypes
+import os
+import re
+import stat
+from urllib.parse import quote
+
+from django.conf import settings
+from django.http import FileResponse, Http404, HttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date_safe
+from django.views.decorators.http import require_safe
+
+from .storage import STAGING_DIR, digest_from_name
+
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+# Paths whose file name embeds the SHA-256 of the bytes: content-addressed
+# originals (storage.py) and processed avatars (users/avatars.py)
+HASHED_NAME_RE = re.compile(r'(?:^|/)[0-9a-f]{64}(?:_\d+)?\.[A-Za-z0-9]+$')
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+STREAM_BLOCK_SIZE = 64 * 1024
+
+
+class RangeFile:
+    """Read at most ``length`` bytes of ``file`` from its current position"""
+
+    def __init__(self, file, length):
+        self.file = file
+        self.name = file.name
+        self.remaining = length
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def fileno(self):
+        # gunicorn's sendfile() starts at the current offset and sends
+        # Content-Length bytes
+        return self.file.fileno()
+
+    def close(self):
+        self.file.close()
+
+
+def is_hashed_name(path):
+    return bool(HASHED_NAME_RE.search(path))
+
+
+def file_etag(path, st):
+    digest = digest_from_name(path)
+    if digest:
+        return f'"{digest}"'
+    return f'"{st.st_mtime_ns:x}-{st.st_size:x}"'
+
+
+def parse_range(header, size):
+    """
+    (start, end) inclusive for a single satisfiable byte range, None to
+    serve the whole file, or False if the range can't be satisfied.
+    """
+    match = RANGE_RE.match(header.replace(' ', ''))
+    if not match or size == 0:
+        # Multiple ranges or other units: a full response is allowed
+        return None
+    first, last = match.groups()
+    if first:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+        if start >= size:
+            return False
+        if end < start:
+            return None
+    elif last:
+        length = int(last)
+        if not length:
+            return False
+        start, end = max(size - length, 0), size - 1
+    else:
+        return None
+    return start, end
+
+
+def _if_range_matches(request, etag, mtime):
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if not if_range:
+        return True
+    if if_range.startswith('"') or if_range.startswith('W/'):
+        # Weak validators never match (RFC 9110 13.1.5)
+        return if_range == etag
+    if_range_date = parse_http_date_safe(if_range)
+    return if_range_date is not None and if_range_date >= int(mtime)
+
+
+def _cache_headers(response, path, etag, mtime):
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(mtime)
+    response['Cache-Control'] = (
+        IMMUTABLE_CACHE_CONTROL if is_hashed_name(path)
+        else f'public, max-age={settings.MEDIA_CACHE_MAX_AGE}'
+    )
+    return response
+
+
+def _accel_response(path, full_path, content_type):
+    response = HttpResponse(content_type=content_type)
+    if settings.MEDIA_ACCEL == 'nginx':
+        response['X-Accel-Redirect'] = settings.MEDIA_ACCEL_PREFIX + quote(path)
+    else:
+        response['X-Sendfile'] = full_path
+    return response
+
+
+@require_safe
+def serve_media(request, path):
+    """Serve a file below MEDIA_ROOT"""
+    path = path.replace('\\', '/')
+    if not path or path.startswith(STAGING_DIR) or any(part.startswith('.') for part in path.split('/')):
+        raise Http404('Not found')
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+        st = os.stat(full_path)
+    except (OSError, ValueError):
+        raise Http404('Not found')
+    if not stat.S_ISREG(st.st_mode):
+        raise Http404('Not found')
+
+    etag = file_etag(path, st)
+    mtime = st.st_mtime
+    not_modified = get_conditional_response(request, etag=etag, last_modified=int(mtime))
+    if not_modified is not None:
+        return _cache_headers(not_modified, path, etag, mtime)
+
+    if settings.MEDIA_ACCEL:
+        # The proxy handles ranges itself
+        content_type = mimetypes.guess_type(full_path)[0] or 'application/octet-stream'
+        return _cache_headers(_accel_response(path, full_path, content_type), path, etag, mtime)
+
+    size = st.st_size
+    if request.method == 'HEAD':
+        response = HttpResponse(content_type=mimetypes.guess_type(full_path)[0] or 'application/octet-stream')
+        response['Content-Length'] = size
+        response['Accept-Ranges'] = 'bytes'
+        return _cache_headers(response, path, etag, mtime)
+
+    byte_range = None
+    range_header = request.META.get('HTTP_RANGE')
+    if range_header and _if_range_matches(request, etag, mtime):
+        byte_range = parse_range(range_header, size)
+        if byte_range is False:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            return _cache_headers(response, path, etag, mtime)
+
+    f = open(full_path, 'rb')
+    if byte_range:
+        start, end = byte_range
+        f.seek(start)
+        response = FileResponse(RangeFile(f, end - start + 1), status=206)
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+        response['Content-Length'] = end - start + 1
+    else:
+        response = FileResponse(f)
+    response.block_size = STREAM_BLOCK_SIZE
+    response['Accept-Ranges'] = 'bytes'
+    return _cache_headers(response, path, etag, mtime)
@@ -0,0 +1,47 @@
+import time
+
+from django.conf import settings
+
+from .routers import pin_to_primary, unpin
+
+PIN_COOKIE = 'primary_db_until'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS', 'TRACE')
+
+
+class ReplicaPinningMiddleware:
+    """
+    Pin a client's reads to the primary database after it writes.
+
+    Unsafe requests run against the primary and set a short-lived cookie;
+    while the cookie is valid, the client's reads skip the replicas so it
+    sees its own comments, likes and profile changes immediately.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        unsafe = request.method not in SAFE_METHODS
+        token = pin_to_primary(unsafe or self._cookie_pinned(request))
+        try:
+            response = self.get_response(request)
+        finally:
+            unpin(token)
+
+        if unsafe:
+            seconds = getattr(settings, 'REPLICA_PIN_SECONDS', 5)
+            response.set_cookie(
+                PIN_COOKIE,
+                str(int(time.time() + seconds)),
+                max_age=seconds,
+                httponly=True,
+                samesite='Lax',
+            )
+        return response
+
+    @staticmethod
+    def _cookie_pinned(request):
+        try:
+            return float(request.COOKIES.get(PIN_COOKIE, 0)) > time.time()
+        except ValueError:
+            return False
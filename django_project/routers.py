@@ -0,0 +1,72 @@
+"""
+Primary/replica database routing.
+
+Replica aliases come from ``DATABASE_REPLICA_URLS`` (see settings). Reads for
+the apps in ``DATABASE_REPLICA_APPS`` go to a random replica; writes always
+go to the primary. A request is pinned to the primary while it is an unsafe
+request, inside a transaction, or shortly after the same client wrote
+something (see ``ReplicaPinningMiddleware``), so users read their own writes.
+"""
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+_pinned = ContextVar('pinned_to_primary', default=False)
+
+
+def is_pinned():
+    return _pinned.get()
+
+
+def pin_to_primary(pinned=True):
+    """Pin reads in the current context; returns a token for ``unpin``"""
+    return _pinned.set(pinned)
+
+
+def unpin(token):
+    _pinned.reset(token)
+
+
+@contextmanager
+def use_primary():
+    """Force every read inside the block to the primary database"""
+    token = pin_to_primary()
+    try:
+        yield
+    finally:
+        unpin(token)
+
+
+class PrimaryReplicaRouter:
+    """Send reads to replicas and writes to the primary"""
+
+    def _replicas(self):
+        return getattr(settings, 'DATABASE_REPLICAS', [])
+
+    def _replica_app(self, model):
+        apps = getattr(settings, 'DATABASE_REPLICA_APPS', [])
+        return model._meta.app_label in apps
+
+    def db_for_read(self, model, **hints):
+        replicas = self._replicas()
+        if not replicas or not self._replica_app(model):
+            return DEFAULT_DB_ALIAS
+        if is_pinned() or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same data as the primary
+        databases = {DEFAULT_DB_ALIAS, *self._replicas()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return True
@@ -15,6 +15,8 @@ import os
 
 import dj_database_url
 
+from django_project import dbpool
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -39,7 +41,6 @@ INSTALLED_APPS = [
     'django_project.blog.apps.BlogConfig',
     'crispy_forms',
     "crispy_bootstrap5",
-    'django_extensions',
     'django.contrib.admin',
     'django.contrib.auth',
     'django.contrib.contenttypes',
@@ -49,13 +50,22 @@ INSTALLED_APPS = [
     
 ]
 
+# Development-only apps (shell_plus, runserver_plus, ...). Off by default so
+# workers, management commands and tests don't import them; enable with
+# DJANGO_DEV_APPS=1.
+DEV_APPS_ENABLED = os.environ.get('DJANGO_DEV_APPS', '0') == '1'
+if DEV_APPS_ENABLED:
+    INSTALLED_APPS.append('django_extensions')
+
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'django_project.middleware.ReplicaPinningMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'django_project.blog.ratelimit.RateLimitMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -91,6 +101,48 @@ DATABASES = {
     )
 }
 
+# Read replicas: comma-separated database URLs, e.g.
+# DATABASE_REPLICA_URLS=postgres://replica1/blog,postgres://replica2/blog
+DATABASE_REPLICAS = []
+for index, url in enumerate(filter(None, os.environ.get('DATABASE_REPLICA_URLS', '').split(',')), start=1):
+    alias = f'replica_{index}'
+    DATABASES[alias] = dj_database_url.parse(url.strip(), conn_max_age=600)
+    # Tests read replicas through the test primary instead of a separate copy
+    DATABASES[alias]['TEST'] = {'MIRROR': 'default'}
+    DATABASE_REPLICAS.append(alias)
+
+# SQLite production mode: WAL lets gunicorn workers read while one writes,
+# and IMMEDIATE transactions take the write lock up front instead of failing
+# with "database is locked" on upgrade. Disable with SQLITE_TUNED=0.
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,
+    'mmap_size': 128 * 1024 * 1024,
+    'cache_size': -32000,  # negative = KiB, i.e. ~32MB page cache
+    'temp_store': 'MEMORY',
+}
+SQLITE_TUNED = os.environ.get('SQLITE_TUNED', '1') == '1'
+
+for db in DATABASES.values():
+    if SQLITE_TUNED and db['ENGINE'] == 'django.db.backends.sqlite3':
+        db.setdefault('OPTIONS', {}).update({
+            'init_command': ';'.join(f'PRAGMA {name}={value}' for name, value in SQLITE_PRAGMAS.items()),
+            'transaction_mode': 'IMMEDIATE',
+        })
+
+# Connection pooling for PostgreSQL (primary and replicas), off by default.
+# DATABASE_POOL=1 replaces CONN_MAX_AGE with a per-process psycopg pool;
+# sizes and timeouts come from DATABASE_POOL_* variables, see dbpool.py.
+if dbpool.POOL_ENABLED:
+    dbpool.configure(DATABASES)
+
+DATABASE_ROUTERS = ['django_project.routers.PrimaryReplicaRouter']
+# Apps whose reads may be served by a replica (sessions stay on the primary)
+DATABASE_REPLICA_APPS = ['blog', 'users', 'auth', 'contenttypes']
+# How long a client's reads stick to the primary after it writes
+REPLICA_PIN_SECONDS = int(os.environ.get('REPLICA_PIN_SECONDS', 5))
+
 
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -130,6 +182,22 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 MEDIA_ROOT = os.path.join(BASE_DIR, 'django_project', 'photos') 
 MEDIA_URL = '/media/'
 
+# Media is served by django_project.mediafiles.serve_media. Set
+# MEDIA_ACCEL=nginx to answer with X-Accel-Redirect to an internal location
+# at MEDIA_ACCEL_PREFIX (aliased to MEDIA_ROOT), or MEDIA_ACCEL=sendfile for
+# X-Sendfile (Apache, lighttpd). Content-hashed files are cached forever;
+# anything else for MEDIA_CACHE_MAX_AGE seconds.
+MEDIA_ACCEL = os.environ.get('MEDIA_ACCEL', '')
+MEDIA_ACCEL_PREFIX = os.environ.get('MEDIA_ACCEL_PREFIX', '/protected-media/')
+MEDIA_CACHE_MAX_AGE = int(os.environ.get('MEDIA_CACHE_MAX_AGE', '3600'))
+
+# Uploads stream to a temporary file (hashed on the way) instead of being
+# held in memory; stored originals are named by content, see storage.py.
+FILE_UPLOAD_HANDLERS = ['django_project.storage.HashingFileUploadHandler']
+# Unreferenced media files are deleted by `manage.py gc_media` once they
+# have been unused for this long
+MEDIA_GC_GRACE_SECONDS = int(os.environ.get('MEDIA_GC_GRACE_SECONDS', '86400'))
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.1/ref/settings/#default-auto-field
 
@@ -141,6 +209,59 @@ CRISPY_TEMPLATE_PACK = "bootstrap5"
 LOGIN_REDIRECT_URL = 'blog-home'
 LOGIN_URL = 'login'
 
+# Server errors go to stderr (the gunicorn/Heroku log) even with DEBUG off;
+# loadtest counts database lock failures from these tracebacks
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'django.request': {'handlers': ['console'], 'level': 'ERROR', 'propagate': False},
+    },
+}
+
+# Cache: set REDIS_URL so every worker shares rate limits and cached pages
+if os.environ.get('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['REDIS_URL'],
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# Rate limits per URL name ("count/period", period in s/m/h/d).
+# Counted per user, or per IP address for anonymous clients.
+RATELIMIT_ENABLED = os.environ.get('RATELIMIT_ENABLED', '1') == '1'
+RATELIMIT_TRUST_FORWARDED_FOR = os.environ.get('RATELIMIT_TRUST_FORWARDED_FOR', '0') == '1'
+RATELIMITS = {
+    'toggle-like': {'rate': '30/m'},
+    'toggle-bookmark': {'rate': '30/m'},
+    'toggle-follow': {'rate': '20/m'},
+    'add-comment': {'rate': '5/m'},
+    'newsletter-subscribe': {'rate': '5/h'},
+    'login': {'rate': '10/m'},
+    'register': {'rate': '5/h'},
+}
+
+# Comment moderation: comments scoring below this spam probability are
+# approved automatically, the rest are held for a moderator.
+COMMENT_AUTO_APPROVE_BELOW = float(os.environ.get('COMMENT_AUTO_APPROVE_BELOW', '0.5'))
+
+# Canonical scheme and host for absolute URLs (sitemaps); never taken from the Host header
+SITE_URL = os.environ.get('SITE_URL', 'https://ugblog-qfzg.onrender.com')
+
+# Sitemaps (sharded by primary-key range, cached until a shard changes)
+SITEMAP_SHARD_SIZE = 50000
+SITEMAP_CACHE_TIMEOUT = None
+
 # Email configuration
 EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
 EMAIL_HOST = 'smtp.gmail.com'
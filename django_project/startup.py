@@ -0,0 +1,75 @@
+"""
+Startup cost measurement.
+
+``profile_imports()`` boots the project in a fresh interpreter under
+``python -X importtime`` and returns the wall time plus the per-module
+import timings, so the numbers are not skewed by modules this process has
+already imported.
+"""
+import os
+import re
+import subprocess
+import sys
+from collections import defaultdict
+
+from django.conf import settings
+
+# What "starting up" means for each target
+TARGETS = {
+    'wsgi': 'import django_project.wsgi',
+    'setup': 'import django; django.setup()',
+    'urls': 'import django; django.setup(); from django.urls import get_resolver; get_resolver().url_patterns',
+}
+
+IMPORTTIME_RE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)\s*$')
+
+
+def _run(target):
+    code = (
+        'import sys, time; _started = time.perf_counter(); '
+        f'{TARGETS[target]}; '
+        'sys.stdout.write(repr(time.perf_counter() - _started))'
+    )
+    env = {**os.environ, 'DJANGO_SETTINGS_MODULE': os.environ.get('DJANGO_SETTINGS_MODULE', 'django_project.settings')}
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', code],
+        capture_output=True, text=True, cwd=settings.BASE_DIR, env=env,
+    )
+    if result.returncode:
+        raise RuntimeError(f'Startup of {target!r} failed:\n{result.stderr[-2000:]}')
+    return float(result.stdout.strip() or 0), result.stderr
+
+
+def profile_imports(target='wsgi'):
+    """
+    Return {'wall_seconds', 'modules'} for one cold start of ``target``.
+
+    Each module entry has ``self_us`` (time spent in the module itself),
+    ``cumulative_us`` (including its imports) and its nesting ``depth``.
+    """
+    wall, output = _run(target)
+    modules = []
+    for line in output.splitlines():
+        match = IMPORTTIME_RE.match(line)
+        if match:
+            self_us, cumulative_us, indent, module = match.groups()
+            modules.append({
+                'module': module,
+                'self_us': int(self_us),
+                'cumulative_us': int(cumulative_us),
+                'depth': (len(indent) - 1) // 2,
+            })
+    return {'wall_seconds': wall, 'modules': modules}
+
+
+def by_package(modules):
+    """Self time summed per top-level package, most expensive first"""
+    totals = defaultdict(int)
+    for entry in modules:
+        totals[entry['module'].split('.')[0]] += entry['self_us']
+    return dict(sorted(totals.items(), key=lambda item: item[1], reverse=True))
+
+
+def measure_startup(target='wsgi', runs=3):
+    """Best-of-``runs`` wall time of a cold start, in seconds"""
+    return min(_run(target)[0] for _ in range(runs))
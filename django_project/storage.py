@@ -0,0 +1,132 @@
+"""
+Content-addressed media storage.
+
+Uploaded originals are stored under the SHA-256 of their bytes
+(``content/ab/cd/<sha256>.jpg``), so uploading the same image twice stores
+it once. Uploads are streamed to a temporary file on disk and hashed chunk
+by chunk (``HashingFileUploadHandler``); content saved from elsewhere is
+hashed while it is copied. Every stored file has a ``MediaFile`` row whose
+reference count the blog signals maintain; see blog/media.py for garbage
+collection.
+"""
+import hashlib
+import os
+import tempfile
+
+from django.apps import apps
+from django.core.files.move import file_move_safe
+from django.core.files.storage import FileSystemStorage
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+from django.db import transaction
+from django.utils import timezone
+
+CONTENT_DIR = 'content'
+STAGING_DIR = '.staging'
+
+
+def content_name(digest, extension=''):
+    return f'{CONTENT_DIR}/{digest[:2]}/{digest[2:4]}/{digest}{extension.lower()}'
+
+
+def is_content_name(name):
+    return bool(name) and name.startswith(f'{CONTENT_DIR}/')
+
+
+def digest_from_name(name):
+    """The content hash encoded in a stored name, or None"""
+    if not is_content_name(name):
+        return None
+    return os.path.splitext(os.path.basename(name))[0]
+
+
+class HashingFileUploadHandler(TemporaryFileUploadHandler):
+    """Stream every upload to a temporary file, hashing it on the way"""
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.digest = hashlib.sha256()
+
+    def receive_data_chunk(self, raw_data, start):
+        self.digest.update(raw_data)
+        return super().receive_data_chunk(raw_data, start)
+
+    def file_complete(self, file_size):
+        uploaded = super().file_complete(file_size)
+        uploaded.content_hash = self.digest.hexdigest()
+        return uploaded
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """FileSystemStorage that names files by content and never overwrites them"""
+
+    def get_available_name(self, name, max_length=None):
+        # The final name depends on the content, not on what already exists
+        return name
+
+    def _stage(self, content):
+        """Copy ``content`` into a staging file while hashing it"""
+        staging = self.path(STAGING_DIR)
+        os.makedirs(staging, exist_ok=True)
+        digest = hashlib.sha256()
+        fd, path = tempfile.mkstemp(dir=staging)
+        try:
+            with os.fdopen(fd, 'wb') as staged:
+                for chunk in content.chunks():
+                    if isinstance(chunk, str):
+                        chunk = chunk.encode('utf-8')
+                    digest.update(chunk)
+                    staged.write(chunk)
+        except BaseException:
+            os.unlink(path)
+            raise
+        return path, digest.hexdigest()
+
+    def _save(self, name, content):
+        MediaFile = apps.get_model('blog', 'MediaFile')
+
+        digest = getattr(content, 'content_hash', None)
+        staged = None
+        if digest is None or not hasattr(content, 'temporary_file_path'):
+            staged, digest = self._stage(content)
+        final = content_name(digest, os.path.splitext(name)[1])
+        full_path = self.path(final)
+
+        try:
+            # The row lock keeps garbage collection from deleting the file
+            # between the existence check and the commit
+            with transaction.atomic():
+                entry = MediaFile.objects.select_for_update().filter(name=final).first()
+                if entry is None:
+                    MediaFile.objects.create(name=final, size=content.size)
+                else:
+                    MediaFile.objects.filter(pk=entry.pk).update(touched_at=timezone.now())
+
+                if not os.path.exists(full_path):
+                    os.makedirs(os.path.dirname(full_path), exist_ok=True)
+                    if staged is not None:
+                        os.replace(staged, full_path)
+                        staged = None
+                    else:
+                        file_move_safe(content.temporary_file_path(), full_path, allow_overwrite=True)
+                    if self.file_permissions_mode is not None:
+                        os.chmod(full_path, self.file_permissions_mode)
+        finally:
+            if staged is not None:
+                os.unlink(staged)
+        return final
+
+    def delete(self, name):
+        # Shared files are removed only by garbage collection (blog/media.py)
+        if not is_content_name(name):
+            super().delete(name)
+
+    def delete_unreferenced(self, name):
+        super().delete(name)
+
+
+content_storage_instance = ContentAddressedStorage()
+
+
+def content_storage():
+    """Storage for uploaded originals; model fields reference this callable"""
+    return content_storage_instance
@@ -0,0 +1,18 @@
+"""
+Settings for the test suite.
+
+``manage.py test`` uses this module unless DJANGO_SETTINGS_MODULE says
+otherwise; other runners should point DJANGO_SETTINGS_MODULE here. It adds
+a second, separate 'replica' database next to the test primary for the
+router tests. Nothing routes to it unless a test lists it in
+DATABASE_REPLICAS.
+"""
+import copy
+
+from django_project.settings import *  # noqa: F401,F403
+from django_project.settings import DATABASES
+
+DATABASES['replica'] = copy.deepcopy(DATABASES['default'])
+DATABASES['replica']['TEST'] = {}
+if DATABASES['replica']['ENGINE'] != 'django.db.backends.sqlite3':
+    DATABASES['replica']['TEST']['NAME'] = f"test_{DATABASES['default']['NAME']}_replica"
@@ -1,5 +1,12 @@
 from django.contrib import admin
 from .models import Profile
 
-# Register your models here.
-admin.site.register(Profile)
\ No newline at end of file
+
+@admin.register(Profile)
+class ProfileAdmin(admin.ModelAdmin):
+    list_display = ('user', 'location', 'website')
+    list_select_related = ('user',)
+    search_fields = ('^user__username',)
+    autocomplete_fields = ('user',)
+    readonly_fields = ('image_hash',)
+    show_full_result_count = False
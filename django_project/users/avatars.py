@@ -0,0 +1,104 @@
+"""
+Avatar processing.
+
+A newly uploaded profile image is hashed and cut into fixed square sizes
+stored under content-hashed names (``avatars/ab/<sha256>_40.jpg``). The work
+runs on a background thread after the upload commits, so requests never wait
+on Pillow, and identical uploads reuse the same files.
+"""
+import hashlib
+import io
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, transaction
+
+from django_project.routers import use_primary
+from django_project.storage import digest_from_name
+
+logger = logging.getLogger(__name__)
+
+AVATAR_SIZES = getattr(settings, 'AVATAR_SIZES', {'small': 40, 'medium': 96, 'large': 300})
+
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='avatars')
+
+
+def avatar_name(image_hash, size):
+    return f'avatars/{image_hash[:2]}/{image_hash}_{size}.jpg'
+
+
+def derived_names(image_hash):
+    """Every file ``process_avatar`` renders from an image with this hash"""
+    return [avatar_name(image_hash, size) for size in AVATAR_SIZES.values()]
+
+
+def _hash_file(field_file):
+    # Content-addressed names already carry the SHA-256 of the bytes
+    stored_hash = digest_from_name(field_file.name)
+    if stored_hash:
+        return stored_hash
+    digest = hashlib.sha256()
+    field_file.open('rb')
+    try:
+        for chunk in field_file.chunks():
+            digest.update(chunk)
+    finally:
+        field_file.close()
+    return digest.hexdigest()
+
+
+def _render(field_file, size):
+    # Pillow is imported on first use so app startup doesn't pay for it
+    from PIL import Image, ImageOps
+
+    field_file.open('rb')
+    try:
+        img = Image.open(field_file)
+        img = ImageOps.exif_transpose(img)
+        if img.mode != 'RGB':
+            img = img.convert('RGB')
+        img = ImageOps.fit(img, (size, size), Image.Resampling.LANCZOS)
+        buffer = io.BytesIO()
+        img.save(buffer, format='JPEG', quality=85, optimize=True)
+    finally:
+        field_file.close()
+    return buffer.getvalue()
+
+
+def process_avatar(profile_id):
+    """Generate every avatar size for a profile and record its image hash"""
+    from .models import Profile
+
+    profile = Profile.objects.filter(pk=profile_id).first()
+    if profile is None or not profile.image:
+        return None
+
+    image_hash = _hash_file(profile.image)
+    for size in AVATAR_SIZES.values():
+        name = avatar_name(image_hash, size)
+        if not default_storage.exists(name):
+            default_storage.save(name, ContentFile(_render(profile.image, size)))
+
+    # update() so the hash doesn't trigger another Profile.save
+    Profile.objects.filter(pk=profile_id, image=profile.image.name).update(image_hash=image_hash)
+    return image_hash
+
+
+def _process_in_background(profile_id):
+    # Worker threads don't inherit the request's pin, and a replica may not
+    # have the upload yet
+    try:
+        with use_primary():
+            process_avatar(profile_id)
+    except Exception:
+        logger.exception('Avatar processing failed for profile %s', profile_id)
+    finally:
+        close_old_connections()
+
+
+def schedule_avatar_processing(profile_id):
+    """Process the avatar off the request thread once the upload is committed"""
+    transaction.on_commit(lambda: _executor.submit(_process_in_background, profile_id))
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from django_project.users.avatars import process_avatar
+from django_project.users.models import Profile
+
+
+class Command(BaseCommand):
+    help = 'Generate avatar sizes for profiles that have not been processed yet'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Reprocess every profile')
+
+    def handle(self, *args, **options):
+        profiles = Profile.objects.exclude(image='')
+        if not options['all']:
+            profiles = profiles.filter(image_hash='')
+
+        processed = failed = 0
+        for profile_id in profiles.values_list('pk', flat=True).iterator():
+            try:
+                process_avatar(profile_id)
+                processed += 1
+            except (OSError, ValueError) as e:
+                failed += 1
+                self.stderr.write(f'Profile {profile_id}: {e}')
+
+        self.stdout.write(self.style.SUCCESS(f'Processed {processed} avatar(s), {failed} failed'))
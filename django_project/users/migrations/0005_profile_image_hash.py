@@ -0,0 +1,23 @@
+# Generated by Django 5.2.4 on 2026-10-19 09:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0004_alter_profile_image'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='image_hash',
+            field=models.CharField(blank=True, editable=False, max_length=64),
+        ),
+        migrations.AlterField(
+            model_name='profile',
+            name='image',
+            field=models.ImageField(blank=True, default='profile_pics/default.jpg', upload_to='profile_pics'),
+        ),
+    ]
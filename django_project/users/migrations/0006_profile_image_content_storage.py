@@ -0,0 +1,19 @@
+# Generated by Django 5.2.4 on 2026-10-19 09:51
+
+import django_project.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0005_profile_image_hash'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='profile',
+            name='image',
+            field=models.ImageField(blank=True, default='profile_pics/default.jpg', storage=django_project.storage.content_storage, upload_to='profile_pics'),
+        ),
+    ]
@@ -1,32 +1,49 @@
 from django.db import models
 from django.contrib.auth.models import User
-from PIL import Image
-import os
+from django.core.files.storage import default_storage
+from django_project.storage import content_storage
+from .avatars import AVATAR_SIZES, avatar_name, schedule_avatar_processing
 
 
 class Profile(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
-    image = models.ImageField(default='profile_pics/default.jpg', upload_to='profile_pics', blank=True)
+    image = models.ImageField(
+        default='profile_pics/default.jpg', upload_to='profile_pics', storage=content_storage, blank=True
+    )
+    # SHA-256 of the processed upload; blank until the avatar sizes exist
+    image_hash = models.CharField(max_length=64, blank=True, editable=False)
     bio = models.TextField(max_length=500, blank=True)
     location = models.CharField(max_length=100, blank=True)
     website = models.URLField(max_length=200, blank=True)
-    
+
     def __str__(self):
         return f'{self.user.username} Profile'
 
     def save(self, *args, **kwargs):
+        # An uncommitted file means a new upload; anything else is unchanged
+        new_upload = bool(self.image) and not self.image._committed
+        if new_upload:
+            self.image_hash = ''
         super().save(*args, **kwargs)
-        
-        # Only resize if image exists and has a path (not default)
-        if self.image and hasattr(self.image, 'path'):
-            try:
-                # Check if file actually exists
-                if os.path.exists(self.image.path):
-                    img = Image.open(self.image.path)
-                    if img.height > 300 or img.width > 300:
-                        output_size = (300, 300)
-                        img.thumbnail(output_size)
-                        img.save(self.image.path)
-            except (FileNotFoundError, IOError, OSError) as e:
-                # Handle missing or invalid image files gracefully
-                pass
\ No newline at end of file
+
+        if new_upload:
+            schedule_avatar_processing(self.pk)
+
+    def avatar_url(self, size_name):
+        """URL of a processed avatar size, falling back to the original image"""
+        if self.image_hash:
+            return default_storage.url(avatar_name(self.image_hash, AVATAR_SIZES[size_name]))
+        return self.image.url if self.image else ''
+
+    @property
+    def avatar_small_url(self):
+        return self.avatar_url('small')
+
+    @property
+    def avatar_medium_url(self):
+        return self.avatar_url('medium')
+
+    @property
+    def avatar_large_url(self):
+        return self.avatar_url('large')
+
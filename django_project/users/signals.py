@@ -5,9 +5,7 @@ from django.db.models.signals import post_save
 
 @receiver(post_save,sender=User)
 def create_profile(sender, instance, created, **kwargs):
+    # Only new users need a profile; re-saving it on every User save (e.g.
+    # the last_login update on each login) changed nothing
     if created:
         Profile.objects.create(user=instance)
-
-@receiver(post_save,sender=User)
-def save_profile(sender, instance, **kwargs):
-    instance.profile.save()
\ No newline at end of file
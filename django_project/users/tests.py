@@ -1,3 +1,80 @@
-from django.test import TestCase
+import io
+import shutil
+import tempfile
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db.models.signals import post_save
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from . import avatars
+from .models import Profile
+
+
+def png_upload(name='me.png', color='red'):
+    from PIL import Image
+
+    buffer = io.BytesIO()
+    Image.new('RGB', (400, 300), color).save(buffer, format='PNG')
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/png')
+
+
+class ProfileTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.user = User.objects.create_user('reader', email='reader@example.com', password='pw')
+        self.saved = []
+        handler = lambda sender, instance, **kwargs: self.saved.append(instance.pk)
+        post_save.connect(handler, sender=Profile)
+        self.addCleanup(post_save.disconnect, handler, sender=Profile)
+
+    def test_new_user_gets_a_profile_and_login_does_not_save_it(self):
+        self.assertTrue(Profile.objects.filter(user=self.user).exists())
+        self.assertTrue(self.client.login(username='reader', password='pw'))
+        self.client.post(reverse('login'), {'username': 'reader', 'password': 'pw'})
+        self.assertEqual(self.saved, [])
+
+    @mock.patch('django_project.users.models.schedule_avatar_processing')
+    def test_only_a_new_image_is_processed(self, schedule):
+        self.client.force_login(self.user)
+        form = {'username': 'reader', 'email': 'reader@example.com', 'bio': 'Hello'}
+
+        self.client.post(reverse('profile'), form)
+        self.assertEqual(Profile.objects.get(user=self.user).bio, 'Hello')
+        schedule.assert_not_called()
+
+        self.client.post(reverse('profile'), {**form, 'image': png_upload()})
+        schedule.assert_called_once_with(self.user.profile.pk)
+
+        schedule.reset_mock()
+        self.client.post(reverse('profile'), {**form, 'bio': 'Changed'})
+        schedule.assert_not_called()
+
+    def test_processing_renders_every_size_and_records_the_hash(self):
+        profile = self.user.profile
+        with mock.patch('django_project.users.models.schedule_avatar_processing'):
+            profile.image = png_upload()
+            profile.save()
+
+        image_hash = avatars.process_avatar(profile.pk)
+        profile.refresh_from_db()
+        self.assertEqual(profile.image_hash, image_hash)
+        for name in avatars.derived_names(image_hash):
+            self.assertTrue(default_storage.exists(name))
+        self.assertEqual(
+            profile.avatar_small_url,
+            default_storage.url(avatars.avatar_name(image_hash, avatars.AVATAR_SIZES['small'])),
+        )
+
+        # Same bytes again: nothing to render
+        with mock.patch.object(avatars, '_render') as render:
+            self.assertEqual(avatars.process_avatar(profile.pk), image_hash)
+        render.assert_not_called()
@@ -0,0 +1,102 @@
+"""
+Worker warm-up.
+
+gunicorn (see gunicorn.conf.py) calls ``warm_up()`` in each worker after
+it forks and before it accepts requests, so the first requests don't pay
+for building the URL resolver, compiling templates, loading the
+autocomplete indexes or connecting to the database.
+"""
+import logging
+import time
+from pathlib import Path
+
+from django.apps import apps
+from django.db import connections
+from django.template import TemplateDoesNotExist, TemplateSyntaxError
+from django.template.loader import get_template
+from django.urls import NoReverseMatch, URLPattern, URLResolver, get_resolver, reverse
+
+logger = logging.getLogger(__name__)
+
+# Apps whose templates are compiled up front
+WARM_TEMPLATE_APPS = ('blog', 'users')
+
+
+def _walk(resolver, namespace=''):
+    """Compile every pattern's regex; yield (qualified name, pattern)"""
+    for pattern in resolver.url_patterns:
+        # Regexes are compiled and cached on first access
+        pattern.pattern.regex
+        if isinstance(pattern, URLResolver):
+            prefix = f'{namespace}{pattern.namespace}:' if pattern.namespace else namespace
+            yield from _walk(pattern, prefix)
+        elif isinstance(pattern, URLPattern) and pattern.name:
+            yield f'{namespace}{pattern.name}', pattern
+
+
+def warm_urls():
+    """Build the resolver's lookup tables and reverse every URL name"""
+    resolver = get_resolver()
+    # Populates the reverse, namespace and app lookup tables
+    resolver.reverse_dict
+    names = 0
+    for name, pattern in _walk(resolver):
+        names += 1
+        if not pattern.pattern.converters and not pattern.pattern.regex.groups:
+            try:
+                reverse(name)
+            except NoReverseMatch:
+                pass
+    return names
+
+
+def warm_templates(app_labels=WARM_TEMPLATE_APPS):
+    """Compile every template shipped by ``app_labels`` into the cached loader"""
+    compiled = 0
+    for label in app_labels:
+        template_dir = Path(apps.get_app_config(label).path) / 'templates'
+        for path in sorted(template_dir.rglob('*.html')):
+            try:
+                get_template(path.relative_to(template_dir).as_posix())
+                compiled += 1
+            except (TemplateDoesNotExist, TemplateSyntaxError):
+                logger.exception('Could not compile template %s', path)
+    return compiled
+
+
+def warm_connections():
+    """Connect to every configured database; return the aliases that failed"""
+    failed = []
+    for alias in connections:
+        try:
+            connections[alias].ensure_connection()
+        except Exception:
+            logger.exception('Could not connect to database %r', alias)
+            failed.append(alias)
+    return failed
+
+
+def warm_indexes():
+    """Build the autocomplete indexes; return how many keys they hold"""
+    from django_project.blog.autocomplete import SUGGESTION_INDEXES
+
+    keys = 0
+    for name, index in SUGGESTION_INDEXES.items():
+        try:
+            keys += len(index.get())
+        except Exception:
+            logger.exception('Could not build the %s autocomplete index', name)
+    return keys
+
+
+def warm_up():
+    """Run every warm-up step; return what was done for logging"""
+    started = time.perf_counter()
+    report = {
+        'urls': warm_urls(),
+        'templates': warm_templates(),
+        'failed_connections': warm_connections(),
+        'index_keys': warm_indexes(),
+    }
+    report['seconds'] = round(time.perf_counter() - started, 3)
+    return report
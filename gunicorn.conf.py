@@ -0,0 +1,84 @@
+"""
+gunicorn settings for production.
+
+gunicorn reads this file automatically when started from the project root.
+Every value can be overridden with an environment variable (or on the
+command line). The app is imported once in the master (preload_app) and
+shared copy-on-write. Each worker then warms itself up before it accepts
+requests; see django_project/warmup.py.
+"""
+import multiprocessing
+import os
+
+
+def _env_int(name, default):
+    value = os.environ.get(name)
+    return int(value) if value else default
+
+
+def _cpu_count():
+    # Respect CPU affinity (containers, taskset) where the platform exposes it
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return multiprocessing.cpu_count()
+
+
+CPUS = _cpu_count()
+
+bind = os.environ.get('GUNICORN_BIND') or f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+
+# gthread workers serve several requests per process while one waits on
+# the database; sync workers need more processes for the same concurrency
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread')
+threads = _env_int('GUNICORN_THREADS', 4 if worker_class == 'gthread' else 1)
+workers = _env_int(
+    'WEB_CONCURRENCY',
+    min(CPUS + 1 if worker_class == 'gthread' else CPUS * 2 + 1, _env_int('GUNICORN_MAX_WORKERS', 8)),
+)
+
+preload_app = os.environ.get('GUNICORN_PRELOAD', '1') == '1'
+
+# Recycle workers now and then to contain slow leaks; the jitter keeps them
+# from all restarting at once
+max_requests = _env_int('GUNICORN_MAX_REQUESTS', 1000)
+max_requests_jitter = _env_int('GUNICORN_MAX_REQUESTS_JITTER', max_requests // 10)
+
+timeout = _env_int('GUNICORN_TIMEOUT', 30)
+graceful_timeout = _env_int('GUNICORN_GRACEFUL_TIMEOUT', 30)
+keepalive = _env_int('GUNICORN_KEEPALIVE', 5)
+
+# Heartbeat files on tmpfs so a slow disk can't make workers look hung
+if os.path.isdir('/dev/shm'):
+    worker_tmp_dir = '/dev/shm'
+
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG') or None
+errorlog = '-'
+loglevel = os.environ.get('GUNICORN_LOG_LEVEL', 'info')
+
+
+def pre_fork(server, worker):
+    # Database connections (and pools) opened while preloading must not be
+    # shared with the workers; each opens its own during warm-up
+    if server.cfg.preload_app:
+        from django.db import connections
+        from django_project.dbpool import close_pools
+        connections.close_all()
+        close_pools()
+
+
+def post_worker_init(worker):
+    if os.environ.get('GUNICORN_WARMUP', '1') != '1':
+        return
+    from django_project.warmup import warm_up
+
+    try:
+        report = warm_up()
+    except Exception:
+        worker.log.exception('Worker warm-up failed; serving cold')
+        return
+    worker.log.info(
+        'Worker %s warmed up in %ss: %s URL names, %s templates, %s index keys%s',
+        worker.pid, report['seconds'], report['urls'], report['templates'], report['index_keys'],
+        f", failed connections: {', '.join(report['failed_connections'])}" if report['failed_connections'] else '',
+    )